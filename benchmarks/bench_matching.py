@@ -0,0 +1,323 @@
+# ==============================================
+# Matching Engine Benchmarks
+# ==============================================
+# Drives the matching engine in-process with synthetic
+# order flow (no HTTP, no WebSocket) and reports:
+# - orders/sec and fills/sec per scenario
+# - p50 / p99 / p99.9 latency per operation:
+#   submit_passive, submit_aggressive, cancel, execute_trade
+#
+# Scenarios are the cross product of book depth (price
+# levels per side), crossing ratio (share of orders that
+# take liquidity) and symbol count.
+#
+# Usage:
+#   python -m benchmarks.bench_matching
+#   python -m benchmarks.bench_matching --quick --output new.json
+#   python -m benchmarks.bench_matching --compare old.json
+#
+# Results are written as JSON (with the git commit) so two
+# runs can be compared; --compare prints the change per
+# scenario and --threshold fails the run on a regression.
+# ==============================================
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+from market.data import storage
+from market.data.storage import DataStorage
+from market.market import matching
+from market.market.records import OrderRecord
+
+# Engine units: prices in ticks (0.01 by default), cash in minor units
+MID_PRICE = 10_000
+TICK = 1
+ORDERS_PER_LEVEL = 2
+CANCEL_RATIO = 0.1
+TRADER_COUNT = 50
+
+DEFAULT_DEPTHS = (10, 100, 1000)
+DEFAULT_CROSSING = (0.1, 0.5)
+DEFAULT_SYMBOLS = (1, 16)
+
+
+def percentiles(samples_ns: List[int]) -> Dict[str, float]:
+    """Latency summary in microseconds"""
+    if not samples_ns:
+        return {"count": 0}
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    p50, p99, p999 = np.percentile(samples, (50, 99, 99.9))
+    return {
+        "count": len(samples_ns),
+        "p50": round(float(p50), 3),
+        "p99": round(float(p99), 3),
+        "p99_9": round(float(p999), 3),
+        "max": round(float(samples.max()), 3),
+    }
+
+
+def build_store(symbols: List[str], depth: int, rng: random.Random) -> DataStorage:
+    """Fresh store with `depth` levels per side in every book"""
+    data_store = DataStorage()
+    for symbol in symbols:
+        data_store.add_company(
+            {
+                "name": symbol,
+                "symbol": symbol,
+                "price": MID_PRICE,
+                "outstanding_shares": 10**9,
+                "ipo_price": MID_PRICE,
+            }
+        )
+    for n in range(TRADER_COUNT):
+        trader_id = f"trader-{n}"
+        data_store.add_trader(
+            trader_id,
+            {
+                "trader_id": trader_id,
+                "name": trader_id,
+                "cash": 10**14,
+                "portfolio": {symbol: 10**9 for symbol in symbols},
+            },
+        )
+
+    for symbol in symbols:
+        for level in range(1, depth + 1):
+            for order_type, price in (
+                ("buy", MID_PRICE - level * TICK),
+                ("sell", MID_PRICE + level * TICK),
+            ):
+                for _ in range(ORDERS_PER_LEVEL):
+                    order = OrderRecord(
+                        data_store.next_order_id(),
+                        f"trader-{rng.randrange(TRADER_COUNT)}",
+                        symbol,
+                        price,
+                        rng.randint(1, 100),
+                        order_type,
+                    )
+                    data_store.add_order(order)
+    return data_store
+
+
+def next_order(data_store, symbol, depth, crossing, rng) -> OrderRecord:
+    """A passive order inside the book or an aggressive one across the spread"""
+    book = data_store.order_book[symbol]
+    order_type = rng.choice(("buy", "sell"))
+    best_bid = book.best_bid or MID_PRICE - TICK
+    best_ask = book.best_ask or MID_PRICE + TICK
+    if rng.random() < crossing:
+        # Take one to three levels of liquidity
+        levels = rng.randint(0, 2) * TICK
+        price = best_ask + levels if order_type == "buy" else best_bid - levels
+        quantity = rng.randint(50, 300)
+    else:
+        offset = rng.randint(0, depth - 1) * TICK
+        price = (
+            best_ask - TICK - offset
+            if order_type == "buy"
+            else best_bid + TICK + offset
+        )
+        # Keep passive orders on their own side of the spread
+        price = (
+            min(price, best_ask - TICK)
+            if order_type == "buy"
+            else max(price, best_bid + TICK)
+        )
+        quantity = rng.randint(1, 100)
+    return OrderRecord(
+        None,
+        f"trader-{rng.randrange(TRADER_COUNT)}",
+        symbol,
+        max(price, TICK),
+        quantity,
+        order_type,
+    )
+
+
+def run_scenario(
+    depth: int, crossing: float, symbol_count: int, operations: int, seed: int
+) -> dict:
+    rng = random.Random(seed)
+    symbols = [f"SYM{n:03d}" for n in range(symbol_count)]
+    data_store = build_store(symbols, depth, rng)
+    previous, storage.data_store = storage.data_store, data_store
+    try:
+        latencies: Dict[str, List[int]] = {
+            "submit_passive": [],
+            "submit_aggressive": [],
+            "cancel": [],
+            "execute_trade": [],
+        }
+        resting_ids = list(data_store.order_index)
+        submitted = fills = 0
+        clock = time.perf_counter_ns
+
+        started = clock()
+        for _ in range(operations):
+            if resting_ids and rng.random() < CANCEL_RATIO:
+                # Swap-remove a random known ID; it may have filled already
+                slot = rng.randrange(len(resting_ids))
+                order_id = resting_ids[slot]
+                resting_ids[slot] = resting_ids[-1]
+                resting_ids.pop()
+                begin = clock()
+                data_store.remove_order(order_id)
+                latencies["cancel"].append(clock() - begin)
+                continue
+
+            symbol = symbols[rng.randrange(symbol_count)]
+            order = next_order(data_store, symbol, depth, crossing, rng)
+            begin = clock()
+            resting, trades = matching.submit_order(order)
+            elapsed = clock() - begin
+            latencies["submit_aggressive" if trades else "submit_passive"].append(
+                elapsed
+            )
+            submitted += 1
+            fills += len(trades)
+            if resting:
+                resting_ids.append(order.order_id)
+        seconds = (clock() - started) / 1e9
+
+        # Settlement through the locked path, outside the matching loop
+        async def settle():
+            for n in range(min(operations, 5000)):
+                buyer, seller = (
+                    f"trader-{n % TRADER_COUNT}",
+                    f"trader-{(n + 1) % TRADER_COUNT}",
+                )
+                begin = clock()
+                await matching.execute_trade(buyer, seller, symbols[0], MID_PRICE, 1)
+                latencies["execute_trade"].append(clock() - begin)
+
+        asyncio.run(settle())
+    finally:
+        storage.data_store = previous
+
+    return {
+        "name": f"depth{depth}-cross{int(crossing * 100)}-sym{symbol_count}",
+        "params": {
+            "depth": depth,
+            "crossing_ratio": crossing,
+            "symbols": symbol_count,
+            "operations": operations,
+            "seed": seed,
+        },
+        "orders": submitted,
+        "fills": fills,
+        "seconds": round(seconds, 6),
+        "orders_per_sec": round(submitted / seconds, 1) if seconds else 0.0,
+        "fills_per_sec": round(fills / seconds, 1) if seconds else 0.0,
+        "latency_us": {op: percentiles(samples) for op, samples in latencies.items()},
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: dict):
+    print(f"commit {results['commit']}  python {results['python']}")
+    header = f"{'scenario':<24}{'orders/s':>12}{'fills/s':>12}"
+    header += "".join(
+        f"{op + ' p50/p99/p99.9 us':>40}" for op in ("submit_aggressive", "cancel")
+    )
+    print(header)
+    for scenario in results["scenarios"]:
+        line = f"{scenario['name']:<24}{scenario['orders_per_sec']:>12.0f}{scenario['fills_per_sec']:>12.0f}"
+        for op in ("submit_aggressive", "cancel"):
+            stats = scenario["latency_us"][op]
+            cell = (
+                f"{stats['p50']:.1f}/{stats['p99']:.1f}/{stats['p99_9']:.1f}"
+                if stats["count"]
+                else "-"
+            )
+            line += f"{cell:>40}"
+        print(line)
+
+
+def compare(baseline: dict, results: dict, threshold: Optional[float]) -> bool:
+    """Print per-scenario changes; False if any exceeds the threshold (%)"""
+    old = {scenario["name"]: scenario for scenario in baseline["scenarios"]}
+    ok = True
+    print(f"\nvs {baseline.get('commit')}:")
+    for scenario in results["scenarios"]:
+        before = old.get(scenario["name"])
+        if before is None:
+            continue
+        throughput = (scenario["orders_per_sec"] / before["orders_per_sec"] - 1) * 100
+        changes = [f"orders/s {throughput:+.1f}%"]
+        regressed = threshold is not None and -throughput > threshold
+        for op, stats in scenario["latency_us"].items():
+            previous = before["latency_us"].get(op, {})
+            if stats.get("count") and previous.get("count"):
+                change = (stats["p99"] / previous["p99"] - 1) * 100
+                changes.append(f"{op} p99 {change:+.1f}%")
+                regressed = regressed or (threshold is not None and change > threshold)
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {scenario['name']:<24}" + ", ".join(changes) + flag)
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Matching engine benchmarks")
+    parser.add_argument("--depths", type=int, nargs="+", default=DEFAULT_DEPTHS)
+    parser.add_argument("--crossing", type=float, nargs="+", default=DEFAULT_CROSSING)
+    parser.add_argument("--symbols", type=int, nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--operations", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--quick", action="store_true", help="small smoke run")
+    parser.add_argument("--output", default="bench_matching.json")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument(
+        "--threshold", type=float, help="fail if a metric regresses by more than PCT"
+    )
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.depths, args.crossing, args.symbols = [10], [0.5], [1]
+        args.operations = min(args.operations, 2000)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "scenarios": [
+            run_scenario(depth, crossing, symbols, args.operations, args.seed)
+            for depth, crossing, symbols in itertools.product(
+                args.depths, args.crossing, args.symbols
+            )
+        ],
+    }
+    print_report(results)
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            if not compare(json.load(baseline), results, args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+# ==============================================
+# HTTP / WebSocket Load Generator
+# ==============================================
+# Drives a running server through its public API:
+# - Setup: registers --traders traders and --companies
+#   companies (each IPO'd to one of the traders, so it has
+#   a seller) with bounded concurrency
+# - Load: open-loop order flow at each of --rates orders/s
+#   for --duration seconds. Arrivals follow a seeded Poisson
+#   process and are sent whether or not earlier requests
+#   have finished, over a pool of --connections keep-alive
+#   connections. Latency is measured from the scheduled
+#   send time, so queueing in the client counts too (no
+#   coordinated omission)
+# - A --cancel-ratio share of requests cancels a resting
+#   order placed earlier
+# - --subscribers WebSocket clients subscribe to trades and
+#   measure delivery lag: receive time minus the trade's
+#   timestamp (assumes client and server share a clock)
+#
+# Per rate the report gives achieved throughput, rejected
+# (business rule) and failed (5xx / transport) shares,
+# latency percentiles and WebSocket lag, and marks the
+# first rate at which the server stopped keeping up. The
+# generator is one Python process; steps where it used most
+# of a core are flagged client-bound instead (run several
+# generators with different --seed to go further).
+#
+# Usage:
+#   python -m market.main        # in another shell
+#   python -m benchmarks.loadgen --rates 100 200 400 800 --duration 10
+#   python -m benchmarks.loadgen --traders 5000 --companies 500 --subscribers 200
+# ==============================================
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+import websockets
+from market.config import settings
+
+INITIAL_PRICE = 100.0
+TICK = 0.01
+SHARES_PER_COMPANY = 10**9
+TRADER_CASH = 10.0**9
+# A step is saturated when it falls short of its target rate by
+# more than this share, fails requests, or has to shed arrivals
+SATURATION_SHORTFALL = 0.05
+SATURATION_FAILURES = 0.01
+# Above this share of one core the generator itself is the limit
+# and a shortfall says nothing about the server
+CLIENT_CPU_LIMIT = 0.9
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summary in milliseconds of samples in seconds"""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p90, p99, p999 = np.percentile(values, (50, 90, 99, 99.9))
+    return {
+        "count": len(samples),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p99": round(float(p99), 3),
+        "p99_9": round(float(p999), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+class OpStats:
+    """Outcome counts and latencies for one kind of request"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ok = self.rejected = self.failed = 0
+
+    def observe(self, latency: float, status_code: Optional[int]):
+        self.latencies.append(latency)
+        if status_code == 200:
+            self.ok += 1
+        elif status_code is not None and status_code < 500:
+            # 201/202 insufficient balance, 404 already filled, ...
+            self.rejected += 1
+        else:
+            self.failed += 1
+
+    def summary(self) -> dict:
+        total = len(self.latencies)
+        return {
+            "requests": total,
+            "ok": self.ok,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "error_rate": round(self.failed / total, 4) if total else 0.0,
+            "latency_ms": percentiles(self.latencies),
+        }
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        ws_url: Optional[str] = None,
+        seed: int = 42,
+        cancel_ratio: float = 0.1,
+        crossing: float = 0.3,
+        connections: int = 64,
+        max_backlog: int = 2000,
+    ):
+        self.client = client
+        self.ws_url = ws_url
+        self.rng = random.Random(seed)
+        self.cancel_ratio = cancel_ratio
+        self.crossing = crossing
+        self.connections = connections
+        self.max_backlog = max_backlog
+        self.trader_ids: List[str] = []
+        self.symbols: List[str] = []
+        self.ipo_owner: Dict[str, str] = {}
+        self.resting: List[int] = []
+        self.lags: List[float] = []
+        self.ws_messages = 0
+        self.ws_connected = 0
+        self.ws_errors = 0
+
+    # ---------- setup ----------
+
+    async def setup(self, traders: int, companies: int, concurrency: int) -> dict:
+        """Register traders and companies through the API; returns timings"""
+        limit = asyncio.Semaphore(concurrency)
+        stats = {"register_trader": OpStats(), "register_company": OpStats()}
+
+        async def call(op: str, path: str, params: dict) -> Optional[dict]:
+            async with limit:
+                started = time.perf_counter()
+                try:
+                    response = await self.client.post(path, params=params)
+                    status_code = response.status_code
+                except httpx.HTTPError:
+                    response, status_code = None, None
+                stats[op].observe(time.perf_counter() - started, status_code)
+                return response.json() if status_code == 200 else None
+
+        registered = await asyncio.gather(
+            *(
+                call(
+                    "register_trader",
+                    "/trader/register",
+                    {"name": f"load-{n}", "cash": TRADER_CASH},
+                )
+                for n in range(traders)
+            )
+        )
+        self.trader_ids = [trader["trader_id"] for trader in registered if trader]
+        if not self.trader_ids:
+            raise RuntimeError("could not register any trader")
+
+        # Unique per run, so a long-lived server can be loaded repeatedly
+        prefix = "L" + format(int(time.time()) % 36**4, "x")
+        planned = [
+            (f"{prefix}{n:05d}", self.trader_ids[n % len(self.trader_ids)])
+            for n in range(companies)
+        ]
+        created = await asyncio.gather(
+            *(
+                call(
+                    "register_company",
+                    "/company/register",
+                    {
+                        "name": f"Load Co {symbol}",
+                        "symbol": symbol,
+                        "initial_price": INITIAL_PRICE,
+                        "shares": SHARES_PER_COMPANY,
+                        "ipo_trader_id": owner,
+                    },
+                )
+                for symbol, owner in planned
+            )
+        )
+        for (symbol, owner), company in zip(planned, created):
+            if company:
+                self.symbols.append(symbol)
+                self.ipo_owner[symbol] = owner
+        if not self.symbols:
+            raise RuntimeError("could not register any company")
+        return {op: op_stats.summary() for op, op_stats in stats.items()}
+
+    # ---------- order flow ----------
+
+    def next_request(self) -> tuple:
+        """(op, method, path, json body); drawn up front so runs are seeded"""
+        rng = self.rng
+        if self.resting and rng.random() < self.cancel_ratio:
+            slot = rng.randrange(len(self.resting))
+            order_id = self.resting[slot]
+            self.resting[slot] = self.resting[-1]
+            self.resting.pop()
+            return "cancel", "DELETE", f"/market/order/{order_id}", None
+
+        symbol = rng.choice(self.symbols)
+        is_buy = rng.random() < 0.5
+        levels = rng.randint(0, 20) * TICK
+        if rng.random() < self.crossing:
+            price = INITIAL_PRICE + levels if is_buy else INITIAL_PRICE - levels
+        else:
+            price = (
+                INITIAL_PRICE - TICK - levels
+                if is_buy
+                else INITIAL_PRICE + TICK + levels
+            )
+        order = {
+            # Only the IPO owner is known to hold shares
+            "trader_id": (
+                rng.choice(self.trader_ids) if is_buy else self.ipo_owner[symbol]
+            ),
+            "symbol": symbol,
+            "price": round(price, 2),
+            "quantity": rng.randint(1, 100),
+            "order_type": "buy" if is_buy else "sell",
+        }
+        return "order", "POST", "/market/order", order
+
+    async def _sender(self, backlog: asyncio.Queue, stats: Dict[str, OpStats]):
+        """One per pooled connection: send due requests one at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled, (op, method, path, body) = await backlog.get()
+            try:
+                response = await self.client.request(method, path, json=body)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                response, status_code = None, None
+            # From the scheduled time: waiting in the backlog counts too
+            stats[op].observe(loop.time() - scheduled, status_code)
+            if op == "order" and status_code == 200:
+                result = response.json()
+                if result["resting"]:
+                    self.resting.append(result["order_id"])
+            backlog.task_done()
+
+    async def run_rate(self, rate: float, duration: float) -> dict:
+        """Open-loop Poisson arrivals at `rate` per second for `duration` seconds"""
+        loop = asyncio.get_running_loop()
+        stats = {"order": OpStats(), "cancel": OpStats()}
+        self.lags, self.ws_messages = [], 0
+        # Arrivals wait here rather than inside the HTTP pool, whose
+        # waiter bookkeeping slows down with thousands of queued requests
+        backlog: asyncio.Queue = asyncio.Queue(maxsize=self.max_backlog)
+        senders = [
+            asyncio.create_task(self._sender(backlog, stats))
+            for _ in range(self.connections)
+        ]
+        sent = dropped = 0
+
+        started, cpu_started = loop.time(), time.process_time()
+        scheduled, end = started, started + duration
+        while True:
+            scheduled += self.rng.expovariate(rate)
+            if scheduled >= end:
+                break
+            request = self.next_request()
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                backlog.put_nowait((scheduled, request))
+                sent += 1
+            except asyncio.QueueFull:
+                dropped += 1  # client-side shedding: the server is far behind
+        await backlog.join()
+        elapsed = loop.time() - started
+        client_cpu = (time.process_time() - cpu_started) / elapsed if elapsed else 0.0
+        for sender in senders:
+            sender.cancel()
+        # Let trailing WebSocket deliveries arrive
+        await asyncio.sleep(0.2)
+
+        completed = sum(len(op_stats.latencies) for op_stats in stats.values())
+        failed = sum(op_stats.failed for op_stats in stats.values())
+        achieved = completed / elapsed if elapsed else 0.0
+        return {
+            "target_rate": rate,
+            "achieved_rate": round(achieved, 1),
+            "sent": sent,
+            "dropped": dropped,
+            "seconds": round(elapsed, 3),
+            "client_cpu": round(client_cpu, 2),
+            "client_bound": client_cpu > CLIENT_CPU_LIMIT,
+            "saturated": (
+                achieved < rate * (1 - SATURATION_SHORTFALL)
+                or dropped > 0
+                or (completed and failed / completed > SATURATION_FAILURES)
+            ),
+            "ops": {op: op_stats.summary() for op, op_stats in stats.items()},
+            "ws": {
+                "connected": self.ws_connected,
+                "errors": self.ws_errors,
+                "messages": self.ws_messages,
+                "lag_ms": percentiles(self.lags),
+            },
+        }
+
+    # ---------- WebSocket subscribers ----------
+
+    async def _subscriber(self, symbols: List[str], ready: asyncio.Event):
+        try:
+            async with websockets.connect(self.ws_url, max_queue=None) as connection:
+                await connection.send(
+                    json.dumps(
+                        {"action": "subscribe", "channel": "trades", "symbols": symbols}
+                    )
+                )
+                self.ws_connected += 1
+                ready.set()
+                async for text in connection:
+                    received = datetime.now()
+                    message = json.loads(text)
+                    if message.get("type") == "trade_executed":
+                        executed = datetime.fromisoformat(message["trade"]["timestamp"])
+                        self.lags.append((received - executed).total_seconds())
+                        self.ws_messages += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.ws_errors += 1
+        finally:
+            ready.set()
+
+    async def start_subscribers(
+        self, count: int, symbols_each: int
+    ) -> List[asyncio.Task]:
+        tasks, waits = [], []
+        for _ in range(count):
+            symbols = (
+                self.rng.sample(self.symbols, min(symbols_each, len(self.symbols)))
+                if symbols_each
+                else ["*"]
+            )
+            ready = asyncio.Event()
+            tasks.append(asyncio.create_task(self._subscriber(symbols, ready)))
+            waits.append(ready.wait())
+        await asyncio.gather(*waits)
+        return tasks
+
+
+def print_report(report: dict):
+    print(
+        f"\n{'rate':>8}{'achieved':>10}{'ok':>8}{'rej':>7}{'fail':>6}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'p99.9':>9}{'ws lag p99':>12}{'cpu':>6}"
+    )
+    for step in report["steps"]:
+        order = step["ops"]["order"]
+        latency = order["latency_ms"]
+        lag = step["ws"]["lag_ms"]
+        if step["client_bound"]:
+            flag = "  CLIENT-BOUND"
+        else:
+            flag = "  SATURATED" if step["saturated"] else ""
+        print(
+            f"{step['target_rate']:>8.0f}{step['achieved_rate']:>10.0f}"
+            f"{order['ok']:>8}{order['rejected']:>7}{order['failed']:>6}"
+            f"{latency.get('p50', 0):>9.2f}{latency.get('p99', 0):>9.2f}"
+            f"{latency.get('p99_9', 0):>9.2f}{lag.get('p99', 0):>12.2f}"
+            f"{step['client_cpu']:>6.2f}" + flag
+        )
+    if report["saturation_rate"] is not None:
+        print(f"\nsaturation at ~{report['saturation_rate']:.0f} requests/s")
+    elif any(step["client_bound"] for step in report["steps"]):
+        print("\nthe generator ran out of CPU before the server saturated")
+    else:
+        print("\nno saturation within the tested rates")
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(
+        max_connections=args.connections, max_keepalive_connections=args.connections
+    )
+    ws_url = args.url.replace("http", "ws", 1).rstrip("/") + "/ws"
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout
+    ) as client:
+        generator = LoadGenerator(
+            client,
+            ws_url,
+            seed=args.seed,
+            cancel_ratio=args.cancel_ratio,
+            crossing=args.crossing,
+            connections=args.connections,
+            max_backlog=args.max_backlog,
+        )
+        setup = await generator.setup(args.traders, args.companies, args.connections)
+        subscribers = await generator.start_subscribers(
+            args.subscribers, args.subscriber_symbols
+        )
+        try:
+            steps = []
+            for rate in args.rates:
+                steps.append(await generator.run_rate(rate, args.duration))
+        finally:
+            for task in subscribers:
+                task.cancel()
+            await asyncio.gather(*subscribers, return_exceptions=True)
+
+    saturated = [
+        step["target_rate"]
+        for step in steps
+        if step["saturated"] and not step["client_bound"]
+    ]
+    return {
+        "url": args.url,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "setup": setup,
+        "steps": steps,
+        "saturation_rate": saturated[0] if saturated else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP/WebSocket load generator")
+    parser.add_argument("--url", default=f"http://{settings.HOST}:{settings.PORT}")
+    parser.add_argument("--traders", type=int, default=1000)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument(
+        "--rates", type=float, nargs="+", default=[100, 200, 400, 800, 1600]
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--connections", type=int, default=64, help="HTTP pool size")
+    parser.add_argument(
+        "--max-backlog",
+        type=int,
+        default=2000,
+        help="due requests queued client-side before arrivals are dropped",
+    )
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--cancel-ratio", type=float, default=0.1)
+    parser.add_argument("--crossing", type=float, default=0.3)
+    parser.add_argument("--subscribers", type=int, default=50)
+    parser.add_argument(
+        "--subscriber-symbols",
+        type=int,
+        default=0,
+        help="symbols per subscriber (0 = all)",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadgen.json")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
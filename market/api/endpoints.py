@@ -6,13 +6,38 @@
 # - Trader operations
 # - Market operations
 # - AI trading control
+#
+# This is the API edge for money: requests arrive with float
+# prices and cash, the engine works in integer ticks and
+# minor units (market/units.py), and responses are converted
+# back here. A price off its symbol's tick grid is a 400.
 # ==============================================
 
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict, List
-from ..models import Company, Trader, Order, Trade
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from ..config import settings
+from ..models import Company, Trader, Order, OrderAmend, OrderBatch
 from ..data import storage
 from ..market.fees import calculate_trading_fees
+from ..market.matching import submit_order
+from ..market.records import OrderRecord, TradeRecord
+from ..market.units import (
+    company_view,
+    from_minor,
+    from_ticks,
+    to_minor,
+    to_ticks,
+    trader_view,
+)
+from .websocket import manager
+from ..metrics import REGISTRY
+import asyncio
+import base64
+import csv
+import io
+import json
 import uuid
 
 router = APIRouter()
@@ -22,41 +47,78 @@ router = APIRouter()
 # COMPANY ENDPOINTS
 # =====================
 @router.post("/company/register", response_model=Company)
-async def register_company(name: str, symbol: str, initial_price: float, shares: int):
+async def register_company(
+    name: str,
+    symbol: str,
+    initial_price: float,
+    shares: int,
+    ipo_trader_id: Optional[str] = None,
+):
+    """
+    Register a company. If ipo_trader_id is given, that trader is
+    allotted all `shares` so the stock has a seller.
+    """
     async with storage.data_store.lock:
         if symbol in storage.data_store.companies:
             raise HTTPException(
                 status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION,
                 detail="Company already exists",
             )
+        if (
+            ipo_trader_id is not None
+            and ipo_trader_id not in storage.data_store.traders
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Invalid trader ID"
+            )
 
+        price = _ticks(symbol, initial_price)
         company = {
             "name": name,
             "symbol": symbol,
-            "price": initial_price,
+            "price": price,
             "outstanding_shares": shares,
-            "ipo_price": initial_price,
+            "ipo_price": price,
         }
-        storage.data_store.companies[symbol] = company
-        storage.data_store.order_book[symbol] = {"buy": [], "sell": []}
+        storage.data_store.add_company(company)
+        if ipo_trader_id is not None:
+            async with storage.data_store.trader_lock(ipo_trader_id):
+                storage.data_store.allocate_shares(ipo_trader_id, symbol, shares)
 
-    return company
+    await storage.data_store.sync_journal()
+    return company_view(company)
 
 
 @router.get("/market/companies", response_model=dict)
 async def get_companies():
-    return storage.data_store.companies
+    companies = storage.data_store.sync_company_prices()
+    return {symbol: company_view(company) for symbol, company in companies.items()}
 
 
 # =====================
 # TRADER ENDPOINTS
 # =====================
 @router.post("/trader/register", response_model=Trader)
-async def register_trader(name: str, cash: float):
-    trader_id = str(uuid.uuid4())
-    trader = {"name": name, "cash": cash, "portfolio": {}}
-    storage.data_store.traders[trader_id] = trader
-    return {"trader_id": trader_id, **trader}
+async def register_trader(name: str, cash: float, trader_id: Optional[str] = None):
+    """
+    Create a trader. A sharded front end passes trader_id so the
+    trader's sub-account has the same ID on every shard.
+    """
+    if trader_id is None:
+        trader_id = str(uuid.uuid4())
+    elif trader_id in storage.data_store.traders:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Trader already exists"
+        )
+    trader = {
+        "trader_id": trader_id,
+        "name": name,
+        "cash": to_minor(cash),
+        "portfolio": {},
+    }
+    storage.data_store.add_trader(trader_id, trader)
+    await storage.data_store.sync_journal()
+    return trader_view(trader)
 
 
 @router.get("/trader/{trader_id}", response_model=Trader)
@@ -65,54 +127,370 @@ async def get_trader(trader_id: str):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Trader not found"
         )
-    return storage.data_store.traders[trader_id]
+    return trader_view(storage.data_store.traders[trader_id])
+
+
+@router.post("/trader/{trader_id}/cash/withdraw")
+async def withdraw_cash(trader_id: str, amount: Optional[float] = None):
+    """
+    Shard-internal: take cash out of this shard's sub-account so the
+    front end can fund a buy on another shard. Without an amount,
+    withdraws everything not reserved by resting orders.
+    """
+    _require_shard(trader_id)
+    async with storage.data_store.trader_lock(trader_id):
+        trader = storage.data_store.traders[trader_id]
+        available = max(trader["cash"] - trader["reserved_cash"], 0)
+        minor = available if amount is None else to_minor(amount)
+        if minor < 0 or minor > available:
+            raise HTTPException(
+                status_code=status.HTTP_201_CREATED, detail="Insufficient funds"
+            )
+        if minor:
+            storage.data_store.move_cash(trader_id, -minor)
+    await storage.data_store.sync_journal()
+    return {"trader_id": trader_id, "amount": from_minor(minor)}
+
+
+@router.post("/trader/{trader_id}/cash/deposit")
+async def deposit_cash(trader_id: str, amount: float):
+    """Shard-internal: credit cash withdrawn from another shard."""
+    _require_shard(trader_id)
+    minor = to_minor(amount)
+    if minor <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid amount"
+        )
+    async with storage.data_store.trader_lock(trader_id):
+        storage.data_store.move_cash(trader_id, minor)
+    await storage.data_store.sync_journal()
+    return {"trader_id": trader_id, "amount": from_minor(minor)}
+
+
+def _require_shard(trader_id: str):
+    # Cash only moves between a trader's shard sub-accounts; a standalone
+    # server has a single account and no transfer endpoints.
+    if settings.SHARD_INDEX is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if trader_id not in storage.data_store.traders:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Trader not found"
+        )
 
 
 # =====================
 # TRADING ENDPOINTS
 # =====================
-@router.post("/market/order", status_code=status.HTTP_200_OK)
-async def place_order(order: Order):
-    async with storage.data_store.lock:
-        # Validate request
-        if order.symbol not in storage.data_store.companies:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Invalid stock symbol"
-            )
-        if order.trader_id not in storage.data_store.traders:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Invalid trader ID"
+def _ticks(symbol: str, price: float) -> int:
+    try:
+        return to_ticks(symbol, price)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+
+def _check_resources(
+    order: OrderRecord,
+    replacing: Optional[OrderRecord] = None,
+    pending: int = 0,
+    ceiling: Optional[int] = None,
+):
+    """
+    Raise if the trader's available balance can't cover the order (see
+    DataStorage.shortfall). Caller holds the trader lock.
+    """
+    shortfall = storage.data_store.shortfall(order, replacing, pending, ceiling)
+    if shortfall == "cash":
+        raise HTTPException(
+            status_code=status.HTTP_201_CREATED, detail="Insufficient funds"
+        )
+    if shortfall == "shares":
+        raise HTTPException(
+            status_code=status.HTTP_202_ACCEPTED, detail="Insufficient shares"
+        )
+
+
+async def _publish_order_events(symbol: str, fills: List[TradeRecord]):
+    """Notify subscribers; call once the locks are released"""
+    for trade in fills:
+        trade_dict = trade.to_dict()
+        await manager.publish(
+            "trades", symbol, {"type": "trade_executed", "trade": trade_dict}
+        )
+        for side, trader_id in (("buy", trade.buyer), ("sell", trade.seller)):
+            await manager.publish_execution(
+                {
+                    "type": "execution",
+                    "trader_id": trader_id,
+                    "side": side,
+                    "trade": trade_dict,
+                }
             )
-        if order.order_type not in ["buy", "sell"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order type"
+    if fills:
+        candles = storage.data_store.candles
+        for interval in candles.intervals:
+            bar = candles.latest(symbol, interval, 1)[0]
+            # Keyed by bar start: a newer bar never conflates away the
+            # final update of the one before it
+            await manager.publish(
+                "candles",
+                symbol,
+                {
+                    "type": "candle_update",
+                    "symbol": symbol,
+                    "interval": interval,
+                    "candle": bar.to_dict(symbol),
+                },
+                conflate_key=f"candle:{symbol}:{interval}:{bar.start}",
             )
 
-        # Check trader resources
-        trader = storage.data_store.traders[order.trader_id]
-        if order.order_type == "buy":
-            # Calculate potential fees (estimate)
-            potential_fees = calculate_trading_fees(order.price * order.quantity)[
-                "buyer_fee"
-            ]
-            total_cost = order.price * order.quantity + potential_fees
+    book = storage.data_store.order_book[symbol]
+    await manager.publish(
+        "book",
+        symbol,
+        {
+            "type": "book_update",
+            "symbol": symbol,
+            "best_bid": _price_or_none(symbol, book.best_bid),
+            "best_ask": _price_or_none(symbol, book.best_ask),
+        },
+        conflate_key="book:" + symbol,
+    )
+
+
+def _price_or_none(symbol: str, ticks: Optional[int]) -> Optional[float]:
+    return None if ticks is None else from_ticks(symbol, ticks)
+
+
+def _find_order(order_id: int):
+    ref = storage.data_store.order_index.get(order_id)
+    if ref is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+        )
+    return ref
+
+
+def _validate_order(order: Order) -> OrderRecord:
+    """
+    The order as an engine record; raises if it names an unknown
+    symbol/trader, has a bad type or a price off the tick grid
+    """
+    if order.symbol not in storage.data_store.companies:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Invalid stock symbol"
+        )
+    if order.trader_id not in storage.data_store.traders:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Invalid trader ID"
+        )
+    if order.order_type not in ["buy", "sell"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order type"
+        )
+    if order.quantity <= 0 or (order.price is not None and order.price <= 0):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order"
+        )
+    try:
+        return OrderRecord.from_model(order)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+
+def _execute_order(record: OrderRecord) -> Tuple[dict, List[TradeRecord]]:
+    """
+    Match and rest a validated order; caller holds its symbol and trader
+    locks. Returns the API result and the engine's fills for publishing.
+    """
+    quantity = record.quantity
+    resting, fills = submit_order(record)
+    result = {
+        "order_id": record.order_id,
+        "resting": resting,
+        "filled_quantity": quantity - record.quantity,
+        "remaining_quantity": record.quantity,
+        "fills": [trade.to_model() for trade in fills],
+    }
+    return result, fills
+
+
+@router.post("/market/order", status_code=status.HTTP_200_OK)
+async def place_order(order: Order):
+    data_store = storage.data_store
+    order.order_id = None
+    record = _validate_order(order)
+
+    # Symbol lock first, then the trader's balance guard (see storage.py)
+    async with data_store.symbol_lock(order.symbol):
+        async with data_store.trader_lock(order.trader_id):
+            _check_resources(record)
+
+            # Match against the opposite side, rest any remainder
+            result, fills = _execute_order(record)
+
+    await data_store.sync_journal()
+    await _publish_order_events(order.symbol, fills)
+
+    return {"message": "Order placed successfully", **result}
+
+
+@router.post("/market/orders/batch", status_code=status.HTTP_200_OK)
+async def place_orders_batch(batch: OrderBatch):
+    """
+    Place many orders in one request. Every symbol and trader lock the
+    batch needs is taken once, in the documented order, and held for
+    the whole batch; orders are then processed in request order.
+    Each order gets its own accept/reject result unless all_or_nothing
+    is set, in which case one rejection rejects the whole batch.
+    """
+    data_store = storage.data_store
+    results: List[Optional[dict]] = [None] * len(batch.orders)
+
+    def reject(index: int, error: HTTPException):
+        results[index] = {
+            "index": index,
+            "accepted": False,
+            "status_code": error.status_code,
+            "detail": error.detail,
+        }
+
+    fills_by_symbol: Dict[str, List[TradeRecord]] = {}
+    valid = []
+    records: Dict[int, OrderRecord] = {}
+    for index, order in enumerate(batch.orders):
+        order.order_id = None
+        try:
+            records[index] = _validate_order(order)
+            valid.append(index)
+        except HTTPException as error:
+            reject(index, error)
+
+    orders = [batch.orders[index] for index in valid]
+    async with data_store.lock_symbols(order.symbol for order in orders):
+        async with data_store.lock_traders(order.trader_id for order in orders):
+            if batch.all_or_nothing:
+                # Check against running totals: each order must fit in what
+                # the earlier orders of the batch leave available. Earlier
+                # orders also move the book, so market buys are costed at
+                # the highest ask that can be resting when they run.
+                pending: Dict[Tuple[str, Optional[str]], int] = {}
+                ceilings: Dict[str, Optional[int]] = {}
+                for index in valid:
+                    record = records[index]
+                    key = (
+                        record.trader_id,
+                        None if record.order_type == "buy" else record.symbol,
+                    )
+                    ceiling = ceilings.get(
+                        record.symbol,
+                        data_store.order_book[record.symbol].asks.worst_price,
+                    )
+                    try:
+                        _check_resources(
+                            record, pending=pending.get(key, 0), ceiling=ceiling
+                        )
+                    except HTTPException as error:
+                        reject(index, error)
+                        continue
+                    pending[key] = pending.get(key, 0) + data_store.commitment(
+                        record, ceiling
+                    )
+                    if record.order_type == "sell" and not record.is_market:
+                        ceiling = max(ceiling or 0, record.price)
+                    ceilings[record.symbol] = ceiling
+                if len(valid) < len(batch.orders) or any(results):
+                    # Nothing has been touched yet: report and bail out
+                    for index, result in enumerate(results):
+                        if result is None:
+                            results[index] = {
+                                "index": index,
+                                "accepted": False,
+                                "status_code": status.HTTP_409_CONFLICT,
+                                "detail": "Batch rejected",
+                            }
+                    return {"accepted": 0, "rejected": len(results), "results": results}
 
-            if trader["cash"] < total_cost:
-                raise HTTPException(
-                    status_code=status.HTTP_201_CREATED, detail="Insufficient funds"
-                )
+            for index in valid:
+                order = batch.orders[index]
+                if not batch.all_or_nothing:
+                    # all_or_nothing orders were checked at their worst case
+                    # above, so none can fail once the first one has run
+                    try:
+                        _check_resources(records[index])
+                    except HTTPException as error:
+                        reject(index, error)
+                        continue
+                result, fills = _execute_order(records[index])
+                results[index] = {"index": index, "accepted": True, **result}
+                fills_by_symbol.setdefault(order.symbol, []).extend(fills)
 
-        if order.order_type == "sell":
-            current_shares = trader["portfolio"].get(order.symbol, 0)
-            if current_shares < order.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_202_ACCEPTED, detail="Insufficient shares"
-                )
+    await data_store.sync_journal()
+    for symbol, fills in fills_by_symbol.items():
+        await _publish_order_events(symbol, fills)
 
-        # Add order to order book
-        storage.data_store.order_book[order.symbol][order.order_type].append(order)
+    accepted = sum(1 for result in results if result["accepted"])
+    return {
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results,
+    }
+
+
+@router.delete("/market/order/{order_id}")
+async def cancel_order(order_id: int):
+    """Cancel a resting order in O(1) through the order index"""
+    data_store = storage.data_store
+    symbol = _find_order(order_id).symbol
+    async with data_store.symbol_lock(symbol):
+        # It may have filled while we waited for the lock
+        _find_order(order_id)
+        order = data_store.remove_order(order_id)
+
+    await data_store.sync_journal()
+    await _publish_order_events(symbol, [])
+    return {"message": "Order cancelled", "order": order.to_model()}
+
+
+@router.patch("/market/order/{order_id}")
+async def amend_order(order_id: int, amend: OrderAmend):
+    """
+    Amend a resting order. Reducing quantity at the same price keeps
+    its queue position; a price change or size increase re-enters the
+    order at the back of the queue (and may match immediately).
+    """
+    data_store = storage.data_store
+    symbol = _find_order(order_id).symbol
+    async with data_store.symbol_lock(symbol):
+        order = _find_order(order_id).order
+        price = order.price
+        if amend.price is not None:
+            price = _ticks(symbol, amend.price)
+        quantity = order.quantity if amend.quantity is None else amend.quantity
+        if price <= 0 or quantity <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid amendment"
+            )
 
-    return {"message": "Order placed successfully"}
+        async with data_store.trader_lock(order.trader_id):
+            if price == order.price and quantity <= order.quantity:
+                data_store.reduce_order(order_id, quantity)
+                resting, fills = True, []
+            else:
+                replacement = order.replace(price=price, quantity=quantity)
+                _check_resources(replacement, replacing=order)
+                data_store.remove_order(order_id)
+                order = replacement
+                resting, fills = submit_order(order)
+
+    await data_store.sync_journal()
+    await _publish_order_events(symbol, fills)
+    return {
+        "message": "Order amended",
+        "order_id": order_id,
+        "resting": resting,
+        "remaining_quantity": order.quantity,
+        "fills": [trade.to_model() for trade in fills],
+    }
 
 
 @router.get("/market/orderbook/{symbol}", response_model=dict)
@@ -121,12 +499,210 @@ async def get_orderbook(symbol: str):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Invalid stock symbol"
         )
-    return storage.data_store.order_book[symbol]
+    snapshot = storage.data_store.order_book[symbol].snapshot()
+    return {
+        side: [order.to_model() for order in orders]
+        for side, orders in snapshot.items()
+    }
+
+
+@router.get("/market/depth/{symbol}", response_model=dict)
+async def get_depth(symbol: str, levels: int = 10):
+    """Aggregated price levels (price, total quantity, order count), best first"""
+    if symbol not in storage.data_store.order_book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Invalid stock symbol"
+        )
+    if levels < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="levels must be positive"
+        )
+    return storage.data_store.order_book[symbol].depth(levels)
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+EXPORT_BATCH = 1000
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_FIELDS = (
+    "trade_id",
+    "timestamp",
+    "symbol",
+    "price",
+    "quantity",
+    "buyer",
+    "seller",
+    "buyer_fee",
+    "seller_fee",
+)
+
+
+def encode_cursor(position: dict) -> str:
+    """Opaque page cursor; clients only hand it back"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(position, dict):
+            raise ValueError(cursor)
+        return position
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def export_row(trade: dict) -> dict:
+    """Flatten a trade (to_dict or JSON shape) into one export record"""
+    timestamp = trade["timestamp"]
+    return {
+        "trade_id": trade["trade_id"],
+        "timestamp": (
+            timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+        ),
+        "symbol": trade["symbol"],
+        "price": trade["price"],
+        "quantity": trade["quantity"],
+        "buyer": trade["buyer"],
+        "seller": trade["seller"],
+        "buyer_fee": trade["fees"]["buyer_fee"],
+        "seller_fee": trade["fees"]["seller_fee"],
+    }
+
+
+def format_export(rows: List[dict], export_format: str, header: bool = False) -> str:
+    if export_format == "ndjson":
+        return "".join(json.dumps(row) + "\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([row[field] for field in EXPORT_FIELDS] for row in rows)
+    return buffer.getvalue()
+
+
+def export_response(chunks: AsyncIterator[str], export_format: str):
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="trades.{export_format}"'
+        },
+    )
+
+
+def check_export_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of {list(EXPORT_FORMATS)}",
+        )
+
+
+def engine_time(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    A since/until bound on the engine's clock, which is naive local time:
+    timezone-aware values (e.g. a "Z" suffix) are converted to it
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
 
 
 @router.get("/market/trades", response_model=list)
-async def get_trades(limit: int = 50):
-    return storage.data_store.trade_history[-limit:]
+async def get_trades(
+    response: Response,
+    limit: int = 50,
+    symbol: Optional[str] = None,
+    trader_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Most recent trades, optionally filtered by symbol/trader/time range.
+    A full page carries an X-Next-Cursor header; pass it back as `cursor`
+    for the page of older trades before it.
+    """
+    before = None
+    if cursor is not None:
+        before = decode_cursor(cursor).get("before")
+        if not isinstance(before, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+    trades = storage.data_store.trade_history.query(
+        symbol=symbol,
+        trader_id=trader_id,
+        since=engine_time(since),
+        until=engine_time(until),
+        limit=limit,
+        before=before,
+    )
+    if limit > 0 and len(trades) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            {"before": trades[0].trade_id}
+        )
+    return [trade.to_model() for trade in trades]
+
+
+@router.get("/market/trades/export")
+async def export_trades(
+    format: str = "ndjson",
+    symbol: Optional[str] = None,
+    trader_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Stream every retained trade matching the filters, oldest first, as
+    NDJSON or CSV. Trades are read in fixed-size batches, so memory use
+    doesn't grow with the export.
+    """
+    check_export_format(format)
+    # Normalised up front: an error inside the stream would come after the
+    # 200 headers, as a silently truncated body
+    batches = storage.data_store.trade_history.scan(
+        symbol=symbol,
+        trader_id=trader_id,
+        since=engine_time(since),
+        until=engine_time(until),
+        batch=EXPORT_BATCH,
+    )
+
+    async def chunks():
+        if format == "csv":
+            yield format_export([], format, header=True)
+        for batch in batches:
+            yield format_export([export_row(t.to_dict()) for t in batch], format)
+            # Let matching run between batches
+            await asyncio.sleep(0)
+
+    return export_response(chunks(), format)
+
+
+@router.get("/market/candles/{symbol}", response_model=dict)
+async def get_candles(symbol: str, interval: str = "1m", limit: int = 100):
+    """Most recent OHLCV bars for one interval, oldest first"""
+    data_store = storage.data_store
+    if symbol not in data_store.companies:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Invalid stock symbol"
+        )
+    if interval not in data_store.candles.intervals:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"interval must be one of {list(data_store.candles.intervals)}",
+        )
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "candles": [
+            bar.to_dict(symbol)
+            for bar in data_store.candles.latest(symbol, interval, limit)
+        ],
+    }
 
 
 @router.get("/market/price/{symbol}", response_model=float)
@@ -135,17 +711,81 @@ async def get_current_price(symbol: str):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Invalid stock symbol"
         )
-    return storage.data_store.companies[symbol]["price"]
+    return from_ticks(symbol, storage.data_store.get_price(symbol))
+
+
+@router.get("/market/leaderboard", response_model=list)
+async def get_leaderboard(n: int = 10, trader_id: Optional[List[str]] = Query(None)):
+    """
+    Top n traders by mark-to-market P&L, served from the maintained
+    ranking. With trader_id (repeatable), those traders' standings.
+    """
+    data_store = storage.data_store
+    if not 1 <= n <= settings.LEADERBOARD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"n must be between 1 and {settings.LEADERBOARD_MAX_SIZE}",
+        )
+    if trader_id is None:
+        entries = data_store.leaderboard.top(n)
+    else:
+        entries = [
+            data_store.leaderboard.standing(one)
+            for one in trader_id
+            if one in data_store.traders
+        ]
+    for entry in entries:
+        entry["name"] = data_store.traders[entry["trader_id"]]["name"]
+    return entries
 
 
 @router.get("/market/fee-estimate", response_model=dict)
-async def estimate_fee(price: float, quantity: int):
-    """Estimate trading fees for a transaction"""
-    trade_value = price * quantity
-    fees = calculate_trading_fees(trade_value)
-    return {
-        "trade_value": trade_value,
-        "fees": fees,
-        "buyer_total": trade_value + fees["buyer_fee"],
-        "seller_receives": trade_value - fees["seller_fee"],
+async def estimate_fee(price: float, quantity: int, trader_id: Optional[str] = None):
+    """
+    Estimate trading fees for a transaction, as taker; maker_fee is the
+    cost if the order rests instead. Base tier unless trader_id is given,
+    then at that trader's current volume tier.
+    """
+    data_store = storage.data_store
+    schedule = data_store.fee_schedule
+    tier, volume = 0, None
+    if trader_id is not None:
+        if trader_id not in data_store.traders:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Trader not found"
+            )
+        now = data_store.now()
+        tier = schedule.tier(trader_id, now)
+        volume = schedule.volume(trader_id, now)
+
+    rates = schedule.describe(tier)
+    trade_value = to_minor(price * quantity)
+    fees = calculate_trading_fees(
+        trade_value, rates["taker_percent"], rates["taker_percent"]
+    )
+    maker_fee = calculate_trading_fees(
+        trade_value, rates["maker_percent"], rates["maker_percent"]
+    )["buyer_fee"]
+    result = {
+        "trade_value": from_minor(trade_value),
+        "fees": {side: from_minor(fee) for side, fee in fees.items()},
+        "buyer_total": from_minor(trade_value + fees["buyer_fee"]),
+        "seller_receives": from_minor(trade_value - fees["seller_fee"]),
+        "maker_fee": from_minor(maker_fee),
+        "taker_fee": from_minor(fees["buyer_fee"]),
+        "tier": rates,
     }
+    if volume is not None:
+        result["rolling_volume"] = from_minor(volume)
+    return result
+
+
+# =====================
+# MONITORING
+# =====================
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of every registered metric"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
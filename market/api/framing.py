@@ -0,0 +1,254 @@
+# ==============================================
+# Binary Order-Entry Framing
+# ==============================================
+# Fixed-layout little-endian frames for order entry over
+# the WebSocket, negotiated with the "ecocome.binary.v2"
+# subprotocol. Each frame starts with a one-byte type and
+# the client's u32 request_id (0 on unsolicited messages):
+#
+# Client -> server
+#   PLACE   0x01  trader_id 36s, symbol 8s, price f64
+#                 (NaN: market order), quantity u32,
+#                 side u8 (0 buy, 1 sell), time in force
+#                 u8 (0 GTC, 1 IOC, 2 FOK)
+#   CANCEL  0x02  order_id u64
+#   AMEND   0x03  order_id u64, price f64 (NaN: keep),
+#                 quantity u32 (0: keep)
+#
+# Server -> client
+#   ORDER_ACK  0x81  order_id u64, resting u8, filled u32,
+#                    remaining u32, fill count u16, then per
+#                    fill: trade_id u64, price f64, qty u32
+#   AMEND_ACK  0x82  same layout as ORDER_ACK
+#   CANCEL_ACK 0x83  order_id u64, cancelled quantity u32
+#   EXECUTION  0x84  trade_id u64, symbol 8s, price f64,
+#                    quantity u32, side u8, trader_id 36s
+#   REJECT     0x8F  status u16, then the UTF-8 detail
+#
+# Strings are NUL-padded ASCII/UTF-8. Decoded requests and
+# the replies to encode are the same dicts as the JSON
+# protocol (see order_entry.py), so both share one handler.
+# ==============================================
+
+import math
+import struct
+from typing import Optional
+
+SUBPROTOCOL = "ecocome.binary.v2"
+
+PLACE, CANCEL, AMEND = 0x01, 0x02, 0x03
+ORDER_ACK, AMEND_ACK, CANCEL_ACK, EXECUTION, REJECT = 0x81, 0x82, 0x83, 0x84, 0x8F
+
+HEADER = struct.Struct("<BI")
+PLACE_FRAME = struct.Struct("<BI36s8sdIBB")
+CANCEL_FRAME = struct.Struct("<BIQ")
+AMEND_FRAME = struct.Struct("<BIQdI")
+ACK_FRAME = struct.Struct("<BIQBIIH")
+FILL = struct.Struct("<QdI")
+CANCEL_ACK_FRAME = struct.Struct("<BIQI")
+EXECUTION_FRAME = struct.Struct("<BIQ8sdIB36s")
+REJECT_FRAME = struct.Struct("<BIH")
+
+SIDES = ("buy", "sell")
+TIME_IN_FORCE = ("GTC", "IOC", "FOK")
+ACK_TYPES = {"order_ack": ORDER_ACK, "amend_ack": AMEND_ACK}
+
+
+class FramingError(ValueError):
+    """A frame that doesn't match its declared layout"""
+
+    def __init__(self, detail: str, request_id: int = 0):
+        super().__init__(detail)
+        self.request_id = request_id
+
+
+def _text(raw: bytes, request_id: int = 0) -> str:
+    try:
+        return raw.rstrip(b"\0").decode()
+    except UnicodeDecodeError:
+        raise FramingError("Invalid UTF-8 in text field", request_id)
+
+
+def _fixed(value: str, size: int, field: str) -> bytes:
+    raw = value.encode()
+    if len(raw) > size:
+        raise FramingError(f"{field} longer than {size} bytes")
+    return raw
+
+
+def decode_request(frame: bytes) -> dict:
+    """A client frame as the equivalent JSON-protocol request"""
+    if len(frame) < HEADER.size:
+        raise FramingError("Truncated frame")
+    kind, request_id = HEADER.unpack_from(frame)
+    layout = {PLACE: PLACE_FRAME, CANCEL: CANCEL_FRAME, AMEND: AMEND_FRAME}.get(kind)
+    if layout is None:
+        raise FramingError("Unknown frame type", request_id)
+    if len(frame) != layout.size:
+        raise FramingError("Frame size does not match its type", request_id)
+
+    if kind == PLACE:
+        _, _, trader_id, symbol, price, quantity, side, tif = layout.unpack(frame)
+        if side >= len(SIDES):
+            raise FramingError("Invalid order side", request_id)
+        if tif >= len(TIME_IN_FORCE):
+            raise FramingError("Invalid time in force", request_id)
+        order = {
+            "trader_id": _text(trader_id, request_id),
+            "symbol": _text(symbol, request_id),
+            "price": price,
+            "quantity": quantity,
+            "order_type": SIDES[side],
+            "time_in_force": TIME_IN_FORCE[tif],
+        }
+        if math.isnan(price):
+            order.update(price=None, kind="market")
+        return {"action": "place", "request_id": request_id, "order": order}
+    if kind == CANCEL:
+        _, _, order_id = layout.unpack(frame)
+        return {"action": "cancel", "request_id": request_id, "order_id": order_id}
+
+    _, _, order_id, price, quantity = layout.unpack(frame)
+    return {
+        "action": "amend",
+        "request_id": request_id,
+        "order_id": order_id,
+        "price": None if math.isnan(price) else price,
+        "quantity": quantity or None,
+    }
+
+
+def encode_request(request: dict) -> bytes:
+    """Client side of decode_request, for tools and tests"""
+    action, request_id = request["action"], request.get("request_id", 0)
+    if action == "place":
+        order = request["order"]
+        market = order.get("kind") == "market"
+        time_in_force = order.get("time_in_force") or ("IOC" if market else "GTC")
+        return PLACE_FRAME.pack(
+            PLACE,
+            request_id,
+            _fixed(order["trader_id"], 36, "trader_id"),
+            _fixed(order["symbol"], 8, "symbol"),
+            math.nan if market else order["price"],
+            order["quantity"],
+            SIDES.index(order["order_type"]),
+            TIME_IN_FORCE.index(time_in_force),
+        )
+    if action == "cancel":
+        return CANCEL_FRAME.pack(CANCEL, request_id, request["order_id"])
+    price = request.get("price")
+    return AMEND_FRAME.pack(
+        AMEND,
+        request_id,
+        request["order_id"],
+        math.nan if price is None else price,
+        request.get("quantity") or 0,
+    )
+
+
+def encode_reply(message: dict) -> Optional[bytes]:
+    """A server message as a frame; None for types with no binary form"""
+    try:
+        return _encode_reply(message)
+    except struct.error as error:
+        raise FramingError(str(error), message.get("request_id") or 0)
+
+
+def _encode_reply(message: dict) -> Optional[bytes]:
+    kind = message["type"]
+    request_id = message.get("request_id") or 0
+    if kind in ACK_TYPES:
+        fills = message["fills"]
+        frame = ACK_FRAME.pack(
+            ACK_TYPES[kind],
+            request_id,
+            message["order_id"],
+            message["resting"],
+            message.get("filled_quantity", 0),
+            message["remaining_quantity"],
+            len(fills),
+        )
+        return frame + b"".join(
+            FILL.pack(fill["trade_id"], fill["price"], fill["quantity"])
+            for fill in fills
+        )
+    if kind == "cancel_ack":
+        return CANCEL_ACK_FRAME.pack(
+            CANCEL_ACK, request_id, message["order_id"], message["quantity"]
+        )
+    if kind == "execution":
+        trade = message["trade"]
+        return EXECUTION_FRAME.pack(
+            EXECUTION,
+            request_id,
+            trade["trade_id"],
+            _fixed(trade["symbol"], 8, "symbol"),
+            trade["price"],
+            trade["quantity"],
+            SIDES.index(message["side"]),
+            _fixed(message["trader_id"], 36, "trader_id"),
+        )
+    if kind == "order_reject":
+        return (
+            REJECT_FRAME.pack(REJECT, request_id, message["status_code"])
+            + str(message["detail"]).encode()
+        )
+    return None
+
+
+def decode_reply(frame: bytes) -> dict:
+    """Client side of encode_reply, for tools and tests"""
+    kind, request_id = HEADER.unpack_from(frame)
+    if kind in (ORDER_ACK, AMEND_ACK):
+        _, _, order_id, resting, filled, remaining, count = ACK_FRAME.unpack_from(frame)
+        fills = [
+            dict(zip(("trade_id", "price", "quantity"), FILL.unpack_from(frame, at)))
+            for at in range(
+                ACK_FRAME.size, ACK_FRAME.size + count * FILL.size, FILL.size
+            )
+        ]
+        message = {
+            "type": "order_ack" if kind == ORDER_ACK else "amend_ack",
+            "request_id": request_id,
+            "order_id": order_id,
+            "resting": bool(resting),
+            "filled_quantity": filled,
+            "remaining_quantity": remaining,
+            "fills": fills,
+        }
+        if kind == AMEND_ACK:
+            del message["filled_quantity"]
+        return message
+    if kind == CANCEL_ACK:
+        _, _, order_id, quantity = CANCEL_ACK_FRAME.unpack(frame)
+        return {
+            "type": "cancel_ack",
+            "request_id": request_id,
+            "order_id": order_id,
+            "quantity": quantity,
+        }
+    if kind == EXECUTION:
+        _, _, trade_id, symbol, price, quantity, side, trader_id = (
+            EXECUTION_FRAME.unpack(frame)
+        )
+        return {
+            "type": "execution",
+            "trader_id": _text(trader_id),
+            "side": SIDES[side],
+            "trade": {
+                "trade_id": trade_id,
+                "symbol": _text(symbol),
+                "price": price,
+                "quantity": quantity,
+            },
+        }
+    if kind == REJECT:
+        _, _, status_code = REJECT_FRAME.unpack_from(frame)
+        return {
+            "type": "order_reject",
+            "request_id": request_id,
+            "status_code": status_code,
+            "detail": frame[REJECT_FRAME.size :].decode(),
+        }
+    raise FramingError("Unknown frame type", request_id)
@@ -0,0 +1,111 @@
+# ==============================================
+# WebSocket Order Entry
+# ==============================================
+# Places, cancels and amends orders sent over /ws, through
+# the same handlers (validation, locks, journal sync,
+# market-data publishing) as the REST endpoints, so the two
+# paths can't drift apart. Requests are applied one at a
+# time per connection, in the order they arrive.
+#
+# Every request gets exactly one reply, echoing its
+# request_id:
+#   order_ack   order_id, resting, filled_quantity,
+#               remaining_quantity, fills
+#   amend_ack   order_id, resting, remaining_quantity, fills
+#   cancel_ack  order_id, quantity (what was still resting)
+#   order_reject status_code, detail (as the REST error)
+#
+# Placing an order subscribes the connection to its
+# trader's execution reports, one per fill for each side:
+#   {"type": "execution", "trader_id": ..., "side": "buy",
+#    "trade": {...}}
+# Reports for an order's immediate fills arrive before its
+# ack; later fills against the resting remainder arrive as
+# they happen.
+# ==============================================
+
+from typing import List
+from fastapi import HTTPException, status
+from ..models import Order, OrderAmend
+from . import endpoints
+from .websocket import ClientConnection, ConnectionManager
+
+
+class LocalGateway:
+    """Orders into this process's engine via the REST handlers"""
+
+    async def place(self, order: Order) -> dict:
+        return await endpoints.place_order(order)
+
+    async def cancel(self, order_id: int) -> dict:
+        return await endpoints.cancel_order(order_id)
+
+    async def amend(self, order_id: int, amend: OrderAmend) -> dict:
+        return await endpoints.amend_order(order_id, amend)
+
+
+LOCAL_GATEWAY = LocalGateway()
+
+
+def _plain(value) -> dict:
+    return value if isinstance(value, dict) else value.model_dump()
+
+
+def _fills(result: dict) -> List[dict]:
+    return [_plain(fill) for fill in result["fills"]]
+
+
+async def handle_order_request(
+    manager: ConnectionManager, client: ClientConnection, request: dict
+):
+    """Run one place/cancel/amend request and reply to the client"""
+    request_id = request.get("request_id")
+    gateway = manager.order_gateway or LOCAL_GATEWAY
+    try:
+        action = request["action"]
+        if action == "place":
+            order = Order(**request["order"])
+            manager.follow_trader(client, order.trader_id)
+            result = await gateway.place(order)
+            reply = {
+                "type": "order_ack",
+                "order_id": result["order_id"],
+                "resting": result["resting"],
+                "filled_quantity": result["filled_quantity"],
+                "remaining_quantity": result["remaining_quantity"],
+                "fills": _fills(result),
+            }
+        elif action == "cancel":
+            order = _plain((await gateway.cancel(int(request["order_id"])))["order"])
+            reply = {
+                "type": "cancel_ack",
+                "order_id": order["order_id"],
+                "quantity": order["quantity"],
+            }
+        else:
+            amend = OrderAmend(
+                price=request.get("price"), quantity=request.get("quantity")
+            )
+            result = await gateway.amend(int(request["order_id"]), amend)
+            reply = {
+                "type": "amend_ack",
+                "order_id": result["order_id"],
+                "resting": result["resting"],
+                "remaining_quantity": result["remaining_quantity"],
+                "fills": _fills(result),
+            }
+    except HTTPException as error:
+        reply = {
+            "type": "order_reject",
+            "status_code": error.status_code,
+            "detail": error.detail,
+        }
+    except (ValueError, KeyError, TypeError):
+        # Includes pydantic's ValidationError
+        reply = {
+            "type": "order_reject",
+            "status_code": status.HTTP_400_BAD_REQUEST,
+            "detail": "Malformed order request",
+        }
+    reply["request_id"] = request_id
+    manager.reply(client, reply)
@@ -3,41 +3,433 @@
 # ==============================================
 # This module handles real-time market data broadcasting:
 # - Manages WebSocket connections from clients
-# - Broadcasts market updates to all connected clients
+# - Per-symbol subscriptions on the prices, trades, book
+#   and candles channels, indexed (channel, symbol) -> clients
+# - Order entry (place/cancel/amend) on the same socket, see
+#   order_entry.py, with execution reports per trader
 # - Handles connection/disconnection events
-# - Maintains list of active connections
+#
+# Fan-out never waits on a client: each message is
+# serialized to JSON once, then queued on every subscriber's
+# bounded send queue and written by that client's own task.
+# Updates that carry a conflation key (e.g. book snapshots)
+# replace a still-pending older copy instead of queueing
+# behind it; when a queue is full the oldest entry is
+# dropped. A failed send evicts only that connection.
+#
+# Prices are sent as deltas: each client accumulates the
+# symbols that changed since its last price message, and
+# gets them in one price_update when its writer is free.
+#
+# Client protocol (JSON text frames):
+#   {"action": "subscribe", "channel": "prices", "symbols": ["AAPL"]}
+#   {"action": "unsubscribe", "channel": "trades", "symbols": ["*"]}
+#   {"action": "place", "request_id": 1, "order": {...Order}}
+#   {"action": "cancel", "request_id": 2, "order_id": 7}
+#   {"action": "amend", "request_id": 3, "order_id": 7, "price": 181.0}
+# "*" subscribes to every symbol. New connections start on
+# prices/"*" until their first explicit subscribe. The
+# executions channel is keyed by trader ID instead of symbol;
+# placing an order subscribes the connection to its trader.
+#
+# Clients that offer the framing.SUBPROTOCOL subprotocol may
+# send orders as binary frames and get their acks, rejects
+# and execution reports back binary; market data stays JSON.
 # ==============================================
 
-from fastapi import WebSocket
-from typing import List
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, Optional, Set, Tuple, Union
+from fastapi import WebSocket, status
+from ..config import settings
+from ..data import storage
+from ..market.units import from_ticks
+from ..metrics import CallbackGauge, Counter, Histogram
+from . import framing
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("prices", "trades", "book", "candles", "executions")
+ORDER_ACTIONS = ("place", "cancel", "amend")
+ALL_SYMBOLS = "*"
+PRICE_UPDATE = "price_update"
+
+FANOUT_LATENCY = Histogram(
+    "market_ws_fanout_seconds", "Time to queue one message for its audience", ["kind"]
+)
+FANOUT_CLIENTS = Counter(
+    "market_ws_fanout_messages_total", "Messages queued for clients", ["kind"]
+)
+DROPPED = Counter("market_ws_dropped_messages_total", "Messages dropped on full queues")
+
+
+class ClientConnection:
+    """One connected client with its own bounded send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, max_queue: int, binary: bool = False):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        # Negotiated framing.SUBPROTOCOL: order replies go out as bytes
+        self.binary = binary
+        # Entries are either a payload or a conflation key into `pending`
+        self.queue: Deque[tuple] = deque()
+        self.pending: Dict[str, Optional[Union[str, bytes]]] = {}
+        # Prices changed since the last price_update sent to this client
+        self.price_deltas: Dict[str, float] = {}
+        self.subscriptions: Set[Tuple[str, str]] = set()
+        self.implicit_subscription = True
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def _make_room(self):
+        if len(self.queue) < self.max_queue:
+            return
+        is_key, entry = self.queue.popleft()
+        if is_key and entry == PRICE_UPDATE:
+            # Price deltas are cumulative, never drop them; drop the next one
+            self.queue.append((is_key, entry))
+            if len(self.queue) == 1:
+                return
+            is_key, entry = self.queue.popleft()
+        if is_key:
+            self.pending.pop(entry, None)
+        self.dropped += 1
+        DROPPED.inc()
+
+    def enqueue(self, payload: Union[str, bytes], conflate_key: Optional[str] = None):
+        if conflate_key is not None and conflate_key in self.pending:
+            # Stale update still waiting: overwrite it in place
+            self.pending[conflate_key] = payload
+            return
+
+        self._make_room()
+        if conflate_key is None:
+            self.queue.append((False, payload))
+        else:
+            self.pending[conflate_key] = payload
+            self.queue.append((True, conflate_key))
+        self.ready.set()
+
+    def enqueue_prices(self, prices: Dict[str, float]):
+        self.price_deltas.update(prices)
+        if PRICE_UPDATE not in self.pending:
+            self._make_room()
+            self.pending[PRICE_UPDATE] = None
+            self.queue.append((True, PRICE_UPDATE))
+            self.ready.set()
+
+    def _next_payload(self) -> Union[str, bytes]:
+        is_key, entry = self.queue.popleft()
+        if not is_key:
+            return entry
+        payload = self.pending.pop(entry)
+        if entry == PRICE_UPDATE:
+            payload = json.dumps(
+                {
+                    "type": PRICE_UPDATE,
+                    "prices": self.price_deltas,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            )
+            self.price_deltas = {}
+        return payload
+
+    async def writer(self, manager: "ConnectionManager"):
+        try:
+            while True:
+                await self.ready.wait()
+                while self.queue:
+                    payload = self._next_payload()
+                    if isinstance(payload, bytes):
+                        await self.websocket.send_bytes(payload)
+                    else:
+                        await self.websocket.send_text(payload)
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.info("Evicting WebSocket client after send failure: %s", error)
+            manager.disconnect(self.websocket)
+
+
+def engine_prices() -> Dict[str, float]:
+    """Current price of every symbol in this process's engine, API units"""
+    data_store = storage.data_store
+    return {
+        symbol: from_ticks(symbol, data_store.get_price(symbol))
+        for symbol in data_store.price_engine.symbols
+        if symbol in data_store.companies
+    }
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, price_source: Callable[[], Dict[str, float]] = engine_prices):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # (channel, symbol) -> subscribed clients; symbol may be "*"
+        self.subscribers: Dict[Tuple[str, str], Set[ClientConnection]] = {}
+        # Where connect/subscribe price snapshots come from; a sharded
+        # front end swaps in its mirror of the shards' prices
+        self.price_source = price_source
+        # Where WebSocket orders go; None means this process's own
+        # engine (order_entry.LocalGateway), a front end routes them
+        self.order_gateway = None
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+    async def connect(self, websocket: WebSocket) -> ClientConnection:
+        offered = getattr(websocket, "scope", {}).get("subprotocols", ())
+        binary = framing.SUBPROTOCOL in offered
+        if binary:
+            await websocket.accept(subprotocol=framing.SUBPROTOCOL)
+        else:
+            await websocket.accept()
+        client = ClientConnection(websocket, settings.WS_SEND_QUEUE_SIZE, binary)
+        client.task = asyncio.create_task(client.writer(self))
+        self.active_connections[websocket] = client
+        self._add_subscription(client, ("prices", ALL_SYMBOLS))
+        self._send_price_snapshot(client, [ALL_SYMBOLS])
+        return client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        for topic in list(client.subscriptions):
+            self._remove_subscription(client, topic)
+        if client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def _add_subscription(self, client: ClientConnection, topic: Tuple[str, str]):
+        self.subscribers.setdefault(topic, set()).add(client)
+        client.subscriptions.add(topic)
+
+    def _remove_subscription(self, client: ClientConnection, topic: Tuple[str, str]):
+        clients = self.subscribers.get(topic)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del self.subscribers[topic]
+        client.subscriptions.discard(topic)
+
+    def subscribe(self, client: ClientConnection, channel: str, symbols: Iterable[str]):
+        if client.implicit_subscription:
+            client.implicit_subscription = False
+            self._remove_subscription(client, ("prices", ALL_SYMBOLS))
+        symbols = list(symbols)
+        for symbol in symbols:
+            self._add_subscription(client, (channel, symbol))
+
+        if channel == "prices":
+            # Start the client off with a snapshot of what it now watches
+            self._send_price_snapshot(client, symbols)
+
+    def _send_price_snapshot(self, client: ClientConnection, symbols: Iterable[str]):
+        prices = self.price_source()
+        if ALL_SYMBOLS in symbols:
+            snapshot = dict(prices)
+        else:
+            snapshot = {s: prices[s] for s in symbols if s in prices}
+        if snapshot:
+            client.enqueue_prices(snapshot)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+    def unsubscribe(
+        self, client: ClientConnection, channel: str, symbols: Iterable[str]
+    ):
+        for symbol in symbols:
+            self._remove_subscription(client, (channel, symbol))
+
+    def _audience(self, channel: str, symbol: str) -> Set[ClientConnection]:
+        clients = self.subscribers.get((channel, symbol), set())
+        everyone = self.subscribers.get((channel, ALL_SYMBOLS))
+        return clients | everyone if everyone else clients
+
+    async def broadcast(
+        self, message: Union[str, dict], conflate_key: Optional[str] = None
+    ):
+        """Queue a message for every client; never waits on a socket"""
+        started = time.perf_counter()
+        payload = (
+            message if isinstance(message, str) else json.dumps(message, default=str)
+        )
+        clients = list(self.active_connections.values())
+        for client in clients:
+            client.enqueue(payload, conflate_key)
+        self._observe_fanout("broadcast", started, len(clients))
+
+    async def publish(
+        self,
+        channel: str,
+        symbol: str,
+        message: Union[str, dict],
+        conflate_key: Optional[str] = None,
+    ):
+        """Queue a message for the subscribers of one channel/symbol only"""
+        clients = self._audience(channel, symbol)
+        if not clients:
+            return
+        started = time.perf_counter()
+        payload = (
+            message if isinstance(message, str) else json.dumps(message, default=str)
+        )
+        for client in clients:
+            client.enqueue(payload, conflate_key)
+        self._observe_fanout(channel, started, len(clients))
+
+    async def publish_execution(self, message: dict):
+        """Send an execution report to the connections following its trader"""
+        clients = self._audience("executions", message["trader_id"])
+        if not clients:
+            return
+        started = time.perf_counter()
+        text, frame = None, None
+        for client in clients:
+            if client.binary:
+                try:
+                    frame = frame or framing.encode_reply(message)
+                except framing.FramingError:
+                    frame = text = text or json.dumps(message, default=str)
+                client.enqueue(frame)
+            else:
+                text = text or json.dumps(message, default=str)
+                client.enqueue(text)
+        self._observe_fanout("executions", started, len(clients))
+
+    def reply(self, client: ClientConnection, message: dict):
+        """Answer one client in its negotiated encoding"""
+        frame = None
+        if client.binary:
+            try:
+                frame = framing.encode_reply(message)
+            except framing.FramingError:
+                pass  # doesn't fit the fixed layout: send it as JSON
+        client.enqueue(frame or json.dumps(message, default=str))
+
+    def follow_trader(self, client: ClientConnection, trader_id: str):
+        """Route the trader's execution reports to this client"""
+        self._add_subscription(client, ("executions", trader_id))
+
+    async def publish_prices(self, prices: Dict[str, float]):
+        """Hand each price subscriber the changed symbols it watches"""
+        started = time.perf_counter()
+        everyone = self.subscribers.get(("prices", ALL_SYMBOLS), ())
+        sent = len(everyone)
+        for client in everyone:
+            client.enqueue_prices(prices)
+        for symbol, price in prices.items():
+            for client in self.subscribers.get(("prices", symbol), ()):
+                if client not in everyone:
+                    client.enqueue_prices({symbol: price})
+                    sent += 1
+        self._observe_fanout("prices", started, sent)
+
+    @staticmethod
+    def _observe_fanout(kind: str, started: float, clients: int):
+        FANOUT_LATENCY.labels(kind).observe(time.perf_counter() - started)
+        FANOUT_CLIENTS.labels(kind).inc(clients)
+
+    async def handle_message(self, client: ClientConnection, text: str):
+        """Apply a subscribe/unsubscribe or order request from a client"""
+        try:
+            request = json.loads(text)
+            action = request["action"]
+            if action not in ORDER_ACTIONS:
+                channel = request["channel"]
+                symbols = request.get("symbols", [ALL_SYMBOLS])
+                if isinstance(symbols, str):
+                    symbols = [symbols]
+                if not isinstance(symbols, list) or not all(
+                    isinstance(symbol, str) for symbol in symbols
+                ):
+                    raise TypeError("symbols must be a list of strings")
+        except (ValueError, KeyError, TypeError):
+            client.enqueue(json.dumps({"type": "error", "detail": "Malformed request"}))
+            return
+
+        if action in ORDER_ACTIONS:
+            # Imported late: order entry sits on top of the endpoints,
+            # which publish through this module
+            from .order_entry import handle_order_request
+
+            await handle_order_request(self, client, request)
+            return
+
+        if channel not in CHANNELS or action not in ("subscribe", "unsubscribe"):
+            client.enqueue(
+                json.dumps({"type": "error", "detail": "Unknown action or channel"})
+            )
+            return
+
+        if action == "subscribe":
+            self.subscribe(client, channel, symbols)
+        else:
+            self.unsubscribe(client, channel, symbols)
+        client.enqueue(
+            json.dumps({"type": action + "d", "channel": channel, "symbols": symbols})
+        )
+
+    async def handle_binary(self, client: ClientConnection, frame: bytes):
+        """Apply an order request sent as a binary frame"""
+        from .order_entry import handle_order_request
+
+        try:
+            request = framing.decode_request(frame)
+        except framing.FramingError as error:
+            self.reply(
+                client,
+                {
+                    "type": "order_reject",
+                    "request_id": error.request_id,
+                    "status_code": status.HTTP_400_BAD_REQUEST,
+                    "detail": str(error),
+                },
+            )
+            return
+        await handle_order_request(self, client, request)
 
 
 # Global WebSocket manager
 manager = ConnectionManager()
 
 
+def _queue_depths():
+    depths = [len(client.queue) for client in manager.active_connections.values()]
+    return [(("total",), sum(depths)), (("max",), max(depths, default=0))]
+
+
+CallbackGauge(
+    "market_ws_clients",
+    "Connected WebSocket clients",
+    [],
+    lambda: [((), len(manager.active_connections))],
+)
+CallbackGauge(
+    "market_ws_queue_depth",
+    "Pending messages across client send queues",
+    ["stat"],
+    _queue_depths,
+)
+
+
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket for real-time market updates"""
-    await manager.connect(websocket)
+    client = await manager.connect(websocket)
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
-    except:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                await manager.handle_binary(client, message["bytes"])
+            else:
+                await manager.handle_message(client, message.get("text") or "")
+    except Exception:
+        logger.exception("Closing WebSocket after an unexpected error")
+        try:
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        except Exception:
+            pass  # already gone
+    finally:
         manager.disconnect(websocket)
@@ -0,0 +1,100 @@
+# ==============================================
+# Cluster Launcher
+# ==============================================
+# Starts a sharded market on one machine:
+# - SHARD_COUNT engine processes, each the regular
+#   market.main app (own books, journal and simulator for
+#   the symbols it owns) listening on a Unix socket
+# - FRONTEND_WORKERS uvicorn workers running the front end
+#   on HOST:PORT, routing to the shards
+#
+# Usage:
+#   python -m market.cluster --shards 4 --workers 2
+# ==============================================
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import uvicorn
+from ..config import settings
+from .sharding import socket_path
+
+STARTUP_TIMEOUT = 30.0
+
+
+def run_shard(index: int, shard_count: int, socket_dir: str):
+    """Entry point of one engine shard process"""
+    settings.SHARD_INDEX = index
+    settings.SHARD_COUNT = shard_count
+    settings.SHARD_SOCKET_DIR = socket_dir
+    uvicorn.run(
+        "market.main:app", uds=socket_path(index, socket_dir), log_level="warning"
+    )
+
+
+def wait_for_sockets(paths, processes) -> bool:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if any(not process.is_alive() for process in processes):
+            return False
+        if all(os.path.exists(path) for path in paths):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run a sharded market")
+    parser.add_argument("--shards", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--workers", type=int, default=settings.FRONTEND_WORKERS)
+    parser.add_argument("--socket-dir", default=settings.SHARD_SOCKET_DIR)
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.socket_dir, exist_ok=True)
+    paths = [socket_path(index, args.socket_dir) for index in range(args.shards)]
+    for path in paths:
+        # Left over from an earlier run that didn't shut down cleanly
+        if os.path.exists(path):
+            os.unlink(path)
+
+    shards = [
+        multiprocessing.Process(
+            target=run_shard,
+            args=(index, args.shards, args.socket_dir),
+            name=f"market-shard-{index}",
+            daemon=True,
+        )
+        for index in range(args.shards)
+    ]
+    for process in shards:
+        process.start()
+    try:
+        if not wait_for_sockets(paths, shards):
+            print("shards failed to start", file=sys.stderr)
+            return 1
+
+        # Front-end workers are spawned fresh; they read these at import
+        os.environ["MARKET_SHARD_COUNT"] = str(args.shards)
+        os.environ["MARKET_SHARD_SOCKET_DIR"] = args.socket_dir
+        settings.SHARD_COUNT = args.shards
+        settings.SHARD_SOCKET_DIR = args.socket_dir
+        uvicorn.run(
+            "market.cluster.frontend:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+        )
+    finally:
+        for process in shards:
+            process.terminate()
+        for process in shards:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,626 @@
+# ==============================================
+# Sharded API Front End
+# ==============================================
+# Serves the same REST and WebSocket API as market.main, but
+# owns no order books: every request is routed over a Unix
+# socket to the engine shard(s) that own the data.
+# - Per symbol: orders, company registration, book, depth,
+#   candles, price
+# - Per order ID: cancel and amend (IDs are strided by shard)
+# - Merged across shards: companies, traders, trades,
+#   leaderboard
+# - Fanned out: trader registration (one sub-account per
+#   shard, cash split evenly); batches are split per shard
+# - Funded on demand: a single order short of cash on its
+#   shard pulls the trader's free cash from the other shards
+#   and is retried once
+#
+# Market data comes back the other way: one WebSocket per
+# shard subscribed to every channel, re-published through
+# this process's own ConnectionManager, with a price mirror
+# for the snapshots new clients start with. Orders sent
+# over the WebSocket go to the owning shard through
+# ShardGateway, and execution reports are relayed per trader.
+#
+# Run several front-end workers with `python -m market.cluster`.
+# ==============================================
+
+import asyncio
+import heapq
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+import httpx
+import websockets
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Response, status
+from ..api import websocket
+from ..api.endpoints import (
+    EXPORT_BATCH,
+    NEXT_CURSOR_HEADER,
+    check_export_format,
+    decode_cursor,
+    encode_cursor,
+    estimate_fee,
+    export_response,
+    format_export,
+    metrics,
+)
+from ..api.websocket import ALL_SYMBOLS, CHANNELS, manager
+from ..config import settings
+from ..metrics import MetricsMiddleware
+from ..models import Order, OrderAmend, OrderBatch
+from .sharding import (
+    merge_companies,
+    merge_standings,
+    merge_trades,
+    merge_traders,
+    next_trade_positions,
+    shard_for_id,
+    shard_for_symbol,
+    socket_path,
+    split_cash,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# One keep-alive HTTP client per shard, index = shard number
+shards: List[httpx.AsyncClient] = []
+
+# Latest price per symbol as streamed by the shards
+prices: Dict[str, float] = {}
+
+
+def _relay(response: httpx.Response) -> Response:
+    """Pass a shard's response through without re-encoding it"""
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type"),
+    )
+
+
+async def _forward(shard: httpx.AsyncClient, request: Request) -> Response:
+    response = await shard.request(
+        request.method,
+        request.url.path,
+        params=request.query_params.multi_items(),
+        content=await request.body(),
+        headers={"content-type": request.headers.get("content-type", "")},
+    )
+    return _relay(response)
+
+
+async def _gather(method: str, path: str, **kwargs) -> List[httpx.Response]:
+    return await asyncio.gather(
+        *(shard.request(method, path, **kwargs) for shard in shards)
+    )
+
+
+def _first_error(responses: List[httpx.Response]):
+    for response in responses:
+        if response.status_code != status.HTTP_200_OK:
+            return _relay(response)
+    return None
+
+
+def _by_symbol(symbol: str) -> httpx.AsyncClient:
+    return shards[shard_for_symbol(symbol)]
+
+
+# =====================
+# COMPANY ENDPOINTS
+# =====================
+@router.post("/company/register")
+async def register_company(symbol: str, request: Request):
+    return await _forward(_by_symbol(symbol), request)
+
+
+@router.get("/market/companies", response_model=dict)
+async def get_companies():
+    responses = await _gather("GET", "/market/companies")
+    return _first_error(responses) or merge_companies(r.json() for r in responses)
+
+
+# =====================
+# TRADER ENDPOINTS
+# =====================
+@router.post("/trader/register")
+async def register_trader(name: str, cash: float):
+    """One sub-account per shard under the same ID, cash split evenly"""
+    trader_id = str(uuid.uuid4())
+    responses = await asyncio.gather(
+        *(
+            shard.post(
+                "/trader/register",
+                params={"name": name, "cash": part, "trader_id": trader_id},
+            )
+            for shard, part in zip(shards, split_cash(cash, len(shards)))
+        )
+    )
+    return _first_error(responses) or merge_traders(r.json() for r in responses)
+
+
+@router.get("/trader/{trader_id}")
+async def get_trader(trader_id: str):
+    responses = await _gather("GET", f"/trader/{trader_id}")
+    return _first_error(responses) or merge_traders(r.json() for r in responses)
+
+
+# =====================
+# TRADING ENDPOINTS
+# =====================
+@router.post("/market/order")
+async def place_order(order: Order):
+    return _relay(await _place(order))
+
+
+def _short_of_cash(response: httpx.Response) -> bool:
+    return (
+        response.status_code == status.HTTP_201_CREATED
+        and response.json().get("detail") == "Insufficient funds"
+    )
+
+
+async def _place(order: Order) -> httpx.Response:
+    """
+    Place on the owning shard. A trader's cash is split across shards,
+    so an order short of cash there sweeps the trader's free cash from
+    the other shards into the owning one and is tried once more.
+    """
+    index = shard_for_symbol(order.symbol)
+    response = await shards[index].post("/market/order", json=order.model_dump())
+    if len(shards) > 1 and _short_of_cash(response):
+        if await _pool_cash(order.trader_id, index):
+            response = await shards[index].post(
+                "/market/order", json=order.model_dump()
+            )
+    return response
+
+
+async def _pool_cash(trader_id: str, index: int) -> bool:
+    """Move the trader's free cash on every other shard to shard `index`"""
+    sources = [other for other in range(len(shards)) if other != index]
+    responses = await asyncio.gather(
+        *(shards[other].post(f"/trader/{trader_id}/cash/withdraw") for other in sources)
+    )
+    withdrawn = [
+        (other, response.json()["amount"])
+        for other, response in zip(sources, responses)
+        if response.status_code == status.HTTP_200_OK and response.json()["amount"] > 0
+    ]
+    if not withdrawn:
+        return False
+    amount = round(sum(part for _, part in withdrawn), 2)
+    failure = await _deposit(trader_id, index, amount)
+    if failure is None:
+        return True
+    logger.warning(
+        "Deposit to shard %d for trader %s failed, refunding: %s",
+        index,
+        trader_id,
+        failure,
+    )
+    # The cash is only in flight here: hand each part back to its shard
+    for other, part in withdrawn:
+        failure = await _deposit(trader_id, other, part)
+        if failure is not None:
+            logger.error(
+                "Lost %.2f refunding shard %d for trader %s: %s",
+                part,
+                other,
+                trader_id,
+                failure,
+            )
+    return False
+
+
+async def _deposit(trader_id: str, index: int, amount: float) -> Optional[str]:
+    """Credit shard `index`; the failure as text, or None"""
+    try:
+        response = await shards[index].post(
+            f"/trader/{trader_id}/cash/deposit", params={"amount": amount}
+        )
+    except httpx.HTTPError as error:
+        return str(error) or type(error).__name__
+    if response.status_code != status.HTTP_200_OK:
+        return response.text
+    return None
+
+
+@router.post("/market/orders/batch")
+async def place_orders_batch(batch: OrderBatch):
+    """
+    Split the batch per shard and run the parts concurrently. Locks
+    are per shard, so all_or_nothing batches must stay on one shard,
+    and batch orders only spend the cash already on their shard. If a
+    shard's part fails as a whole, only that part's orders are rejected.
+    """
+    groups: Dict[int, List[int]] = {}
+    for index, order in enumerate(batch.orders):
+        groups.setdefault(shard_for_symbol(order.symbol), []).append(index)
+    if batch.all_or_nothing and len(groups) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="all_or_nothing batches must stay on one shard",
+        )
+
+    responses = await asyncio.gather(
+        *(
+            shards[shard].post(
+                "/market/orders/batch",
+                json={
+                    "orders": [batch.orders[i].model_dump() for i in indexes],
+                    "all_or_nothing": batch.all_or_nothing,
+                },
+            )
+            for shard, indexes in groups.items()
+        ),
+        return_exceptions=True,
+    )
+
+    results: List[Optional[dict]] = [None] * len(batch.orders)
+    for indexes, response in zip(groups.values(), responses):
+        for result in _shard_batch_results(response, len(indexes)):
+            result["index"] = indexes[result["index"]]
+            results[result["index"]] = result
+    accepted = sum(1 for result in results if result["accepted"])
+    return {
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results,
+    }
+
+
+def _shard_batch_results(response, count: int) -> List[dict]:
+    """
+    One shard's per-order batch results; if its part failed as a whole
+    (an error status, or no reply), each of its orders is rejected
+    with that error
+    """
+    if isinstance(response, httpx.Response):
+        if response.status_code == status.HTTP_200_OK:
+            return response.json()["results"]
+        status_code = response.status_code
+        try:
+            detail = response.json()["detail"]
+        except (ValueError, KeyError, TypeError):
+            detail = response.text
+    elif isinstance(response, httpx.HTTPError):
+        status_code = status.HTTP_502_BAD_GATEWAY
+        detail = "Shard unavailable"
+    else:
+        raise response
+    return [
+        {"index": i, "accepted": False, "status_code": status_code, "detail": detail}
+        for i in range(count)
+    ]
+
+
+@router.delete("/market/order/{order_id}")
+@router.patch("/market/order/{order_id}")
+async def route_by_order(order_id: int, request: Request):
+    if order_id < 1:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+        )
+    return await _forward(shards[shard_for_id(order_id)], request)
+
+
+@router.get("/market/orderbook/{symbol}")
+@router.get("/market/depth/{symbol}")
+@router.get("/market/candles/{symbol}")
+@router.get("/market/price/{symbol}")
+async def route_by_symbol(symbol: str, request: Request):
+    return await _forward(_by_symbol(symbol), request)
+
+
+@router.get("/market/trades")
+async def get_trades(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    symbol: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    The cursor holds one `before` trade ID per shard (-1 once a shard
+    has nothing older), so each page asks every shard for its next
+    `limit` trades below what it has already served.
+    """
+    if symbol is not None:
+        return await _forward(_by_symbol(symbol), request)
+    positions: List[Optional[int]] = [None] * len(shards)
+    if cursor is not None:
+        positions = decode_cursor(cursor).get("shards")
+        if not isinstance(positions, list) or len(positions) != len(shards):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+    params = [(k, v) for k, v in request.query_params.multi_items() if k != "cursor"]
+
+    async def page(shard: httpx.AsyncClient, position: Optional[int]):
+        if position == -1:
+            return None
+        extra = [] if position is None else [("cursor", _shard_cursor(position))]
+        return await shard.get("/market/trades", params=params + extra)
+
+    responses = await asyncio.gather(
+        *(page(shard, position) for shard, position in zip(shards, positions))
+    )
+    error = _first_error([r for r in responses if r is not None])
+    if error is not None:
+        return error
+    pages = [None if r is None else r.json() for r in responses]
+    trades = merge_trades((p for p in pages if p is not None), limit)
+    following = next_trade_positions(positions, pages, trades, limit)
+    if limit > 0 and len(trades) == limit and any(p != -1 for p in following):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"shards": following})
+    return trades
+
+
+def _shard_cursor(before: int) -> str:
+    return encode_cursor({"before": before})
+
+
+async def _shard_export(shard: httpx.AsyncClient, params: list):
+    """One shard's export as rows, read as the shard streams them"""
+    async with shard.stream(
+        "GET", "/market/trades/export", params=params + [("format", "ndjson")]
+    ) as response:
+        if response.status_code != status.HTTP_200_OK:
+            await response.aread()
+            raise HTTPException(
+                status_code=response.status_code, detail=response.json()["detail"]
+            )
+        async for line in response.aiter_lines():
+            if line:
+                yield json.loads(line)
+
+
+async def _export_heads(streams: list) -> list:
+    """
+    The first row of every shard stream as a merge heap; awaited before
+    the response starts, so a shard's error becomes this request's status
+    """
+    heap = []
+    for index, stream in enumerate(streams):
+        row = await anext(stream, None)
+        if row is not None:
+            heap.append((row["timestamp"], row["trade_id"], index, row))
+    heapq.heapify(heap)
+    return heap
+
+
+async def _merge_exports(streams: list, heap: list):
+    """k-way merge of oldest-first shard streams by (timestamp, trade_id)"""
+    while heap:
+        _, _, index, row = heap[0]
+        yield row
+        following = await anext(streams[index], None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(
+                heap,
+                (following["timestamp"], following["trade_id"], index, following),
+            )
+
+
+@router.get("/market/trades/export")
+async def export_trades(
+    request: Request,
+    format: str = "ndjson",
+    symbol: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Streams the owning shard's export, or every shard's merged oldest
+    first; only one row per shard is buffered here at a time.
+    """
+    check_export_format(format)
+    params = [(k, v) for k, v in request.query_params.multi_items() if k != "format"]
+    targets = shards if symbol is None else [_by_symbol(symbol)]
+    streams = [_shard_export(shard, params) for shard in targets]
+    rows = _merge_exports(streams, await _export_heads(streams))
+
+    async def chunks():
+        if format == "csv":
+            yield format_export([], format, header=True)
+        pending = []
+        async for row in rows:
+            pending.append(row)
+            if len(pending) >= EXPORT_BATCH:
+                yield format_export(pending, format)
+                pending = []
+        if pending:
+            yield format_export(pending, format)
+
+    return export_response(chunks(), format)
+
+
+@router.get("/market/leaderboard")
+async def get_leaderboard(n: int = 10):
+    """
+    Every trader in some shard's top n is a candidate; their standings
+    on all shards are summed. A trader outside every shard's top n can
+    still be missed, so the merged board is approximate.
+    """
+    responses = await _gather("GET", "/market/leaderboard", params={"n": n})
+    error = _first_error(responses)
+    if error is not None:
+        return error
+    candidates = sorted({entry["trader_id"] for r in responses for entry in r.json()})
+    if not candidates:
+        return []
+    responses = await _gather(
+        "GET", "/market/leaderboard", params={"n": n, "trader_id": candidates}
+    )
+    return _first_error(responses) or merge_standings((r.json() for r in responses), n)
+
+
+@router.get("/market/fee-estimate")
+async def fee_estimate(
+    request: Request,
+    price: float,
+    quantity: int,
+    trader_id: Optional[str] = None,
+    symbol: Optional[str] = None,
+):
+    """
+    Base-tier quotes need no shard. Volume tiers are per shard, so a
+    trader's quote comes from the shard that trades `symbol`.
+    """
+    if trader_id is None:
+        return await estimate_fee(price, quantity)
+    if symbol is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="symbol is required with trader_id in a sharded deployment",
+        )
+    return await _forward(_by_symbol(symbol), request)
+
+
+# =====================
+# MONITORING
+# =====================
+# This process's own metrics (HTTP routing, WebSocket fan-out)
+router.get("/metrics")(metrics)
+
+
+@router.get("/metrics/shards/{index}")
+async def shard_metrics(index: int):
+    if not 0 <= index < len(shards):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Unknown shard"
+        )
+    return _relay(await shards[index].get("/metrics"))
+
+
+# =====================
+# WEBSOCKET ORDER ENTRY
+# =====================
+def _result(response: httpx.Response) -> dict:
+    """A shard's JSON body, or its error raised as the REST handlers do"""
+    body = response.json()
+    if response.status_code != status.HTTP_200_OK:
+        raise HTTPException(status_code=response.status_code, detail=body["detail"])
+    return body
+
+
+class ShardGateway:
+    """order_entry gateway that routes like the REST endpoints above"""
+
+    async def place(self, order: Order) -> dict:
+        return _result(await _place(order))
+
+    async def cancel(self, order_id: int) -> dict:
+        shard = self._by_order(order_id)
+        return _result(await shard.delete(f"/market/order/{order_id}"))
+
+    async def amend(self, order_id: int, amend: OrderAmend) -> dict:
+        shard = self._by_order(order_id)
+        return _result(
+            await shard.patch(f"/market/order/{order_id}", json=amend.model_dump())
+        )
+
+    @staticmethod
+    def _by_order(order_id: int) -> httpx.AsyncClient:
+        if order_id < 1:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+            )
+        return shards[shard_for_id(order_id)]
+
+
+# =====================
+# MARKET DATA
+# =====================
+async def _republish(text: str):
+    """Hand one shard message to this process's subscribers"""
+    message = json.loads(text)
+    kind = message.get("type")
+    if kind == "price_update":
+        prices.update(message["prices"])
+        await manager.publish_prices(message["prices"])
+    elif kind == "trade_executed":
+        await manager.publish("trades", message["trade"]["symbol"], text)
+    elif kind == "book_update":
+        symbol = message["symbol"]
+        await manager.publish("book", symbol, text, conflate_key="book:" + symbol)
+    elif kind == "candle_update":
+        symbol = message["symbol"]
+        key = f"candle:{symbol}:{message['interval']}:{message['candle']['start']}"
+        await manager.publish("candles", symbol, text, conflate_key=key)
+    elif kind == "execution":
+        await manager.publish_execution(message)
+
+
+async def _follow_shard(index: int):
+    """Stream one shard's market data forever, reconnecting with backoff"""
+    delay = 0.5
+    while True:
+        try:
+            async with websockets.unix_connect(
+                socket_path(index), uri="ws://localhost/ws"
+            ) as connection:
+                for channel in CHANNELS:
+                    await connection.send(
+                        json.dumps(
+                            {
+                                "action": "subscribe",
+                                "channel": channel,
+                                "symbols": [ALL_SYMBOLS],
+                            }
+                        )
+                    )
+                delay = 0.5
+                async for text in connection:
+                    await _republish(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.warning("Shard %d market data feed lost: %s", index, error)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 10.0)
+
+
+app = FastAPI(
+    title="Stock Market Trading System",
+    description="Sharded front end: routes requests to the matching-engine shards",
+    version="1.0.0",
+)
+app.add_middleware(MetricsMiddleware)
+app.include_router(router)
+app.websocket("/ws")(websocket.websocket_endpoint)
+
+_feeds: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def startup_event():
+    if settings.SHARD_COUNT < 1:
+        raise RuntimeError("MARKET_SHARD_COUNT must be set for the front end")
+    for index in range(settings.SHARD_COUNT):
+        shards.append(
+            httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=socket_path(index)),
+                base_url="http://shard",
+                timeout=30.0,
+            )
+        )
+        _feeds.append(asyncio.create_task(_follow_shard(index)))
+    manager.price_source = lambda: prices
+    manager.order_gateway = ShardGateway()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in _feeds:
+        task.cancel()
+    for shard in shards:
+        await shard.aclose()
@@ -0,0 +1,123 @@
+# ==============================================
+# Symbol Sharding
+# ==============================================
+# How a sharded deployment splits the market:
+# - Symbols are hash-partitioned across SHARD_COUNT engine
+#   processes with CRC-32, which (unlike hash()) is the same
+#   in every process and every run
+# - Order and trade IDs are strided per shard (see
+#   DataStorage.partition_ids), so an ID names its shard
+# - Shards listen on Unix sockets in SHARD_SOCKET_DIR
+#
+# Plus the helpers the front end uses to merge per-shard
+# responses back into single-market answers.
+# ==============================================
+
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional
+from ..config import settings
+from ..market.units import from_minor, to_minor
+
+
+def shard_for_symbol(symbol: str, shard_count: Optional[int] = None) -> int:
+    count = shard_count or settings.SHARD_COUNT
+    return zlib.crc32(symbol.encode()) % count
+
+
+def shard_for_id(entity_id: int, shard_count: Optional[int] = None) -> int:
+    """Owning shard of an order or trade ID"""
+    count = shard_count or settings.SHARD_COUNT
+    return (entity_id - 1) % count
+
+
+def socket_path(index: int, socket_dir: Optional[str] = None) -> str:
+    return os.path.join(socket_dir or settings.SHARD_SOCKET_DIR, f"shard-{index}.sock")
+
+
+def split_cash(cash: float, shard_count: int) -> List[float]:
+    """
+    A trader's starting cash per shard sub-account: an even split in
+    minor units, with the leftover cents on the first shards
+    """
+    share, leftover = divmod(to_minor(cash), shard_count)
+    return [from_minor(share + (index < leftover)) for index in range(shard_count)]
+
+
+def merge_traders(parts: Iterable[dict]) -> dict:
+    """One trader view from its per-shard sub-accounts"""
+    parts = list(parts)
+    merged = dict(parts[0], cash=0.0, reserved_cash=0.0, portfolio={})
+    merged["reserved_shares"] = {}
+    for part in parts:
+        merged["cash"] += part["cash"]
+        merged["reserved_cash"] += part.get("reserved_cash", 0.0)
+        for field in ("portfolio", "reserved_shares"):
+            for symbol, quantity in part.get(field, {}).items():
+                merged[field][symbol] = merged[field].get(symbol, 0) + quantity
+    return merged
+
+
+def merge_trades(parts: Iterable[List[dict]], limit: int) -> List[dict]:
+    """Newest `limit` trades across shards, oldest first like one shard"""
+    trades = [trade for part in parts for trade in part]
+    trades.sort(key=lambda trade: (trade["timestamp"], trade["trade_id"]))
+    return trades[-limit:] if limit > 0 else []
+
+
+def next_trade_positions(
+    positions: List[Optional[int]],
+    pages: List[Optional[List[dict]]],
+    merged: List[dict],
+    limit: int,
+) -> List[Optional[int]]:
+    """
+    Per-shard `before` bounds after serving `merged` from each shard's
+    page (None when the shard wasn't asked). A shard's bound moves to
+    its oldest trade served; -1 marks a shard with nothing older left.
+    """
+    oldest: Dict[int, int] = {}
+    served: Dict[int, int] = {}
+    for trade in merged:
+        index = shard_for_id(trade["trade_id"], len(positions))
+        oldest[index] = min(oldest.get(index, trade["trade_id"]), trade["trade_id"])
+        served[index] = served.get(index, 0) + 1
+    following = []
+    for index, (position, page) in enumerate(zip(positions, pages)):
+        if page is None:
+            following.append(position)
+        elif len(page) < limit and served.get(index, 0) == len(page):
+            following.append(-1)
+        else:
+            following.append(oldest.get(index, position))
+    return following
+
+
+def merge_companies(parts: Iterable[Dict[str, dict]]) -> Dict[str, dict]:
+    merged: Dict[str, dict] = {}
+    for part in parts:
+        merged.update(part)
+    return merged
+
+
+def merge_standings(parts: Iterable[List[dict]], n: int) -> List[dict]:
+    """
+    Sum each trader's per-shard value and P&L (one sub-account per shard)
+    and rank the totals. Given every shard's standing for the same
+    candidates, the totals are exact.
+    """
+    merged: Dict[str, dict] = {}
+    for part in parts:
+        for entry in part:
+            total = merged.get(entry["trader_id"])
+            if total is None:
+                merged[entry["trader_id"]] = dict(entry)
+            else:
+                total["value"] += entry["value"]
+                total["pnl"] += entry["pnl"]
+    ranked = sorted(merged.values(), key=lambda e: (-e["pnl"], e["trader_id"]))[:n]
+    for rank, entry in enumerate(ranked, 1):
+        entry["rank"] = rank
+        entry["value"] = round(entry["value"], 2)
+        entry["pnl"] = round(entry["pnl"], 2)
+    return ranked
@@ -4,31 +4,78 @@
 # Central configuration for the trading system:
 #
 # Trading Settings:
-# - Trading fees and fee structure
+# - Trading fees and volume-tiered maker/taker schedule
+# - Fixed-point money: tick sizes and cash minor units
 # - Market simulation parameters
 # - Price fluctuation ranges
 #
 # System Settings:
 # - API host and port
 # - Update intervals
+# - Trade history retention
+# - Candle intervals and retention
+# - Journal/snapshot persistence
+# - Shard count and IPC socket directory
 #
 # Sample Data:
 # - Initial companies and stocks
 # - Sample trader accounts
 # ==============================================
 
+import os
+
 
 class Settings:
     # Trading fees (percentage of trade value)
-    TRADING_FEE_PERCENT = 0.1  # 0.1% fee
+    TRADING_FEE_PERCENT = 0.1  # 0.1% fee, maker and taker, in the base tier
+    # Volume tiers: (minimum traded value over the window, maker %, taker %)
+    FEE_TIERS = [
+        (0, TRADING_FEE_PERCENT, TRADING_FEE_PERCENT),
+        (1_000_000, 0.08, 0.1),
+        (10_000_000, 0.05, 0.08),
+        (100_000_000, 0.02, 0.06),
+    ]
+    FEE_VOLUME_WINDOW_DAYS = 30  # Rolling window for tier volume
+    FEE_VOLUME_BUCKET_SECONDS = 86400  # Window resolution (one bucket per day)
+
+    # Fixed-point money: the engine keeps prices as integer ticks and cash
+    # as integer minor units; floats only appear at the API edge
+    CASH_MINOR_UNITS = 100  # Minor units (cents) per currency unit
+    DEFAULT_TICK_SIZE = 0.01  # Price increment; a whole number of minor units
+    TICK_SIZES = {}  # Symbol -> tick size, overriding DEFAULT_TICK_SIZE
 
     # Market simulation parameters
-    PRICE_FLUCTUATION_RANGE = (-1.5, 1.5)  # Percentage
+    PRICE_MODEL = "uniform"  # 'uniform' or 'gbm'
+    PRICE_FLUCTUATION_RANGE = (-1.5, 1.5)  # Percentage (uniform model)
+    GBM_DRIFT = 0.0  # Expected return per update, percentage (gbm model)
+    GBM_VOLATILITY = 1.0  # Std dev of return per update, percentage (gbm model)
     MARKET_UPDATE_INTERVAL = 5  # Seconds
+    SIMULATION_SEED = None  # Seed the price engine for reproducible runs
+
+    # Trade history (ring buffer, oldest trades evicted first)
+    TRADE_HISTORY_LIMIT = 100000  # Trades kept in memory
+
+    # OHLCV candles built from executed trades
+    CANDLE_INTERVALS = {"1s": 1, "1m": 60, "5m": 300, "1h": 3600}  # Name -> seconds
+    CANDLE_HISTORY_LIMIT = 1000  # Bars kept per symbol and interval
+
+    # Persistence (write-ahead journal + snapshots); None keeps everything in memory
+    JOURNAL_DIR = None  # e.g. "var/journal"
+    JOURNAL_GROUP_COMMIT_WINDOW = 0.002  # Seconds to batch writes per fsync
+    SNAPSHOT_INTERVAL = 300  # Seconds between snapshots
 
     # API settings
     HOST = "127.0.0.2"
     PORT = 8000
+    WS_SEND_QUEUE_SIZE = 256  # Pending messages per WebSocket client
+    LEADERBOARD_MAX_SIZE = 1000  # Largest n for /market/leaderboard
+
+    # Sharded deployment (python -m market.cluster); 0 = one in-process market.
+    # Read from the environment so uvicorn's spawned front-end workers see it.
+    SHARD_COUNT = int(os.environ.get("MARKET_SHARD_COUNT", "0"))
+    SHARD_INDEX = None  # Set inside each shard process
+    SHARD_SOCKET_DIR = os.environ.get("MARKET_SHARD_SOCKET_DIR", "/tmp/ecocome-shards")
+    FRONTEND_WORKERS = 2  # uvicorn workers routing requests to the shards
 
     # Initial sample data
     SAMPLE_COMPANIES = [
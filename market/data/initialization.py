@@ -3,34 +3,68 @@
 # ==============================================
 # Initializes the market with sample data:
 # - Creates sample companies with initial stock prices
-# - Sets up empty order books for each company
+# - Sets up empty order books and price slots for each company
 # - Creates sample traders with initial cash/portfolios
 #
+# In a shard process (settings.SHARD_INDEX set) only the
+# shard's own symbols are created; every trader gets a
+# sub-account with an even split of their cash, the same
+# deterministic ID on every shard, and the holdings whose
+# symbols live here. stable_ids gives the same deterministic
+# IDs outside a cluster (reproducible backtests).
+#
 # All sample data is configured in settings.py
 # ==============================================
 
 import uuid
-from config import settings
-from models import Company, Trader
+from ..config import settings
+from ..market.units import company_from_view, trader_from_view
+from ..models import Company, Trader
+
+
+def sample_trader_id(index: int) -> str:
+    """Stable ID of the index-th sample trader (shards, backtests)"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"sample-trader/{index}"))
 
 
-def init_sample_data(storage):
+def init_sample_data(storage, stable_ids: bool = False):
+    sharded = settings.SHARD_INDEX is not None
+    if sharded:
+        from ..cluster.sharding import shard_for_symbol, split_cash
+
+    def owned(symbol: str) -> bool:
+        return not sharded or shard_for_symbol(symbol) == settings.SHARD_INDEX
+
     # Create sample companies
     for company_data in settings.SAMPLE_COMPANIES:
-        storage.companies[company_data["symbol"]] = Company(
-            name=company_data["name"],
-            symbol=company_data["symbol"],
-            price=company_data["price"],
-            outstanding_shares=company_data["outstanding_shares"],
-            ipo_price=company_data["ipo_price"],
+        if not owned(company_data["symbol"]):
+            continue
+        storage.add_company(
+            company_from_view(
+                Company(
+                    name=company_data["name"],
+                    symbol=company_data["symbol"],
+                    price=company_data["price"],
+                    outstanding_shares=company_data["outstanding_shares"],
+                    ipo_price=company_data["ipo_price"],
+                ).model_dump()
+            )
         )
-        storage.order_book[company_data["symbol"]] = {"buy": [], "sell": []}
 
     # Create sample traders
-    for trader_data in settings.SAMPLE_TRADERS:
-        trader_id = str(uuid.uuid4())
-        storage.traders[trader_id] = Trader(
+    for index, trader_data in enumerate(settings.SAMPLE_TRADERS):
+        if sharded or stable_ids:
+            trader_id = sample_trader_id(index)
+        else:
+            trader_id = str(uuid.uuid4())
+        cash = trader_data["cash"]
+        if sharded:
+            cash = split_cash(cash, settings.SHARD_COUNT)[settings.SHARD_INDEX]
+        portfolio = trader_data.get("portfolio", {})
+        trader = Trader(
+            trader_id=trader_id,
             name=trader_data["name"],
-            cash=trader_data["cash"],
-            portfolio=trader_data.get("portfolio", {}),
-        )
+            cash=cash,
+            portfolio={s: q for s, q in portfolio.items() if owned(s)},
+        ).model_dump()
+        storage.add_trader(trader_id, trader_from_view(trader))
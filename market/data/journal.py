@@ -0,0 +1,326 @@
+# ==============================================
+# Write-Ahead Journal and Snapshots
+# ==============================================
+# Makes DataStorage survive restarts:
+# - Every state change recorded through DataStorage.record()
+#   (companies, traders, share allocations, cash transfers,
+#   orders, cancels, reductions, trades) is appended to an in-memory buffer
+# - A background flusher writes buffered events in one batch
+#   and fsyncs once per batch (group commit); callers await
+#   sync() to know their events are durable
+# - Every SNAPSHOT_INTERVAL seconds the full state is pickled
+#   into a snapshot and the journal rolls over to a new
+#   segment; segments covered by the snapshot are deleted
+#
+# Recovery loads the latest snapshot and replays only the
+# journal tail after it, so restart time is bounded by the
+# snapshot interval rather than by total history.
+#
+# Record layout: <length:u32><seq:u64><pickled event>
+# Orders are replayed through the matching engine with their
+# original IDs and timestamps; with the trade ID sequence
+# restored from the snapshot this regenerates the same
+# trades, so "trade" records are kept for audit and skipped.
+#
+# Events and snapshots hold engine units (integer ticks and
+# minor units, see market/units.py).
+# ==============================================
+
+import asyncio
+import logging
+import os
+import pickle
+import struct
+from typing import Iterator, List, Tuple
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<IQ")
+SNAPSHOT_FILE = "snapshot.bin"
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".log"
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{first_seq:020d}{SEGMENT_SUFFIX}"
+
+
+def _fsync_directory(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Rotate:
+    """Buffer marker: close the current segment, start one at first_seq"""
+
+    __slots__ = ("first_seq",)
+
+    def __init__(self, first_seq: int):
+        self.first_seq = first_seq
+
+
+def capture_state(data_store) -> dict:
+    """Everything needed to rebuild the store, in book priority order"""
+    orders = []
+    for book in data_store.order_book.values():
+        for side in (book.bids, book.asks):
+            orders.extend(side.orders())
+    return {
+        "companies": data_store.sync_company_prices(),
+        "traders": data_store.traders,
+        "orders": orders,
+        "last_order_id": data_store.last_order_id,
+        "last_trade_id": data_store.last_trade_id,
+        "trades": data_store.trade_history[:],
+        "fee_volumes": data_store.fee_schedule.volumes,
+    }
+
+
+def _restore_trader(data_store, trader_id: str, trader: dict):
+    data_store.traders[trader_id] = trader
+    data_store.track_trader(trader_id)
+
+
+def restore_state(data_store, state: dict):
+    for company in state["companies"].values():
+        data_store.add_company(company)
+    for trader_id, trader in state["traders"].items():
+        _restore_trader(data_store, trader_id, trader)
+    for order in state["orders"]:
+        # Trader balances in the snapshot already hold its reservation
+        data_store.add_order(order, reserve=False)
+    data_store.last_order_id = state["last_order_id"]
+    data_store.last_trade_id = state["last_trade_id"]
+    data_store.fee_schedule.volumes = state["fee_volumes"]
+    for trade in state["trades"]:
+        data_store.trade_history.append(trade)
+        # Candles are derived data: rebuild them from retained trades
+        data_store.candles.on_trade(
+            trade.symbol, trade.price, trade.quantity, trade.timestamp
+        )
+
+
+class Journal:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._buffer: List = []
+        self._seq = 0  # last sequence handed out
+        self._durable_seq = 0  # last sequence fsynced
+        self._waiters: List[Tuple[int, asyncio.Future]] = []
+        self._pending = asyncio.Event()
+        self._file = None
+        self._closing = False
+        self._flusher_task = None
+        self._snapshot_task = None
+
+    # ---------- writing ----------
+
+    def append(self, event: tuple):
+        self._seq += 1
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        self._buffer.append(RECORD_HEADER.pack(len(payload), self._seq) + payload)
+        self._pending.set()
+
+    async def sync(self):
+        """Return once everything appended so far has been fsynced"""
+        if self._durable_seq >= self._seq:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((self._seq, waiter))
+        await waiter
+
+    def _open_segment(self, first_seq: int):
+        path = os.path.join(self.directory, _segment_name(first_seq))
+        self._file = open(path, "ab")
+        _fsync_directory(self.directory)
+
+    def _write(self, items: list):
+        """Runs in a worker thread; the flusher is the only writer"""
+        for item in items:
+            if isinstance(item, _Rotate):
+                if self._file is not None:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._file.close()
+                self._open_segment(item.first_seq)
+            else:
+                self._file.write(item)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def _flusher(self):
+        while True:
+            await self._pending.wait()
+            if not self._closing:
+                # Let concurrent writers join this batch
+                await asyncio.sleep(settings.JOURNAL_GROUP_COMMIT_WINDOW)
+            await self._flush()
+            # Checked after flushing: close() may come before our first pass
+            if self._closing:
+                return
+
+    async def _flush(self):
+        self._pending.clear()
+        items, self._buffer = self._buffer, []
+        last_seq = self._seq
+        if items:
+            await asyncio.to_thread(self._write, items)
+        self._durable_seq = last_seq
+
+        waiting, self._waiters = self._waiters, []
+        for seq, waiter in waiting:
+            if seq <= last_seq:
+                if not waiter.done():
+                    waiter.set_result(None)
+            else:
+                self._waiters.append((seq, waiter))
+
+    # ---------- snapshots ----------
+
+    async def snapshot(self, data_store):
+        """Write a snapshot and drop the journal segments it covers"""
+        # Capture and roll over with no await in between: the snapshot
+        # holds exactly the events up to covered_seq
+        state = capture_state(data_store)
+        covered_seq = self._seq
+        payload = pickle.dumps(
+            {"seq": covered_seq, "state": state}, protocol=pickle.HIGHEST_PROTOCOL
+        )
+        self._buffer.append(_Rotate(covered_seq + 1))
+        rotated = asyncio.get_running_loop().create_future()
+        self._waiters.append((covered_seq, rotated))
+        self._pending.set()
+
+        await asyncio.to_thread(self._write_snapshot, payload)
+        await rotated
+        await asyncio.to_thread(self._remove_segments_before, covered_seq + 1)
+
+    def _write_snapshot(self, payload: bytes):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "wb") as snapshot:
+            snapshot.write(payload)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(path + ".tmp", path)
+        _fsync_directory(self.directory)
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                first_seq = int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+                segments.append((first_seq, os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _remove_segments_before(self, first_seq: int):
+        for segment_seq, path in self._segments():
+            if segment_seq < first_seq:
+                os.remove(path)
+
+    async def _snapshotter(self, data_store):
+        while True:
+            await asyncio.sleep(settings.SNAPSHOT_INTERVAL)
+            try:
+                await self.snapshot(data_store)
+            except OSError as error:
+                logger.error("Snapshot failed: %s", error)
+
+    # ---------- recovery ----------
+
+    def _read_segment(self, path: str):
+        with open(path, "rb") as segment:
+            data = segment.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, seq = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > len(data):
+                logger.warning("Ignoring torn record %d in %s", seq, path)
+                return
+            yield seq, data[start : start + length]
+            offset = start + length
+
+    def history(self) -> Iterator[tuple]:
+        """
+        The recorded history in order: ("snapshot", state) if there is
+        a snapshot, then every journal event after it
+        """
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as snapshot:
+                saved = pickle.load(snapshot)
+            self._seq = saved["seq"]
+            yield ("snapshot", saved["state"])
+
+        for _, path in self._segments():
+            for seq, payload in self._read_segment(path):
+                if seq <= self._seq:
+                    continue  # already in the snapshot
+                yield pickle.loads(payload)
+                self._seq = seq
+
+    def recover(self, data_store) -> bool:
+        """Rebuild data_store from snapshot + journal tail; False if empty"""
+        from ..market.matching import submit_order
+
+        recovered = False
+        clock = data_store.clock
+        try:
+            for event in self.history():
+                if event[0] == "snapshot":
+                    restore_state(data_store, event[1])
+                else:
+                    self._apply(data_store, event, submit_order)
+                recovered = True
+        finally:
+            data_store.clock = clock
+
+        self._durable_seq = self._seq
+        return recovered
+
+    @staticmethod
+    def _apply(data_store, event: tuple, submit_order):
+        kind = event[0]
+        if kind == "company":
+            data_store.add_company(event[1])
+        elif kind == "trader":
+            _restore_trader(data_store, event[1], event[2])
+        elif kind == "allocate":
+            data_store.allocate_shares(event[1], event[2], event[3])
+        elif kind == "cash":
+            data_store.move_cash(event[1], event[2])
+        elif kind == "order":
+            order, timestamp = event[1], event[2]
+            data_store.clock = lambda: timestamp
+            data_store.last_order_id = max(data_store.last_order_id, order.order_id)
+            submit_order(order)
+        elif kind == "cancel":
+            data_store.remove_order(event[1])
+        elif kind == "reduce":
+            data_store.reduce_order(event[1], event[2])
+        # "trade" records are regenerated by replaying orders
+
+    # ---------- lifecycle ----------
+
+    def start(self, data_store):
+        """Open a fresh segment and start the flusher/snapshot tasks"""
+        self._open_segment(self._seq + 1)
+        self._flusher_task = asyncio.create_task(self._flusher())
+        self._snapshot_task = asyncio.create_task(self._snapshotter(data_store))
+
+    async def close(self):
+        """Stop snapshotting, let the flusher drain the buffer, close the file"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+        self._closing = True
+        self._pending.set()
+        if self._flusher_task is not None:
+            await self._flusher_task
+        if self._file is not None:
+            self._file.close()
+            self._file = None
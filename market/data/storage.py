@@ -3,31 +3,596 @@
 # ==============================================
 # Central data storage for the trading system:
 # - Companies: Stores registered companies and their stocks
+# - Prices: One NumPy array owned by the PriceEngine; the
+#   companies view is synced from it lazily on read
 # - Traders: Manages trader accounts and portfolios
 # - Order Book: Tracks all pending buy/sell orders
-# - Trade History: Records all executed trades
+# - Trade History: Bounded, indexed store of executed trades
+# - Candles: OHLCV bars per symbol/interval, fed by trades
+# - Fee schedule: maker/taker tiers and per-trader rolling
+#   volume, fed by trades
+# - Leaderboard: mark-to-market value and P&L per trader,
+#   fed by settlement, allocations and price ticks
 #
-# Uses asyncio.Lock for thread-safe operations
+# Order books keep sorted price levels, each level a FIFO
+# queue of resting orders keyed by order ID (IDs come from
+# one arrival sequence), so the best bid/ask is always at
+# hand and time priority does not depend on re-sorting.
+# order_index maps order ID -> (symbol, side, level, order)
+# so cancel and amend never search the book. Each level
+# also keeps its total resting quantity for depth reads.
+#
+# Books and the trade store hold compact engine records
+# (market/records.py) with integer IDs, not pydantic models.
+#
+# Money is fixed-point (market/units.py): company prices and
+# order/level prices are integer ticks, so levels are exact
+# integer-keyed hashes; trader cash, reservations and P&L
+# baselines are integer minor units. Views in API units are
+# built at the edge (units.company_view / trader_view).
+#
+# State changes go through record() so an attached Journal
+# (see journal.py) can log them for crash recovery; events
+# are serialized as they are recorded, so they may carry
+# live engine records.
+#
+# Locking (asyncio.Lock wrapped in metrics.InstrumentedLock
+# for wait/hold histograms, sharded):
+# - lock: registry lock, guards adding companies/traders
+# - symbol_lock(symbol): guards that symbol's order book
+# - trader_lock(trader_id): guards one trader's balances
+#
+# Lock ordering rule (prevents deadlock on multi-lock paths):
+#   registry lock -> symbol locks -> trader locks
+# Within one tier, locks are taken in sorted key order; use
+# lock_symbols()/lock_traders() rather than nesting by hand.
+# Never take a symbol lock while holding a trader lock, and
+# never await a broadcast while holding any of them.
+#
+# Settlement inside the matching loop has no await points,
+# so it is atomic with respect to other coroutines and only
+# needs the symbol lock of the book being matched.
+#
+# Reserved balances: every resting order holds a reservation
+# on its trader (reserved_cash for buys at the limit price
+# plus the highest fee rate, reserved_shares for sells), taken in add_order()
+# and given back on fill, cancel and reduce. Entry checks
+# compare against cash/shares minus reservations, so resting
+# orders are always covered and matching never re-validates.
+# IOC, FOK and market orders never rest, so they reserve
+# nothing; a market buy is checked against the cost of the
+# asks it would sweep on arrival (DataStorage.taker_cost).
 # ==============================================
 
-import asyncio
-from models import Company, Trader, Order, Trade
-from config import settings
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from ..config import settings
+from ..market.candles import CandleBuilder
+from ..market.fees import FeeSchedule, buy_order_cost
+from ..market.leaderboard import Leaderboard
+from ..market.pricing import MIN_PRICE, PriceEngine
+from ..market.records import OrderRecord
+from ..market.units import from_ticks, tick_value, ticks_at_least
+from .trade_store import TradeStore
+from ..metrics import CallbackGauge, InstrumentedLock
+
+
+class PriceLevel:
+    """
+    All resting orders at one price, oldest first.
+    total_quantity is kept in step with every add, fill, reduce and
+    removal, so depth reads never sum the orders.
+    """
+
+    __slots__ = ("price", "orders", "total_quantity")
+
+    def __init__(self, price: int):
+        self.price = price
+        # order ID -> order; insertion order is time priority
+        self.orders: "OrderedDict[int, OrderRecord]" = OrderedDict()
+        self.total_quantity = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.orders)
+
+    def head(self) -> OrderRecord:
+        """Oldest order at this level"""
+        return next(iter(self.orders.values()))
+
+    def append(self, order_id: int, order: OrderRecord):
+        self.orders[order_id] = order
+        self.total_quantity += order.quantity
+
+    def fill(self, order: OrderRecord, quantity: int):
+        """Take quantity off a resting order at this level"""
+        order.quantity -= quantity
+        self.total_quantity -= quantity
+
+    def pop_head(self) -> OrderRecord:
+        order = self.orders.popitem(last=False)[1]
+        self.total_quantity -= order.quantity
+        return order
+
+    def remove(self, order_id: int) -> OrderRecord:
+        order = self.orders.pop(order_id)
+        self.total_quantity -= order.quantity
+        return order
+
+
+class BookSide:
+    """
+    One side of an order book.
+    Price keys are kept ascending in a plain list with the best
+    level always last, so finding a level is a binary search and
+    dropping the best level is a pop() from the end.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.levels: Dict[int, PriceLevel] = {}
+        self._keys: List[int] = []
+        self.best_price: Optional[int] = None
+
+    def _key(self, price: int) -> int:
+        # Bids: highest price is best. Asks: lowest price is best.
+        return price if self.is_bid else -price
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def __iter__(self) -> Iterator[PriceLevel]:
+        """Levels from best to worst"""
+        for key in reversed(self._keys):
+            yield self.levels[key if self.is_bid else -key]
+
+    def best(self) -> Optional[PriceLevel]:
+        if self.best_price is None:
+            return None
+        return self.levels[self.best_price]
+
+    @property
+    def worst_price(self) -> Optional[int]:
+        """Price of the level furthest from the best, O(1)"""
+        if not self._keys:
+            return None
+        return self._keys[0] if self.is_bid else -self._keys[0]
+
+    def add(self, order_id: int, order: OrderRecord) -> PriceLevel:
+        level = self.levels.get(order.price)
+        if level is None:
+            level = PriceLevel(order.price)
+            self.levels[order.price] = level
+            key = self._key(order.price)
+            self._keys.insert(bisect_left(self._keys, key), key)
+            self.best_price = self._keys[-1] if self.is_bid else -self._keys[-1]
+        level.append(order_id, order)
+        return level
+
+    def remove_level(self, level: PriceLevel):
+        del self.levels[level.price]
+        key = self._key(level.price)
+        if self._keys and self._keys[-1] == key:
+            self._keys.pop()
+        else:
+            del self._keys[bisect_left(self._keys, key)]
+        if self._keys:
+            self.best_price = self._keys[-1] if self.is_bid else -self._keys[-1]
+        else:
+            self.best_price = None
+
+    def sweep(
+        self, quantity: int, limit: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        (price, quantity) per level an incoming order of `quantity` would
+        take, best first, stopping at `limit` (None: no limit). Reads level
+        totals only, so it is O(levels touched).
+        """
+        taken = []
+        for level in self:
+            if quantity <= 0:
+                break
+            if limit is not None and (
+                level.price < limit if self.is_bid else level.price > limit
+            ):
+                break
+            size = min(quantity, level.total_quantity)
+            taken.append((level.price, size))
+            quantity -= size
+        return taken
+
+    def orders(self) -> List[OrderRecord]:
+        """All resting orders in price-time priority"""
+        return [order for level in self for order in level.orders.values()]
+
+    def depth(self, levels: int) -> List[dict]:
+        """Aggregated best `levels` levels; O(levels)"""
+        return [
+            {
+                "price": level.price,
+                "quantity": level.total_quantity,
+                "orders": len(level.orders),
+            }
+            for level in islice(self, levels)
+        ]
+
+
+class OrderBook:
+    """Price-time priority order book for a single symbol"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+
+    @property
+    def best_bid(self) -> Optional[int]:
+        return self.bids.best_price
+
+    @property
+    def best_ask(self) -> Optional[int]:
+        return self.asks.best_price
+
+    def side(self, order_type: str) -> BookSide:
+        return self.bids if order_type == "buy" else self.asks
+
+    def add(self, order_id: int, order: OrderRecord) -> PriceLevel:
+        return self.side(order.order_type).add(order_id, order)
+
+    def is_crossed(self) -> bool:
+        return (
+            self.best_bid is not None
+            and self.best_ask is not None
+            and self.best_bid >= self.best_ask
+        )
+
+    def snapshot(self) -> Dict[str, List[OrderRecord]]:
+        return {"buy": self.bids.orders(), "sell": self.asks.orders()}
+
+    def depth(self, levels: int) -> dict:
+        """
+        L2 view: price -> total quantity for the top levels of each side,
+        with prices in API units
+        """
+        view = {"symbol": self.symbol}
+        for name, side in (("bids", self.bids), ("asks", self.asks)):
+            view[name] = [
+                dict(level, price=from_ticks(self.symbol, level["price"]))
+                for level in side.depth(levels)
+            ]
+        return view
+
+
+class OrderRef(NamedTuple):
+    """Where a resting order lives, for O(1) cancel/amend"""
+
+    symbol: str
+    side: BookSide
+    level: PriceLevel
+    order: OrderRecord
 
 
 class DataStorage:
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         self.companies = {}
         self.traders = {}
-        self.order_book = {}
-        self.trade_history = []
-        self.lock = asyncio.Lock()
+        self.order_book: Dict[str, OrderBook] = {}
+        self.trade_history = TradeStore()
+        self.candles = CandleBuilder()
+        self.leaderboard = Leaderboard()
+        self.fee_schedule = FeeSchedule()
+        self.price_engine = PriceEngine(
+            seed=settings.SIMULATION_SEED if seed is None else seed
+        )
+        self._synced_price_version = -1
+        self.lock = InstrumentedLock("registry")
+        self.symbol_locks: Dict[str, InstrumentedLock] = {}
+        self.trader_locks: Dict[str, InstrumentedLock] = {}
+        # Arrival sequence shared by all books (order IDs, time priority)
+        self.last_order_id = 0
+        self.last_trade_id = 0
+        self.id_stride = 1  # > 1 when IDs are partitioned across shards
+        self.order_index: Dict[int, OrderRef] = {}
+        # Engine time source; replaced during journal replay
+        self.clock = datetime.now
+        self.journal = None
+
+    def now(self) -> datetime:
+        return self.clock()
+
+    def record(self, *event):
+        """Hand a state-changing event to the journal, if one is attached"""
+        if self.journal is not None:
+            self.journal.append(event)
+
+    async def sync_journal(self):
+        """Wait until every recorded event is durable (no-op without a journal)"""
+        if self.journal is not None:
+            await self.journal.sync()
+
+    def symbol_lock(self, symbol: str) -> InstrumentedLock:
+        lock = self.symbol_locks.get(symbol)
+        if lock is None:
+            lock = self.symbol_locks[symbol] = InstrumentedLock("symbol")
+        return lock
+
+    def trader_lock(self, trader_id: str) -> InstrumentedLock:
+        lock = self.trader_locks.get(trader_id)
+        if lock is None:
+            lock = self.trader_locks[trader_id] = InstrumentedLock("trader")
+        return lock
+
+    @asynccontextmanager
+    async def lock_symbols(self, symbols: Iterable[str]):
+        """Hold several symbol locks, acquired in sorted order"""
+        async with AsyncExitStack() as stack:
+            for symbol in sorted(set(symbols)):
+                await stack.enter_async_context(self.symbol_lock(symbol))
+            yield
+
+    @asynccontextmanager
+    async def lock_traders(self, trader_ids: Iterable[str]):
+        """Hold several trader locks, acquired in sorted order"""
+        async with AsyncExitStack() as stack:
+            for trader_id in sorted(set(trader_ids)):
+                await stack.enter_async_context(self.trader_lock(trader_id))
+            yield
+
+    def add_company(self, company: dict):
+        """Register a company, its order book and its price slot"""
+        symbol = company["symbol"]
+        self.record("company", dict(company))
+        self.companies[symbol] = company
+        self.order_book[symbol] = OrderBook(symbol)
+        self.price_engine.add_symbol(
+            symbol, company["price"], floor=ticks_at_least(symbol, MIN_PRICE)
+        )
+        self.leaderboard.set_mark(symbol, company["price"])
+
+    def get_price(self, symbol: str) -> int:
+        """Current price in ticks"""
+        return self.price_engine.price(symbol)
+
+    def sync_company_prices(self) -> dict:
+        """
+        Copy engine prices into the companies view if they moved.
+        Companies are registered in slot order, so a zip lines them up.
+        """
+        engine = self.price_engine
+        if self._synced_price_version != engine.version:
+            prices = engine.prices.astype("int64").tolist()
+            for company, price in zip(self.companies.values(), prices):
+                company["price"] = price
+            self._synced_price_version = engine.version
+        return self.companies
+
+    def add_trader(self, trader_id: str, trader: dict):
+        """Register a trader dict in engine units (cash in minor units)"""
+        trader.setdefault("reserved_cash", 0)
+        trader.setdefault("reserved_shares", {})
+        # P&L baseline; recorded with the trader so replay doesn't reprice it
+        trader.setdefault(
+            "contributed",
+            trader["cash"]
+            + sum(
+                self.ipo_value(symbol, quantity)
+                for symbol, quantity in trader["portfolio"].items()
+            ),
+        )
+        self.record(
+            "trader", trader_id, dict(trader, portfolio=dict(trader["portfolio"]))
+        )
+        self.traders[trader_id] = trader
+        self.track_trader(trader_id)
+
+    def track_trader(self, trader_id: str):
+        """(Re)value a trader from scratch, e.g. after a snapshot restore"""
+        trader = self.traders[trader_id]
+        self.leaderboard.add_trader(
+            trader_id, trader["cash"], trader["portfolio"], trader["contributed"]
+        )
+
+    def ipo_value(self, symbol: str, quantity: int) -> int:
+        company = self.companies.get(symbol)
+        if company is None:
+            return 0
+        return quantity * company["ipo_price"] * tick_value(symbol)
+
+    def allocate_shares(self, trader_id: str, symbol: str, quantity: int):
+        """Credit newly issued shares (an IPO allocation) to a trader"""
+        self.record("allocate", trader_id, symbol, quantity)
+        trader = self.traders[trader_id]
+        trader["portfolio"][symbol] = trader["portfolio"].get(symbol, 0) + quantity
+        value = self.ipo_value(symbol, quantity)
+        trader["contributed"] += value
+        self.leaderboard.adjust(trader_id, 0, symbol, quantity)
+        self.leaderboard.contribute(trader_id, value)
 
-    def initialize_sample_data(self):
-        from data.initialization import init_sample_data
+    def move_cash(self, trader_id: str, amount: int):
+        """
+        Move cash (minor units) into this store's account for a trader, or
+        out of it when negative. In a sharded deployment this is half of a
+        transfer between the trader's shard sub-accounts, so it counts as
+        capital in or out and leaves P&L alone.
+        """
+        self.record("cash", trader_id, amount)
+        self.traders[trader_id]["cash"] += amount
+        self.traders[trader_id]["contributed"] += amount
+        self.leaderboard.adjust(trader_id, amount)
+        self.leaderboard.contribute(trader_id, amount)
 
-        init_sample_data(self)
+    def partition_ids(self, shard_index: int, shard_count: int):
+        """
+        Make this shard's order/trade IDs congruent to shard_index + 1
+        modulo shard_count, so IDs are unique across shards and name
+        their owner. Call before recovering or creating anything.
+        """
+        self.id_stride = shard_count
+        self.last_order_id = self.last_trade_id = shard_index + 1 - shard_count
+
+    def next_order_id(self) -> int:
+        self.last_order_id += self.id_stride
+        return self.last_order_id
+
+    def next_trade_id(self) -> int:
+        self.last_trade_id += self.id_stride
+        return self.last_trade_id
+
+    def add_order(self, order: OrderRecord, reserve: bool = True):
+        """
+        Rest an already-numbered order in its symbol's book and reserve
+        what it could consume (reserve=False when restoring a snapshot
+        whose trader balances already include it)
+        """
+        book = self.order_book[order.symbol]
+        side = book.side(order.order_type)
+        level = side.add(order.order_id, order)
+        self.order_index[order.order_id] = OrderRef(order.symbol, side, level, order)
+        if reserve:
+            self.reserve(order, order.quantity)
+
+    @staticmethod
+    def buy_cost(order: OrderRecord, quantity: int) -> int:
+        """Cash to reserve for `quantity` of a buy order, in minor units"""
+        return buy_order_cost(order.price * tick_value(order.symbol), quantity)
+
+    def taker_cost(self, order: OrderRecord, ceiling: Optional[int] = None) -> int:
+        """
+        Most a buy order can cost as it arrives: at its limit price, or for
+        a market order at the asks it would sweep right now (caller holds
+        the symbol lock, so they can't move before it matches). `ceiling`
+        is the highest ask a market order may meet when other orders run
+        first (batch pre-checks); every share is then costed at it.
+        """
+        if not order.is_market:
+            return self.buy_cost(order, order.quantity)
+        value = tick_value(order.symbol)
+        if ceiling is not None:
+            return buy_order_cost(ceiling * value, order.quantity)
+        asks = self.order_book[order.symbol].asks
+        return sum(
+            buy_order_cost(price * value, quantity)
+            for price, quantity in asks.sweep(order.quantity)
+        )
+
+    @staticmethod
+    def _require_positive(order: OrderRecord, quantity: int):
+        # A non-positive price or size would reserve a negative amount
+        if quantity <= 0 or (order.price is not None and order.price <= 0):
+            raise ValueError("Orders need a positive price and quantity")
+
+    def reserve(self, order: OrderRecord, quantity: int):
+        """Set aside cash (buys) or shares (sells) for part of an order"""
+        self._require_positive(order, quantity)
+        trader = self.traders[order.trader_id]
+        if order.order_type == "buy":
+            trader["reserved_cash"] += self.buy_cost(order, quantity)
+        else:
+            reserved = trader["reserved_shares"]
+            reserved[order.symbol] = reserved.get(order.symbol, 0) + quantity
+
+    def commitment(self, order: OrderRecord, ceiling: Optional[int] = None) -> int:
+        """What the order can consume: cash (buys) or shares (sells)"""
+        if order.order_type == "buy":
+            return self.taker_cost(order, ceiling)
+        return order.quantity
+
+    def shortfall(
+        self,
+        order: OrderRecord,
+        replacing: Optional[OrderRecord] = None,
+        pending: int = 0,
+        ceiling: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        "cash" or "shares" if the trader's available (unreserved) balance
+        can't cover the order, else None; O(1). `replacing` is a resting
+        order about to be swapped out, whose reservation counts as available.
+        `pending` is cash or shares already promised to orders checked
+        before this one but not placed yet (see commitment()); `ceiling`
+        is passed on to taker_cost(). ValueError for a non-positive price or quantity.
+        """
+        self._require_positive(order, order.quantity)
+        trader = self.traders[order.trader_id]
+        if order.order_type == "buy":
+            available = trader["cash"] - trader["reserved_cash"] - pending
+            if replacing is not None:
+                available += self.buy_cost(replacing, replacing.quantity)
+            if available < self.taker_cost(order, ceiling):
+                return "cash"
+        elif order.order_type == "sell":
+            available = trader["portfolio"].get(order.symbol, 0) - pending
+            available -= trader["reserved_shares"].get(order.symbol, 0)
+            if replacing is not None:
+                available += replacing.quantity
+            if available < order.quantity:
+                return "shares"
+        return None
+
+    def release(self, order: OrderRecord, quantity: int):
+        """Undo reserve() for quantity that filled, was cancelled or cut"""
+        trader = self.traders[order.trader_id]
+        if order.order_type == "buy":
+            trader["reserved_cash"] -= self.buy_cost(order, quantity)
+        else:
+            reserved = trader["reserved_shares"]
+            left = reserved[order.symbol] - quantity
+            if left:
+                reserved[order.symbol] = left
+            else:
+                del reserved[order.symbol]
+
+    def remove_order(self, order_id: int) -> Optional[OrderRecord]:
+        """Take a resting order out of its book; None if it isn't resting"""
+        ref = self.order_index.pop(order_id, None)
+        if ref is None:
+            return None
+        self.record("cancel", order_id)
+        ref.level.remove(order_id)
+        self.release(ref.order, ref.order.quantity)
+        if not ref.level:
+            ref.side.remove_level(ref.level)
+        return ref.order
+
+    def reduce_order(self, order_id: int, quantity: int):
+        """Shrink a resting order in place, keeping its queue priority"""
+        self.record("reduce", order_id, quantity)
+        ref = self.order_index[order_id]
+        self.release(ref.order, ref.order.quantity - quantity)
+        ref.level.fill(ref.order, ref.order.quantity - quantity)
+
+    def initialize_sample_data(self, stable_ids: bool = False):
+        from .initialization import init_sample_data
+
+        init_sample_data(self, stable_ids)
 
 
 # Global data store instance
 data_store = DataStorage()
+
+
+def _book_sides():
+    for symbol, book in data_store.order_book.items():
+        yield symbol, "buy", book.bids
+        yield symbol, "sell", book.asks
+
+
+CallbackGauge(
+    "market_book_levels",
+    "Price levels per book side",
+    ["symbol", "side"],
+    lambda: (((symbol, name), len(side)) for symbol, name, side in _book_sides()),
+)
+CallbackGauge(
+    "market_book_orders",
+    "Resting orders per book side",
+    ["symbol", "side"],
+    lambda: (
+        ((symbol, name), sum(len(level.orders) for level in side))
+        for symbol, name, side in _book_sides()
+    ),
+)
@@ -0,0 +1,248 @@
+# ==============================================
+# Trade History Store
+# ==============================================
+# Bounded, indexed storage for executed trades:
+# - Ring buffer of the last TRADE_HISTORY_LIMIT trades;
+#   the oldest trade is evicted when the buffer is full
+# - Every trade gets a monotonically increasing sequence
+# - Secondary indexes by symbol, by trader (buyer or
+#   seller) and by (trader, symbol) hold ascending sequence
+#   numbers, so every filter combination has its own index
+# - Trades are appended in time order, so the ring itself
+#   is the time index: since/until become binary searches
+#
+# A query costs O(log n + k) for k returned trades.
+#
+# Trade IDs increase with the sequence, so `before` (a trade
+# ID bound, for cursor pagination) is also a binary search.
+# scan() walks a range oldest first in fixed-size batches for
+# streaming exports; it re-finds its place by value after
+# each batch, so appends and evictions in between are safe.
+# ==============================================
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+from ..config import settings
+from ..market.records import TradeRecord
+
+
+class _SequenceIndex:
+    """Ascending trade sequences with a movable head for O(1) eviction"""
+
+    __slots__ = ("sequences", "head")
+
+    def __init__(self):
+        self.sequences: List[int] = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.sequences) - self.head
+
+    def append(self, sequence: int):
+        self.sequences.append(sequence)
+
+    def evict(self, sequence: int):
+        """Drop the oldest entry if it is the evicted trade"""
+        if self.head < len(self.sequences) and self.sequences[self.head] == sequence:
+            self.head += 1
+            # Compact once the dead prefix dominates the list
+            if self.head > 64 and self.head * 2 > len(self.sequences):
+                del self.sequences[: self.head]
+                self.head = 0
+
+    def bounds(self, first: int, last: int) -> Tuple[int, int]:
+        """Positions of the sequences within [first, last]"""
+        lo = bisect_left(self.sequences, first, self.head)
+        hi = bisect_right(self.sequences, last, lo)
+        return lo, hi
+
+
+class TradeStore:
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or settings.TRADE_HISTORY_LIMIT
+        self._ring: List[Optional[TradeRecord]] = [None] * self.capacity
+        self._first = 0  # oldest retained sequence
+        self._next = 0  # sequence of the next trade
+        self._by_symbol: Dict[str, _SequenceIndex] = {}
+        self._by_trader: Dict[str, _SequenceIndex] = {}
+        self._by_trader_symbol: Dict[Tuple[str, str], _SequenceIndex] = {}
+
+    def __len__(self) -> int:
+        return self._next - self._first
+
+    def _trade(self, sequence: int) -> TradeRecord:
+        return self._ring[sequence % self.capacity]
+
+    def append(self, trade: TradeRecord) -> int:
+        """Store a trade, evicting the oldest one when full"""
+        if len(self) == self.capacity:
+            self._evict()
+
+        sequence = self._next
+        self._ring[sequence % self.capacity] = trade
+        self._next += 1
+
+        self._index(self._by_symbol, trade.symbol).append(sequence)
+        for trader_id in self._traders(trade):
+            self._index(self._by_trader, trader_id).append(sequence)
+            self._index(self._by_trader_symbol, (trader_id, trade.symbol)).append(
+                sequence
+            )
+        return sequence
+
+    @staticmethod
+    def _traders(trade: TradeRecord) -> Tuple[str, ...]:
+        if trade.seller == trade.buyer:
+            return (trade.buyer,)
+        return (trade.buyer, trade.seller)
+
+    @staticmethod
+    def _index(indexes: Dict[Hashable, _SequenceIndex], key) -> _SequenceIndex:
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = _SequenceIndex()
+        return index
+
+    def _evict(self):
+        sequence = self._first
+        trade = self._trade(sequence)
+        self._ring[sequence % self.capacity] = None
+        self._first += 1
+
+        # The evicted trade is the oldest entry of each index it is in
+        entries = [(self._by_symbol, trade.symbol)]
+        for trader_id in self._traders(trade):
+            entries.append((self._by_trader, trader_id))
+            entries.append((self._by_trader_symbol, (trader_id, trade.symbol)))
+        for indexes, key in entries:
+            index = indexes.get(key)
+            if index is not None:
+                index.evict(sequence)
+                if not index:
+                    del indexes[key]
+
+    def _first_at_or_after(self, when: datetime) -> int:
+        lo, hi = self._first, self._next
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._trade(mid).timestamp < when:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _first_after(self, when: datetime) -> int:
+        lo, hi = self._first, self._next
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._trade(mid).timestamp <= when:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _first_id_at_or_after(self, trade_id: int) -> int:
+        lo, hi = self._first, self._next
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._trade(mid).trade_id < trade_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _range(
+        self,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        before: Optional[int] = None,
+    ) -> Tuple[int, int]:
+        """Time range (and trade ID bound) -> inclusive sequence range"""
+        first = self._first if since is None else self._first_at_or_after(since)
+        last = (self._next if until is None else self._first_after(until)) - 1
+        if before is not None:
+            last = min(last, self._first_id_at_or_after(before) - 1)
+        return first, last
+
+    def _narrowest(
+        self, symbol: Optional[str], trader_id: Optional[str]
+    ) -> Optional[_SequenceIndex]:
+        if trader_id is not None and symbol is not None:
+            return self._by_trader_symbol.get((trader_id, symbol))
+        if trader_id is not None:
+            return self._by_trader.get(trader_id)
+        return self._by_symbol.get(symbol)
+
+    def query(
+        self,
+        symbol: Optional[str] = None,
+        trader_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 50,
+        before: Optional[int] = None,
+    ) -> List[TradeRecord]:
+        """
+        Most recent `limit` trades matching the filters, oldest first;
+        with `before`, only trades whose ID is lower
+        """
+        if limit <= 0:
+            return []
+
+        # Time range -> sequence range via binary search on the ring
+        first, last = self._range(since, until, before)
+        if first > last:
+            return []
+
+        if trader_id is None and symbol is None:
+            return [
+                self._trade(s) for s in range(max(first, last - limit + 1), last + 1)
+            ]
+        # The filters' own index, bounded to the range by binary search
+        index = self._narrowest(symbol, trader_id)
+        if index is None:
+            return []
+
+        lo, hi = index.bounds(first, last)
+        sequences = index.sequences[max(lo, hi - limit) : hi]
+        return [self._trade(s) for s in sequences]
+
+    def scan(
+        self,
+        symbol: Optional[str] = None,
+        trader_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch: int = 1000,
+    ) -> Iterator[List[TradeRecord]]:
+        """
+        Every matching trade, oldest first, in batches of at most `batch`
+        sequences. The range ends where the store ended at the first batch;
+        trades evicted before their batch is read are skipped.
+        """
+        first, last = self._range(since, until)
+        filtered = trader_id is not None or symbol is not None
+        index = self._narrowest(symbol, trader_id) if filtered else None
+        if filtered and index is None:
+            return
+        position = first
+        while position <= last:
+            position = max(position, self._first)
+            if index is None:
+                sequences = range(position, min(position + batch, last + 1))
+            else:
+                lo = bisect_left(index.sequences, position, index.head)
+                sequences = [s for s in index.sequences[lo : lo + batch] if s <= last]
+            if not sequences:
+                return
+            trades = [self._trade(s) for s in sequences]
+            position = sequences[-1] + 1
+            yield trades
+
+    def __getitem__(self, item):
+        """Positional access over retained trades, oldest first"""
+        sequences = range(self._first, self._next)[item]
+        if isinstance(item, slice):
+            return [self._trade(s) for s in sequences]
+        return self._trade(sequences)
@@ -8,10 +8,13 @@
 
 from fastapi import FastAPI
 import asyncio
-from data import storage
-from market import simulation
-from api import endpoints, websocket
-from config import settings
+import os
+from .data import storage
+from .data.journal import Journal
+from .market import simulation
+from .api import endpoints, websocket
+from .config import settings
+from .metrics import MetricsMiddleware
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -20,6 +23,9 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Time every HTTP request per route (served at GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Register API endpoints from the endpoints module
 app.include_router(endpoints.router)
 
@@ -32,21 +38,46 @@ async def startup_event():
     """
     Initialize the trading application on startup.
     This function:
-    1. Loads sample companies and traders into the data store
+    1. Recovers state from the journal when JOURNAL_DIR is set,
+       otherwise loads sample companies and traders (as a shard
+       of a cluster: only its own symbols, with strided IDs)
     2. Starts the market simulation in the background
        - Simulates price movements
-       - Processes pending orders
        - Broadcasts market updates via WebSocket
     """
+    data_store = storage.data_store
+    journal_dir = settings.JOURNAL_DIR
+    if settings.SHARD_INDEX is not None:
+        # One engine shard of `python -m market.cluster`
+        data_store.partition_ids(settings.SHARD_INDEX, settings.SHARD_COUNT)
+        if journal_dir:
+            journal_dir = os.path.join(journal_dir, f"shard-{settings.SHARD_INDEX}")
+
+    recovered = False
+    if journal_dir:
+        # Rebuild from the latest snapshot + journal tail, then start logging
+        journal = Journal(journal_dir)
+        recovered = journal.recover(data_store)
+        data_store.journal = journal
+        journal.start(data_store)
+
     # Initialize data storage with sample companies and traders
-    storage.data_store.initialize_sample_data()
+    if not recovered:
+        data_store.initialize_sample_data()
 
     # Start market simulation as a background task
-    # This continuously updates prices and processes orders
+    # This continuously updates prices and broadcasts them
     asyncio.create_task(simulation.market_simulator())
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush the journal so nothing acknowledged is lost"""
+    if storage.data_store.journal is not None:
+        await storage.data_store.journal.close()
+
+
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host=settings.HOST, port=settings.PORT, reload=True)
+    uvicorn.run("market.main:app", host=settings.HOST, port=settings.PORT, reload=True)
@@ -0,0 +1,331 @@
+# ==============================================
+# Deterministic Backtesting
+# ==============================================
+# Runs the matching and price engines on a virtual clock
+# instead of wall time, so a simulated trading day takes as
+# long as its computation and the same inputs always give
+# the same output:
+# - Price ticks every MARKET_UPDATE_INTERVAL of virtual
+#   time, from a PriceEngine seeded with --seed
+# - An optional order log is replayed at its recorded
+#   timestamps, interleaved with the ticks. It is either a
+#   journal directory (see data/journal.py) or NDJSON with
+#   one event per line, in time order:
+#     {"type": "order", "timestamp": "2024-01-02T09:30:00",
+#      "trader_id": "...", "symbol": "AAPL", "price": 180.0,
+#      "quantity": 10, "order_type": "buy", "order_id": 7}
+#     {"type": "cancel", "timestamp": "...", "order_id": 7}
+#     {"type": "company", ...Company fields}
+#     {"type": "trader", ...Trader fields}
+#   Order lines default to type "order"; order_id is only
+#   needed by later cancels
+# - --speed N paces virtual time at N x wall time; without
+#   it ticks and orders run back to back
+#
+# NDJSON runs start from the sample data, with stable
+# trader IDs (initialization.sample_trader_id); journal runs
+# start empty, as the journal holds its own history.
+#
+# Output is the price and trade stream as NDJSON, in the
+# WebSocket message shapes (API units), plus order_rejected
+# events. Log prices must sit on their symbol's tick grid.
+#
+# Usage:
+#   python -m market.market.backtest --seed 7 --duration 23400
+#   python -m market.market.backtest --orders day.ndjson --speed 60
+#   python -m market.market.backtest --journal /var/lib/ecocome
+# ==============================================
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import IO, Iterable, Iterator, Optional, Tuple
+from ..config import settings
+from ..data import storage
+from ..data.journal import Journal, restore_state
+from ..data.storage import DataStorage
+from ..models import Company, Order, Trader
+from .matching import submit_order
+from .records import OrderRecord
+from .simulation import step_prices
+from .units import company_from_view, prices_view, trader_from_view
+
+# Where the clock starts when nothing in the input says otherwise
+DEFAULT_START = datetime(2024, 1, 2, 9, 30)
+
+TimedEvent = Tuple[Optional[datetime], tuple]
+
+
+class VirtualClock:
+    """Engine time that only moves when the backtest moves it"""
+
+    __slots__ = ("current",)
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+    def advance_to(self, moment: datetime):
+        if moment > self.current:
+            self.current = moment
+
+
+def read_order_log(lines: Iterable[str]) -> Iterator[TimedEvent]:
+    """Parse NDJSON order-log lines into (timestamp, journal-style event)"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        entry = json.loads(line)
+        kind = entry.pop("type", "order")
+        timestamp = entry.pop("timestamp", None)
+        if timestamp is not None:
+            timestamp = datetime.fromisoformat(timestamp)
+        if kind in ("order", "cancel") and timestamp is None:
+            raise ValueError(f"line {number}: {kind} needs a timestamp")
+
+        if kind == "order":
+            order = OrderRecord.from_model(Order(**entry))
+            yield timestamp, ("order", order, timestamp)
+        elif kind == "cancel":
+            yield timestamp, ("cancel", int(entry["order_id"]))
+        elif kind == "company":
+            company = company_from_view(Company(**entry).model_dump())
+            yield timestamp, ("company", company)
+        elif kind == "trader":
+            trader = trader_from_view(Trader(**entry).model_dump())
+            if trader["trader_id"] is None:
+                raise ValueError(f"line {number}: trader needs a trader_id")
+            yield timestamp, ("trader", trader["trader_id"], trader)
+        else:
+            raise ValueError(f"line {number}: unknown event type {kind!r}")
+
+
+def read_journal(directory: str) -> Iterator[TimedEvent]:
+    """A journal's recorded history; orders carry their original time"""
+    for event in Journal(directory).history():
+        yield (event[2] if event[0] == "order" else None), event
+
+
+class Backtest:
+    """
+    One deterministic run in a private DataStorage. run() swaps it in as
+    storage.data_store while the generator is being consumed.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        interval: Optional[float] = None,
+        speed: Optional[float] = None,
+        sample_data: bool = True,
+    ):
+        self.data_store = DataStorage(seed=seed)
+        if sample_data:
+            self.data_store.initialize_sample_data(stable_ids=True)
+        self.interval = timedelta(seconds=interval or settings.MARKET_UPDATE_INTERVAL)
+        self.speed = speed
+        self.clock: Optional[VirtualClock] = None
+        self.start: Optional[datetime] = None
+        self.next_tick: Optional[datetime] = None
+        self.stats = {"ticks": 0, "orders": 0, "rejected": 0, "trades": 0}
+        self._wall_start = 0.0
+
+    def _start_clock(self, start: datetime):
+        self.clock = VirtualClock(start)
+        self.start = start
+        self.data_store.clock = self.clock.now
+        self.next_tick = start + self.interval
+        self._wall_start = time.perf_counter()
+
+    def _pace(self, moment: datetime):
+        """With a speed, sleep until `moment` is due in scaled wall time"""
+        if not self.speed:
+            return
+        virtual = (moment - self.start).total_seconds()
+        delay = self._wall_start + virtual / self.speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _ticks_until(self, moment: datetime) -> Iterator[dict]:
+        while self.next_tick <= moment:
+            tick = self.next_tick
+            self._pace(tick)
+            self.clock.advance_to(tick)
+            prices = step_prices(self.data_store.price_engine)
+            self.data_store.leaderboard.reprice(prices)
+            self.stats["ticks"] += 1
+            self.next_tick = tick + self.interval
+            if prices:
+                yield {
+                    "type": "price_update",
+                    "prices": prices_view(prices),
+                    "timestamp": tick.isoformat(),
+                }
+
+    def _apply(self, event: tuple) -> Iterator[dict]:
+        data_store = self.data_store
+        kind = event[0]
+        if kind == "snapshot":
+            restore_state(data_store, event[1])
+        elif kind == "company":
+            if event[1]["symbol"] not in data_store.companies:
+                data_store.add_company(event[1])
+        elif kind == "trader":
+            data_store.add_trader(event[1], event[2])
+        elif kind == "order":
+            order = event[1]
+            reason = self._reject_reason(order)
+            if reason is not None:
+                self.stats["rejected"] += 1
+                yield {
+                    "type": "order_rejected",
+                    "order": order.to_dict(),
+                    "reason": reason,
+                    "timestamp": self.clock.now().isoformat(),
+                }
+                return
+            if order.order_id is not None:
+                data_store.last_order_id = max(data_store.last_order_id, order.order_id)
+            _, trades = submit_order(order)
+            self.stats["orders"] += 1
+            self.stats["trades"] += len(trades)
+            for trade in trades:
+                yield {"type": "trade_executed", "trade": trade.to_dict()}
+        elif kind == "allocate":
+            data_store.allocate_shares(event[1], event[2], event[3])
+        elif kind == "cash":
+            data_store.move_cash(event[1], event[2])
+        elif kind == "cancel":
+            data_store.remove_order(event[1])
+        elif kind == "reduce":
+            if event[1] in data_store.order_index:
+                data_store.reduce_order(event[1], event[2])
+        # "trade" records are regenerated by replaying orders
+
+    def _reject_reason(self, order: OrderRecord) -> Optional[str]:
+        data_store = self.data_store
+        if order.symbol not in data_store.companies:
+            return "Invalid stock symbol"
+        if order.trader_id not in data_store.traders:
+            return "Invalid trader ID"
+        if order.order_type not in ("buy", "sell"):
+            return "Invalid order type"
+        if order.quantity <= 0 or (order.price is not None and order.price <= 0):
+            return "Invalid order"
+        if order.order_id in data_store.order_index:
+            return "Duplicate order ID"
+        shortfall = data_store.shortfall(order)
+        if shortfall is not None:
+            return (
+                "Insufficient funds" if shortfall == "cash" else "Insufficient shares"
+            )
+        return None
+
+    def run(
+        self,
+        events: Iterable[TimedEvent] = (),
+        start: Optional[datetime] = None,
+        duration: Optional[float] = None,
+    ) -> Iterator[dict]:
+        """
+        Apply (timestamp, event) pairs in order with price ticks in
+        between. The clock starts at `start`, else at the first timestamp
+        (DEFAULT_START if there is none); the run ends `duration` virtual
+        seconds after the start, else after the last event.
+        """
+        previous, storage.data_store = storage.data_store, self.data_store
+        try:
+            if start is not None:
+                self._start_clock(start)
+            for timestamp, event in events:
+                if timestamp is not None:
+                    if self.clock is None:
+                        self._start_clock(timestamp)
+                    yield from self._ticks_until(timestamp)
+                    self._pace(timestamp)
+                    self.clock.advance_to(timestamp)
+                yield from self._apply(event)
+
+            if self.clock is None:
+                self._start_clock(DEFAULT_START)
+            if duration is not None:
+                yield from self._ticks_until(self.start + timedelta(seconds=duration))
+        finally:
+            storage.data_store = previous
+
+
+def write_stream(messages: Iterable[dict], output: IO[str]) -> int:
+    count = 0
+    for message in messages:
+        output.write(json.dumps(message, default=str) + "\n")
+        count += 1
+    return count
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Deterministic virtual-clock market simulation and order replay"
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--orders", help="NDJSON order log to replay")
+    source.add_argument("--journal", help="journal directory to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, help="virtual seconds to run")
+    parser.add_argument(
+        "--interval", type=float, help="seconds between price ticks (virtual)"
+    )
+    parser.add_argument(
+        "--speed", type=float, help="N x wall-clock speed (default: unpaced)"
+    )
+    parser.add_argument(
+        "--start", type=datetime.fromisoformat, help="virtual start time (ISO)"
+    )
+    parser.add_argument("--output", help="NDJSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.orders is None and args.journal is None and args.duration is None:
+        parser.error("give --duration, --orders or --journal")
+    if args.journal is not None and not os.path.isdir(args.journal):
+        parser.error(f"no journal directory at {args.journal}")
+
+    backtest = Backtest(
+        seed=args.seed,
+        interval=args.interval,
+        speed=args.speed,
+        sample_data=args.journal is None,
+    )
+    log = open(args.orders) if args.orders else None
+    output = open(args.output, "w") if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        if log is not None:
+            events = read_order_log(log)
+        elif args.journal is not None:
+            events = read_journal(args.journal)
+        else:
+            events = ()
+        write_stream(backtest.run(events, args.start, args.duration), output)
+    finally:
+        if log is not None:
+            log.close()
+        if output is not sys.stdout:
+            output.close()
+
+    wall = time.perf_counter() - started
+    virtual = (backtest.clock.now() - backtest.start).total_seconds()
+    stats = ", ".join(f"{name} {count}" for name, count in backtest.stats.items())
+    print(
+        f"{stats}; {virtual:.0f}s virtual in {wall:.2f}s wall "
+        f"({virtual / wall if wall else 0:.0f}x)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# ==============================================
+# OHLCV Candle Builder
+# ==============================================
+# Streams executed trades into bars per symbol and interval:
+# - open / high / low / close / volume / VWAP / trade count
+# - One series per (symbol, interval) for every interval in
+#   CANDLE_INTERVALS (1s, 1m, 5m, 1h by default)
+# - Each series keeps its last CANDLE_HISTORY_LIMIT bars in
+#   a bounded deque; the oldest bar falls off the front
+#
+# A trade touches only the newest bar of each series, so
+# the cost per trade is O(number of intervals). Bars are
+# aligned to multiples of the interval since the epoch and
+# only exist for intervals that saw at least one trade.
+# Prices are integer ticks (units.py); to_dict() converts a
+# bar to API units for its symbol.
+# ==============================================
+
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple
+from ..config import settings
+from .units import from_ticks
+
+
+class Candle:
+    """One bar; VWAP is derived from the running notional"""
+
+    __slots__ = (
+        "start",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volume",
+        "notional",
+        "trades",
+    )
+
+    def __init__(self, start: int, price: int):
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = 0
+        self.notional = 0
+        self.trades = 0
+
+    def add(self, price: int, quantity: int):
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += quantity
+        self.notional += price * quantity
+        self.trades += 1
+
+    def to_dict(self, symbol: str) -> dict:
+        vwap = None
+        if self.volume:
+            vwap = round(from_ticks(symbol, self.notional) / self.volume, 4)
+        return {
+            "start": datetime.fromtimestamp(self.start).isoformat(),
+            "open": from_ticks(symbol, self.open),
+            "high": from_ticks(symbol, self.high),
+            "low": from_ticks(symbol, self.low),
+            "close": from_ticks(symbol, self.close),
+            "volume": self.volume,
+            "vwap": vwap,
+            "trades": self.trades,
+        }
+
+
+class CandleSeries:
+    """Bounded, time-ordered bars for one symbol and interval"""
+
+    __slots__ = ("interval", "bars")
+
+    def __init__(self, interval: int, max_bars: int):
+        self.interval = interval
+        self.bars: Deque[Candle] = deque(maxlen=max_bars)
+
+    def add(self, price: int, quantity: int, timestamp: float) -> Candle:
+        start = int(timestamp // self.interval) * self.interval
+        bar = self.bars[-1] if self.bars else None
+        # Trades arrive in time order; a late one joins the newest bar
+        if bar is None or start > bar.start:
+            bar = Candle(start, price)
+            self.bars.append(bar)
+        bar.add(price, quantity)
+        return bar
+
+    def latest(self, limit: int) -> List[Candle]:
+        """Newest `limit` bars, oldest first"""
+        bars = list(islice(reversed(self.bars), limit))
+        bars.reverse()
+        return bars
+
+
+class CandleBuilder:
+    def __init__(
+        self,
+        intervals: Optional[Dict[str, int]] = None,
+        max_bars: Optional[int] = None,
+    ):
+        self.intervals = intervals or settings.CANDLE_INTERVALS
+        self.max_bars = max_bars or settings.CANDLE_HISTORY_LIMIT
+        self.series: Dict[Tuple[str, str], CandleSeries] = {}
+
+    def on_trade(
+        self, symbol: str, price: int, quantity: int, timestamp: datetime
+    ) -> List[Tuple[str, Candle]]:
+        """Fold one trade into every interval; returns (interval, bar) pairs"""
+        seconds = timestamp.timestamp()
+        updated = []
+        for name, interval in self.intervals.items():
+            series = self.series.get((symbol, name))
+            if series is None:
+                series = self.series[(symbol, name)] = CandleSeries(
+                    interval, self.max_bars
+                )
+            updated.append((name, series.add(price, quantity, seconds)))
+        return updated
+
+    def latest(self, symbol: str, interval: str, limit: int) -> List[Candle]:
+        series = self.series.get((symbol, interval))
+        return series.latest(limit) if series is not None else []
@@ -2,29 +2,196 @@
 # Trading Fee Calculator
 # ==============================================
 # Handles all fee-related calculations:
-# - Calculates trading fees based on trade value
-# - Uses TRADING_FEE_PERCENT from settings
+# - Maker/taker rates from FEE_TIERS, picked by the trader's
+#   rolling traded value over FEE_VOLUME_WINDOW_DAYS
+# - The resting order of a fill is the maker, the incoming
+#   order the taker
 # - Splits fees between buyer and seller
-# - Currently uses same fee for both parties
 #
 # Fee Structure:
-# - Base fee: TRADING_FEE_PERCENT of trade value
-# - Buyer pays: base fee
-# - Seller pays: base fee
+# - FEE_TIERS: (minimum window volume, maker %, taker %),
+#   the base tier being TRADING_FEE_PERCENT for both
+# - Tier lookup is a binary search over the thresholds
+# - Volume is kept per trader in a ring of time buckets
+#   (FEE_VOLUME_BUCKET_SECONDS each) with a running total:
+#   recording a fill is O(1), and buckets that age out of
+#   the window are cleared as the ring moves forward
+# - Buy reservations use the highest rate in the schedule,
+#   so a resting order stays covered whatever tier it fills at
+#
+# Money is integer minor units (see units.py) and rates are
+# integer parts per million, so fees are exact: each fill's
+# fee is rounded half up to a minor unit. Reservations round
+# the fee up per share, which keeps them linear in quantity
+# (partial releases add back up exactly) and never below
+# what any fill can charge.
 # ==============================================
 
-from typing import Dict
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from ..config import settings
+from .units import to_minor
+
+RATE_SCALE = 1_000_000  # Rates are parts per million of the trade value
+
+
+def fee_rate(percent: float) -> int:
+    """A percentage rate in parts per million"""
+    return round(percent * RATE_SCALE / 100)
 
 
-def calculate_trading_fees(trade_value: float) -> Dict[str, float]:
+def fee_amount(trade_value: int, rate: int) -> int:
+    """Fee on a trade value in minor units, rounded half up"""
+    return (trade_value * rate + RATE_SCALE // 2) // RATE_SCALE
+
+
+def calculate_trading_fees(
+    trade_value: int,
+    buyer_percent: Optional[float] = None,
+    seller_percent: Optional[float] = None,
+) -> Dict[str, int]:
     """
-    Calculate trading fees for a transaction
+    Calculate trading fees in minor units; rates default to the base tier
     Returns: {'buyer_fee': fee, 'seller_fee': fee}
     """
-    fee_percent = settings.TRADING_FEE_PERCENT
-    fee_amount = trade_value * fee_percent / 100
+    base = settings.TRADING_FEE_PERCENT
+    buyer_percent = base if buyer_percent is None else buyer_percent
+    seller_percent = base if seller_percent is None else seller_percent
+    return {
+        "buyer_fee": fee_amount(trade_value, fee_rate(buyer_percent)),
+        "seller_fee": fee_amount(trade_value, fee_rate(seller_percent)),
+    }
+
+
+def max_fee_rate() -> int:
+    """Highest maker or taker rate any trader can be charged, in ppm"""
+    return fee_rate(max(max(maker, taker) for _, maker, taker in settings.FEE_TIERS))
+
+
+def buy_order_cost(unit_price: int, quantity: int) -> int:
+    """
+    Most a buy order can cost, in minor units: per share, its limit price
+    (in minor units) plus the highest fee on it, rounded up
+    """
+    fee = -(-unit_price * max_fee_rate() // RATE_SCALE)
+    return (unit_price + fee) * quantity
+
+
+class RollingVolume:
+    """One trader's traded value over the last `len(buckets)` buckets"""
+
+    __slots__ = ("buckets", "head", "total")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.head: Optional[int] = None  # newest bucket number
+        self.total = 0
+
+    def _advance(self, bucket: int):
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return  # late fills count toward the newest bucket
+        size = len(self.buckets)
+        if bucket - self.head >= size:
+            self.buckets = [0] * size
+            self.total = 0
+        else:
+            for number in range(self.head + 1, bucket + 1):
+                slot = number % size
+                self.total -= self.buckets[slot]
+                self.buckets[slot] = 0
+        self.head = bucket
+
+    def add(self, bucket: int, value: int):
+        self._advance(bucket)
+        self.buckets[self.head % len(self.buckets)] += value
+        self.total += value
+
+    def volume(self, bucket: int) -> int:
+        self._advance(bucket)
+        return self.total
+
+
+class FeeSchedule:
+    """
+    Volume-tiered maker/taker rates plus every trader's rolling volume.
+    Thresholds and volumes are minor units, rates parts per million.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[List[Tuple[float, float, float]]] = None,
+        window_days: Optional[float] = None,
+        bucket_seconds: Optional[int] = None,
+    ):
+        self.tiers = sorted(tiers or settings.FEE_TIERS)
+        self.thresholds = [to_minor(tier[0]) for tier in self.tiers]
+        self.rates = [(fee_rate(tier[1]), fee_rate(tier[2])) for tier in self.tiers]
+        self.bucket_seconds = bucket_seconds or settings.FEE_VOLUME_BUCKET_SECONDS
+        window = (window_days or settings.FEE_VOLUME_WINDOW_DAYS) * 86400
+        self.window_buckets = max(1, int(window // self.bucket_seconds))
+        self.volumes: Dict[str, RollingVolume] = {}
+
+    def _bucket(self, when: datetime) -> int:
+        return int(when.timestamp() // self.bucket_seconds)
+
+    def _volume_at(self, trader_id: str, bucket: int) -> int:
+        rolling = self.volumes.get(trader_id)
+        return 0 if rolling is None else rolling.volume(bucket)
+
+    def _tier_at(self, trader_id: str, bucket: int) -> int:
+        volume = self._volume_at(trader_id, bucket)
+        return max(bisect_right(self.thresholds, volume) - 1, 0)
+
+    def _record_at(self, trader_id: str, bucket: int, trade_value: int):
+        rolling = self.volumes.get(trader_id)
+        if rolling is None:
+            rolling = self.volumes[trader_id] = RollingVolume(self.window_buckets)
+        rolling.add(bucket, trade_value)
+
+    def volume(self, trader_id: str, when: datetime) -> int:
+        return self._volume_at(trader_id, self._bucket(when))
+
+    def tier(self, trader_id: str, when: datetime) -> int:
+        """Index into the tiers of the trader's current volume"""
+        return self._tier_at(trader_id, self._bucket(when))
+
+    def describe(self, index: int) -> dict:
+        """One tier as configured (API units)"""
+        min_volume, maker, taker = self.tiers[index]
+        return {
+            "tier": index,
+            "min_volume": min_volume,
+            "maker_percent": maker,
+            "taker_percent": taker,
+        }
+
+    def record(self, trader_id: str, trade_value: int, when: datetime):
+        self._record_at(trader_id, self._bucket(when), trade_value)
 
-    # Both buyer and seller pay the same fee in this model
-    # Could be modified to have different fee structures
-    return {"buyer_fee": fee_amount, "seller_fee": fee_amount}
+    def settle(
+        self,
+        buyer_id: str,
+        seller_id: str,
+        trade_value: int,
+        buyer_is_taker: bool,
+        when: datetime,
+    ) -> Dict[str, int]:
+        """Fees for one fill at each side's tier, then count its volume"""
+        bucket = self._bucket(when)
+        buyer_rates = self.rates[self._tier_at(buyer_id, bucket)]
+        seller_rates = self.rates[self._tier_at(seller_id, bucket)]
+        fees = {
+            "buyer_fee": fee_amount(
+                trade_value, buyer_rates[1] if buyer_is_taker else buyer_rates[0]
+            ),
+            "seller_fee": fee_amount(
+                trade_value, seller_rates[0] if buyer_is_taker else seller_rates[1]
+            ),
+        }
+        self._record_at(buyer_id, bucket, trade_value)
+        self._record_at(seller_id, bucket, trade_value)
+        return fees
@@ -0,0 +1,166 @@
+# ==============================================
+# Mark-to-Market Leaderboard
+# ==============================================
+# Keeps every trader's portfolio value and P&L current
+# without rescanning traders:
+# - value = cash + sum(quantity * mark) over positions
+# - pnl = value - contributed, where contributed is the
+#   starting cash plus shares brought in (the starting
+#   portfolio and IPO allocations) at their IPO price
+# - holders: symbol -> {trader ID: quantity}, so a price
+#   move revalues only that symbol's holders
+# - ranking: (-pnl, trader ID) kept sorted with bisect,
+#   best first, so top(n) is a slice
+#
+# Settlement (matching._apply_trade) and allocations adjust
+# one trader at a time. A price tick that changes more than
+# RESORT_FRACTION of the traders re-sorts the ranking once
+# instead of moving each entry. Marks are the engine prices
+# as of the last reprice(); trades don't move them.
+#
+# Marks are integer ticks and values/contributions integer
+# minor units (units.py), so incremental updates never
+# drift from a full revaluation. Entries are in API units.
+# ==============================================
+
+from bisect import bisect_left, insort
+from typing import Dict, List, Mapping, Optional, Tuple
+from .units import from_minor, tick_value
+
+RESORT_FRACTION = 0.125
+
+
+class Leaderboard:
+    def __init__(self):
+        self.marks: Dict[str, int] = {}
+        self.tick_values: Dict[str, int] = {}
+        self.holders: Dict[str, Dict[str, int]] = {}
+        self.values: Dict[str, int] = {}
+        self.contributed: Dict[str, int] = {}
+        self._ranking: List[Tuple[int, str]] = []
+        self._keys: Dict[str, Tuple[int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def set_mark(self, symbol: str, price: int):
+        """Price a newly listed symbol (later moves go through reprice)"""
+        self.marks[symbol] = price
+        self.tick_values[symbol] = tick_value(symbol)
+        self.holders.setdefault(symbol, {})
+
+    def _mark_value(self, symbol: str) -> int:
+        """One share at the mark, in minor units"""
+        if symbol not in self.marks:
+            return 0
+        return self.marks[symbol] * self.tick_values[symbol]
+
+    def add_trader(
+        self,
+        trader_id: str,
+        cash: int,
+        portfolio: Mapping[str, int],
+        contributed: int,
+    ):
+        """Start tracking a trader, or re-track one restored from a snapshot"""
+        if trader_id in self.values:
+            self._unrank(trader_id)
+            for positions in self.holders.values():
+                positions.pop(trader_id, None)
+        value = cash
+        for symbol, quantity in portfolio.items():
+            if quantity:
+                self.holders.setdefault(symbol, {})[trader_id] = quantity
+                value += quantity * self._mark_value(symbol)
+        self.values[trader_id] = value
+        self.contributed[trader_id] = contributed
+        self._rank(trader_id)
+
+    def adjust(
+        self,
+        trader_id: str,
+        cash_delta: int,
+        symbol: Optional[str] = None,
+        quantity_delta: int = 0,
+    ):
+        """Apply one settlement or allocation to a trader's value"""
+        value_delta = cash_delta
+        if quantity_delta:
+            positions = self.holders.setdefault(symbol, {})
+            quantity = positions.get(trader_id, 0) + quantity_delta
+            if quantity:
+                positions[trader_id] = quantity
+            else:
+                positions.pop(trader_id, None)
+            value_delta += quantity_delta * self._mark_value(symbol)
+        self._unrank(trader_id)
+        self.values[trader_id] += value_delta
+        self._rank(trader_id)
+
+    def contribute(self, trader_id: str, amount: int):
+        """Capital brought in from outside, which isn't profit"""
+        self._unrank(trader_id)
+        self.contributed[trader_id] += amount
+        self._rank(trader_id)
+
+    def reprice(self, prices: Mapping[str, int]):
+        """Revalue the holders of the symbols whose price (ticks) moved"""
+        deltas: Dict[str, int] = {}
+        for symbol, price in prices.items():
+            if symbol not in self.marks:
+                self.set_mark(symbol, price)
+                continue
+            move = (price - self.marks[symbol]) * self.tick_values[symbol]
+            self.marks[symbol] = price
+            if not move:
+                continue
+            for trader_id, quantity in self.holders.get(symbol, {}).items():
+                deltas[trader_id] = deltas.get(trader_id, 0) + quantity * move
+        if not deltas:
+            return
+
+        values = self.values
+        if len(deltas) > RESORT_FRACTION * len(values):
+            for trader_id, delta in deltas.items():
+                values[trader_id] += delta
+            self._keys = {trader_id: self._key(trader_id) for trader_id in self._keys}
+            self._ranking = sorted(self._keys.values())
+        else:
+            for trader_id, delta in deltas.items():
+                self._unrank(trader_id)
+                values[trader_id] += delta
+                self._rank(trader_id)
+
+    def pnl(self, trader_id: str) -> int:
+        return self.values[trader_id] - self.contributed[trader_id]
+
+    def top(self, n: int) -> List[dict]:
+        """The n traders with the highest P&L, best first"""
+        return [
+            self._entry(rank, trader_id)
+            for rank, (_, trader_id) in enumerate(self._ranking[:n], 1)
+        ]
+
+    def standing(self, trader_id: str) -> dict:
+        """One trader's entry; the rank is a binary search, not a scan"""
+        rank = bisect_left(self._ranking, self._keys[trader_id]) + 1
+        return self._entry(rank, trader_id)
+
+    def _entry(self, rank: int, trader_id: str) -> dict:
+        return {
+            "rank": rank,
+            "trader_id": trader_id,
+            "value": from_minor(self.values[trader_id]),
+            "pnl": from_minor(self.pnl(trader_id)),
+        }
+
+    def _key(self, trader_id: str) -> Tuple[int, str]:
+        return (-self.pnl(trader_id), trader_id)
+
+    def _rank(self, trader_id: str):
+        key = self._keys[trader_id] = self._key(trader_id)
+        insort(self._ranking, key)
+
+    def _unrank(self, trader_id: str):
+        key = self._keys.pop(trader_id)
+        del self._ranking[bisect_left(self._ranking, key)]
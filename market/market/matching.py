@@ -2,239 +2,178 @@
 # Order Matching Module
 # ==============================================
 # This module handles order matching and trade execution:
-# - Matches buy/sell orders based on price priority
-# - Executes trades between matched orders
+# - Matches buy/sell orders based on price-time priority
+# - Executes trades between matched orders, charging the
+#   resting side maker and the incoming side taker fees
 # - Updates trader portfolios and balances
-# - Records trade history
+# - Records trade history and feeds the candle builder
+#
+# Orders are matched continuously as they arrive: an
+# incoming order walks only the crossing levels on the
+# opposite side of its own book, and orders inside a level
+# fill strictly in arrival order. Books are never left
+# crossed, so there is nothing to match on a timer.
+# Only GTC limit orders rest: IOC and market orders drop
+# their unfilled remainder, and FOK orders first check the
+# crossing levels' aggregate quantity and trade in full or
+# not at all, so none of them ever touch the book.
+#
+# Prices are integer ticks and cash integer minor units
+# (units.py): level comparisons are integer compares and
+# settlement is exact, with no rounding to drift.
 # ==============================================
 
+import time
 from datetime import datetime
-import uuid
-from ..models import Trade, Order
+from typing import List, Optional, Tuple
 from ..data import storage
-from .fees import calculate_trading_fees
-
-
-async def execute_trade(
-    buyer_id: str, seller_id: str, symbol: str, price: float, quantity: int
-) -> Trade:
-    """Execute a trade between buyer and seller with fees"""
-    async with storage.data_store.lock:
-        # Get references to traders
-        buyer = storage.data_store.traders[buyer_id]
-        seller = storage.data_store.traders[seller_id]
-
-        # Calculate trade value and fees
-        trade_value = price * quantity
-        fees = calculate_trading_fees(trade_value)
-
-        # Update buyer portfolio (pay price + fees)
-        buyer.portfolio[symbol] = buyer.portfolio.get(symbol, 0) + quantity
-        buyer.cash -= trade_value + fees["buyer_fee"]
-
-        # Update seller portfolio (receive price - fees)
-        seller.portfolio[symbol] = seller.portfolio.get(symbol, 0) - quantity
-        seller.cash += trade_value - fees["seller_fee"]
-
-        # Record trade
-        trade = Trade(
-            trade_id=str(uuid.uuid4()),
-            symbol=symbol,
-            price=price,
-            quantity=quantity,
-            buyer=buyer_id,
-            seller=seller_id,
-            fees=fees,
-            timestamp=datetime.now()
-        )
-        storage.data_store.trade_history.append(trade)
-
-        return trade
-
-
-async def match_orders():
-    """Match buy and sell orders in the order book"""
+from .records import OrderRecord, TradeRecord
+from .units import tick_value
+from ..metrics import Counter, Histogram
+
+ORDERS = Counter("market_orders_total", "Orders submitted", ["symbol", "side"])
+FILLS = Counter("market_fills_total", "Fills executed", ["symbol"])
+FILLED_QUANTITY = Counter("market_filled_quantity_total", "Shares traded", ["symbol"])
+SUBMIT_LATENCY = Histogram(
+    "market_submit_order_seconds", "Time to match and rest one order"
+)
+EXECUTE_TRADE_LATENCY = Histogram(
+    "market_execute_trade_seconds", "execute_trade time, trader lock wait included"
+)
+
+
+def _apply_trade(
+    buyer_id: str,
+    seller_id: str,
+    symbol: str,
+    price: int,
+    quantity: int,
+    timestamp: Optional[datetime] = None,
+    buyer_is_taker: bool = True,
+) -> TradeRecord:
+    """Settle a trade; runs without awaiting, so it is atomic"""
+    # Get references to traders
     data_store = storage.data_store
-    for symbol in list(data_store.order_book.keys()):
-        if symbol not in data_store.order_book:
-            continue
-            
-        async with data_store.lock:
-            # Sort orders by price priority
-            buy_orders = sorted(
-                data_store.order_book[symbol]["buy"],
-                key=lambda x: x.price,
-                reverse=True
-            )
-            sell_orders = sorted(
-                data_store.order_book[symbol]["sell"],
-                key=lambda x: x.price
-            )
-
-            # Match orders while possible
-            while buy_orders and sell_orders:
-                buy = buy_orders[0]
-                sell = sell_orders[0]
-                
-                if buy.price >= sell.price:
-                    # Execute trade at seller's price
-                    quantity = min(buy.quantity, sell.quantity)
-                    await execute_trade(
-                        buy.trader_id,
-                        sell.trader_id,
-                        symbol,
-                        sell.price,
-                        quantity
-                    )
-                    
-                    # Update or remove orders
-                    buy.quantity -= quantity
-                    sell.quantity -= quantity
-                    
-                    if buy.quantity == 0:
-                        buy_orders.pop(0)
-                        data_store.order_book[symbol]["buy"].remove(buy)
-                    if sell.quantity == 0:
-                        sell_orders.pop(0)
-                        data_store.order_book[symbol]["sell"].remove(sell)
-                else:
-                    break  # No more matches possible
-            # Sort orders by price priority
-            buy_orders = sorted(
-                data_store.order_book[symbol]["buy"],
-                key=lambda x: x.price,
-                reverse=True
-            )
-            sell_orders = sorted(
-                data_store.order_book[symbol]["sell"],
-                key=lambda x: x.price
-            )
-
-            # Match orders while possible
-            while buy_orders and sell_orders:
-                buy = buy_orders[0]
-                sell = sell_orders[0]
-                
-                if buy.price >= sell.price:
-                    # Execute trade at seller's price
-                    quantity = min(buy.quantity, sell.quantity)
-                    await execute_trade(
-                        buy.trader_id,
-                        sell.trader_id,
-                        symbol,
-                        sell.price,
-                        quantity
-                    )
-                    
-                    # Update or remove orders
-                    buy.quantity -= quantity
-                    sell.quantity -= quantity
-                    
-                    if buy.quantity == 0:
-                        buy_orders.pop(0)
-                    if sell.quantity == 0:
-                        sell_orders.pop(0)
-                else:
-                    break  # No more matches possible datetime
-from ..models import Trade
-from ..data import storage
-from .fees import calculate_trading_fees
+    buyer = data_store.traders[buyer_id]
+    seller = data_store.traders[seller_id]
+    timestamp = timestamp or data_store.now()
+
+    # Calculate trade value (minor units) and fees at each side's volume tier
+    trade_value = price * quantity * tick_value(symbol)
+    fees = data_store.fee_schedule.settle(
+        buyer_id, seller_id, trade_value, buyer_is_taker, timestamp
+    )
+
+    # Update buyer portfolio (pay price + fees)
+    buyer["portfolio"][symbol] = buyer["portfolio"].get(symbol, 0) + quantity
+    buyer["cash"] -= trade_value + fees["buyer_fee"]
+
+    # Update seller portfolio (receive price - fees)
+    seller["portfolio"][symbol] = seller["portfolio"].get(symbol, 0) - quantity
+    seller["cash"] += trade_value - fees["seller_fee"]
+    leaderboard = data_store.leaderboard
+    leaderboard.adjust(buyer_id, -trade_value - fees["buyer_fee"], symbol, quantity)
+    leaderboard.adjust(seller_id, trade_value - fees["seller_fee"], symbol, -quantity)
+
+    # Record trade
+    trade = TradeRecord(
+        data_store.next_trade_id(),
+        symbol,
+        price,
+        quantity,
+        buyer_id,
+        seller_id,
+        fees["buyer_fee"],
+        fees["seller_fee"],
+        timestamp,
+    )
+    data_store.trade_history.append(trade)
+    data_store.candles.on_trade(symbol, price, quantity, timestamp)
+    # Audit only: replaying the orders regenerates the same trades
+    data_store.record("trade", trade)
+
+    return trade
 
 
 async def execute_trade(
-    buyer_id: str, seller_id: str, symbol: str, price: float, quantity: int
-):
-    """Execute a trade between buyer and seller with fees"""
-    async with storage.data_store.lock:
-        # Get references to traders
-        buyer = storage.data_store.traders[buyer_id]
-        seller = storage.data_store.traders[seller_id]
-
-        # Calculate trade value and fees
-        trade_value = price * quantity
-        fees = calculate_trading_fees(trade_value)
-
-        # Update buyer portfolio (pay price + fees)
-        buyer["portfolio"][symbol] = buyer["portfolio"].get(symbol, 0) + quantity
-        buyer["cash"] -= trade_value + fees["buyer_fee"]
-
-        # Update seller portfolio (receive price - fees)
-        seller["portfolio"][symbol] = seller["portfolio"].get(symbol, 0) - quantity
-        seller["cash"] += trade_value - fees["seller_fee"]
-
-        # Record trade
-        trade = Trade(
-            trade_id=str(uuid.uuid4()),
-            symbol=symbol,
-            price=price,
-            quantity=quantity,
-            buyer=buyer_id,
-            seller=seller_id,
-            fees=fees,
-            timestamp=datetime.now(),
-        )
-        storage.data_store.trade_history.append(trade)
-
-        return trade
-
-
-async def match_orders():
-    """Match buy and sell orders in the order book"""
+    buyer_id: str, seller_id: str, symbol: str, price: int, quantity: int
+) -> TradeRecord:
+    """Execute a trade between buyer and seller with fees (buyer as taker)"""
+    started = time.perf_counter()
+    async with storage.data_store.lock_traders((buyer_id, seller_id)):
+        trade = _apply_trade(buyer_id, seller_id, symbol, price, quantity)
+    EXECUTE_TRADE_LATENCY.observe(time.perf_counter() - started)
+    return trade
+
+
+def submit_order(order: OrderRecord) -> Tuple[bool, List[TradeRecord]]:
+    """
+    Match an incoming order against the opposite side of its own book
+    and rest whatever is left if it is GTC; IOC and market remainders
+    are dropped, and a FOK that can't fill in full doesn't trade at all.
+    Caller must hold the symbol's lock. Assigns the order ID; returns
+    whether the order rests and the fills.
+    """
+    started = time.perf_counter()
     data_store = storage.data_store
-    for symbol in list(data_store.order_book.keys()):
-        if symbol not in data_store.order_book:
-            continue
-            
-        async with data_store.lock:
-
-        # Sort orders by price priority
-        buy_orders = sorted(
-            [o for o in data_store.order_book[symbol].get("buy", []) if o.quantity > 0],
-            key=lambda x: x.price,
-            reverse=True,
-        )
-        sell_orders = sorted(
-            [
-                o
-                for o in data_store.order_book[symbol].get("sell", [])
-                if o.quantity > 0
-            ],
-            key=lambda x: x.price,
+    if order.order_id is None:
+        order.order_id = data_store.next_order_id()
+    # One timestamp for the order and its fills keeps journal replay exact
+    now = data_store.now()
+    data_store.record("order", order, now)
+    book = data_store.order_book[order.symbol]
+    is_buy = order.order_type == "buy"
+    opposite = book.asks if is_buy else book.bids
+    limit = order.price  # None for market orders
+
+    # FOK is all or nothing: check the crossing levels' totals, O(levels)
+    killed = order.time_in_force == "FOK" and order.quantity > sum(
+        size for _, size in opposite.sweep(order.quantity, limit)
+    )
+
+    trades = []
+    while order.quantity > 0 and not killed:
+        level = opposite.best()
+        if level is None:
+            break
+        if limit is not None and (
+            (level.price > limit) if is_buy else (level.price < limit)
+        ):
+            break  # No more matches possible
+
+        # Execute trade at the resting order's price
+        resting = level.head()
+        quantity = min(order.quantity, resting.quantity)
+        buyer, seller = (order, resting) if is_buy else (resting, order)
+        trades.append(
+            _apply_trade(
+                buyer.trader_id,
+                seller.trader_id,
+                order.symbol,
+                level.price,
+                quantity,
+                now,
+                buyer_is_taker=is_buy,
+            )
         )
 
-        # Execute matching orders
-        while buy_orders and sell_orders:
-            best_buy = buy_orders[0]
-            best_sell = sell_orders[0]
-
-            if best_buy.price >= best_sell.price:
-                # Calculate trade parameters
-                trade_price = round((best_buy.price + best_sell.price) / 2, 2)
-                trade_quantity = min(best_buy.quantity, best_sell.quantity)
-
-                # Execute trade
-                await execute_trade(
-                    buyer_id=best_buy.trader_id,
-                    seller_id=best_sell.trader_id,
-                    symbol=symbol,
-                    price=trade_price,
-                    quantity=trade_quantity,
-                )
-
-                # Update order quantities
-                best_buy.quantity -= trade_quantity
-                best_sell.quantity -= trade_quantity
-
-                # Remove filled orders
-                if best_buy.quantity <= 0:
-                    buy_orders.pop(0)
-                if best_sell.quantity <= 0:
-                    sell_orders.pop(0)
-            else:
-                break
-
-        # Update order book
-        data_store.order_book[symbol]["buy"] = [o for o in buy_orders if o.quantity > 0]
-        data_store.order_book[symbol]["sell"] = [
-            o for o in sell_orders if o.quantity > 0
-        ]
+        # Update or remove the resting order
+        order.quantity -= quantity
+        level.fill(resting, quantity)
+        data_store.release(resting, quantity)
+        if resting.quantity == 0:
+            level.pop_head()
+            del data_store.order_index[resting.order_id]
+            if not level:
+                opposite.remove_level(level)
+
+    resting = order.quantity > 0 and order.time_in_force == "GTC"
+    if resting:
+        data_store.add_order(order)
+
+    ORDERS.labels(order.symbol, order.order_type).inc()
+    if trades:
+        FILLS.labels(order.symbol).inc(len(trades))
+        FILLED_QUANTITY.labels(order.symbol).inc(sum(t.quantity for t in trades))
+    SUBMIT_LATENCY.observe(time.perf_counter() - started)
+    return resting, trades
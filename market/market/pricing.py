@@ -0,0 +1,104 @@
+# ==============================================
+# Vectorized Price Engine
+# ==============================================
+# Holds every symbol's price in one contiguous NumPy array
+# and steps the whole universe with a single vectorized call:
+# - "uniform": percentage change drawn from
+#   PRICE_FLUCTUATION_RANGE (the original model)
+# - "gbm": geometric Brownian motion with GBM_DRIFT and
+#   GBM_VOLATILITY per update, optionally correlated via a
+#   symbol x symbol correlation matrix (Cholesky factor)
+#
+# Symbols are assigned array slots in registration order;
+# DataStorage keeps the companies view in sync with it.
+#
+# Prices are integer ticks (see units.py), held as whole
+# float64 values so the models stay vectorized: each step
+# rounds to the nearest tick and floors at the slot's
+# minimum (MIN_PRICE in ticks of that symbol).
+# ==============================================
+
+from typing import Dict, List, Optional
+import numpy as np
+from ..config import settings
+
+MIN_PRICE = 1.0  # Lowest simulated price, API units
+
+
+class PriceEngine:
+    def __init__(self, model: Optional[str] = None, seed: Optional[int] = None):
+        self.model = model or settings.PRICE_MODEL
+        if self.model not in ("uniform", "gbm"):
+            raise ValueError(f"Unknown price model: {self.model}")
+        self.rng = np.random.default_rng(seed)
+        self.symbols: List[str] = []
+        self.slots: Dict[str, int] = {}
+        self._prices = np.empty(16, dtype=np.float64)
+        self._floors = np.empty(16, dtype=np.float64)
+        self._cholesky: Optional[np.ndarray] = None
+        # Bumped on every price change so readers can sync lazily
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def prices(self) -> np.ndarray:
+        """Current prices, indexed by slot (a view, not a copy)"""
+        return self._prices[: len(self.symbols)]
+
+    def add_symbol(self, symbol: str, price: int, floor: int = 1) -> int:
+        """Add a symbol at `price` ticks, never stepping below `floor`"""
+        slot = len(self.symbols)
+        if slot == len(self._prices):
+            self._prices = np.resize(self._prices, 2 * slot)
+            self._floors = np.resize(self._floors, 2 * slot)
+        self._prices[slot] = price
+        self._floors[slot] = floor
+        self.symbols.append(symbol)
+        self.slots[symbol] = slot
+        if self._cholesky is not None:
+            # New symbols start uncorrelated with the existing universe
+            grown = np.eye(slot + 1)
+            grown[:slot, :slot] = self._cholesky
+            self._cholesky = grown
+        self.version += 1
+        return slot
+
+    def price(self, symbol: str) -> int:
+        return int(self._prices[self.slots[symbol]])
+
+    def set_correlation(self, correlation: Optional[np.ndarray]):
+        """Correlate GBM shocks; matrix rows/columns follow slot order"""
+        if correlation is None:
+            self._cholesky = None
+            return
+        correlation = np.asarray(correlation, dtype=np.float64)
+        n = len(self.symbols)
+        if correlation.shape != (n, n):
+            raise ValueError(f"Correlation matrix must be {n}x{n}")
+        self._cholesky = np.linalg.cholesky(correlation)
+
+    def step(self) -> np.ndarray:
+        """Advance every price by one update, returns the new prices (ticks)"""
+        prices = self.prices
+        n = len(prices)
+        if n == 0:
+            return prices
+
+        if self.model == "uniform":
+            min_change, max_change = settings.PRICE_FLUCTUATION_RANGE
+            change = self.rng.uniform(min_change, max_change, n)
+            prices *= 1 + change / 100
+        else:
+            drift = settings.GBM_DRIFT / 100
+            volatility = settings.GBM_VOLATILITY / 100
+            shocks = self.rng.standard_normal(n)
+            if self._cholesky is not None:
+                shocks = self._cholesky @ shocks
+            prices *= np.exp(drift - 0.5 * volatility**2 + volatility * shocks)
+
+        np.rint(prices, out=prices)
+        np.maximum(prices, self._floors[:n], out=prices)
+        self.version += 1
+        return prices
@@ -0,0 +1,176 @@
+# ==============================================
+# Engine Records
+# ==============================================
+# Compact internal representations used on the hot path:
+# - OrderRecord: a resting/incoming order inside the books
+#   (limit or market, with its time in force)
+# - TradeRecord: one executed fill in the trade store
+#
+# Both are plain __slots__ classes: no per-instance dict,
+# no validation, integer IDs from DataStorage's sequences.
+# Prices are integer ticks and fees integer minor units
+# (see units.py). The pydantic models in models.py are the
+# API shape; convert with from_model()/to_model() at the API
+# boundary only. to_dict() gives the plain API form (float
+# prices and fees) used in WebSocket messages and exports;
+# the journal pickles the records themselves.
+# ==============================================
+
+from datetime import datetime
+from typing import Optional
+from ..models import Order, Trade
+from .units import from_minor, from_ticks, to_ticks
+
+ORDER_KINDS = ("limit", "market")
+TIME_IN_FORCE = ("GTC", "IOC", "FOK")
+
+
+class OrderRecord:
+    """
+    price is None for a market order. Only GTC orders ever rest;
+    IOC, FOK and market orders match on arrival and drop the rest.
+    """
+
+    __slots__ = (
+        "order_id",
+        "trader_id",
+        "symbol",
+        "price",
+        "quantity",
+        "order_type",
+        "time_in_force",
+    )
+
+    def __init__(
+        self,
+        order_id: int,
+        trader_id: str,
+        symbol: str,
+        price: Optional[int],
+        quantity: int,
+        order_type: str,
+        time_in_force: str = "GTC",
+    ):
+        self.order_id = order_id
+        self.trader_id = trader_id
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+        self.order_type = order_type
+        self.time_in_force = time_in_force
+
+    @classmethod
+    def from_model(cls, order: Order, order_id: Optional[int] = None) -> "OrderRecord":
+        """
+        ValueError if the price is off the symbol's tick grid, or missing
+        from (or given to) the wrong kind of order
+        """
+        if order.kind not in ORDER_KINDS:
+            raise ValueError("Invalid order kind")
+        market = order.kind == "market"
+        time_in_force = order.time_in_force or ("IOC" if market else "GTC")
+        if time_in_force not in TIME_IN_FORCE:
+            raise ValueError("Invalid time in force")
+        if market:
+            if order.price is not None:
+                raise ValueError("Market orders take no price")
+            if time_in_force == "GTC":
+                raise ValueError("Market orders can't rest (use IOC or FOK)")
+            price = None
+        elif order.price is None:
+            raise ValueError("Limit orders need a price")
+        else:
+            price = to_ticks(order.symbol, order.price)
+        return cls(
+            order_id if order_id is not None else order.order_id,
+            order.trader_id,
+            order.symbol,
+            price,
+            order.quantity,
+            order.order_type,
+            time_in_force,
+        )
+
+    @property
+    def is_market(self) -> bool:
+        return self.price is None
+
+    def to_model(self) -> Order:
+        return Order(**self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "trader_id": self.trader_id,
+            "symbol": self.symbol,
+            "price": None if self.is_market else from_ticks(self.symbol, self.price),
+            "quantity": self.quantity,
+            "order_type": self.order_type,
+            "kind": "market" if self.is_market else "limit",
+            "time_in_force": self.time_in_force,
+        }
+
+    def replace(self, **changes) -> "OrderRecord":
+        """Copy with some fields changed (engine units)"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        return OrderRecord(**dict(fields, **changes))
+
+    def __repr__(self) -> str:
+        return f"OrderRecord({self.to_dict()})"
+
+
+class TradeRecord:
+    __slots__ = (
+        "trade_id",
+        "symbol",
+        "price",
+        "quantity",
+        "buyer",
+        "seller",
+        "buyer_fee",
+        "seller_fee",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        trade_id: int,
+        symbol: str,
+        price: int,
+        quantity: int,
+        buyer: str,
+        seller: str,
+        buyer_fee: int,
+        seller_fee: int,
+        timestamp: datetime,
+    ):
+        self.trade_id = trade_id
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+        self.buyer = buyer
+        self.seller = seller
+        self.buyer_fee = buyer_fee
+        self.seller_fee = seller_fee
+        self.timestamp = timestamp
+
+    def to_model(self) -> Trade:
+        return Trade(**self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "trade_id": self.trade_id,
+            "symbol": self.symbol,
+            "price": from_ticks(self.symbol, self.price),
+            "quantity": self.quantity,
+            "buyer": self.buyer,
+            "seller": self.seller,
+            "fees": {
+                "buyer_fee": from_minor(self.buyer_fee),
+                "seller_fee": from_minor(self.seller_fee),
+            },
+            "timestamp": self.timestamp,
+        }
+
+    def __repr__(self) -> str:
+        return f"TradeRecord({self.to_dict()})"
@@ -3,42 +3,72 @@
 # ==============================================
 # This module handles the market simulation features:
 # - Simulates price movements for all stocks
-# - Processes pending orders in the order book
-# - Broadcasts real-time market updates via WebSocket
+# - Revalues the holders of changed symbols (leaderboard.py)
+# - Publishes changed prices to WebSocket subscribers
 #
-# Price updates occur every MARKET_UPDATE_INTERVAL seconds
-# with fluctuations within PRICE_FLUCTUATION_RANGE
+# Orders are matched on arrival (see matching.submit_order),
+# so the simulator never touches the order book and takes
+# no symbol locks: price writes have no await points, and
+# the broadcast runs after the update with nothing held.
+#
+# Price updates occur every MARKET_UPDATE_INTERVAL seconds;
+# all symbols are stepped at once by the vectorized
+# PriceEngine (uniform or GBM, see PRICE_MODEL). For seeded
+# runs on a virtual clock see backtest.py.
 # ==============================================
 
-import random
 import asyncio
-from datetime import datetime
+import time
+from typing import Dict
+import numpy as np
 from ..data import storage
 from ..config import settings
-from .matching import match_orders
 from ..api.websocket import manager
+from ..metrics import Counter, Histogram
+from .units import prices_view
+
+TICK_DURATION = Histogram("market_simulator_tick_seconds", "Simulator tick duration")
+TICK_LAG = Histogram(
+    "market_simulator_tick_lag_seconds", "How late each tick started versus schedule"
+)
+TICK_OVERRUNS = Counter(
+    "market_simulator_tick_overruns_total",
+    "Ticks that took longer than MARKET_UPDATE_INTERVAL",
+)
+
+
+def step_prices(engine) -> Dict[str, int]:
+    """Advance every symbol one update; returns the moved prices in ticks"""
+    previous = engine.prices.copy()
+    prices = engine.step()
+    changed = np.flatnonzero(prices != previous)
+    return dict(
+        zip(
+            [engine.symbols[slot] for slot in changed.tolist()],
+            prices[changed].astype(np.int64).tolist(),
+        )
+    )
 
 
 async def market_simulator():
     """Background task to simulate market activity"""
+    scheduled = time.perf_counter()
     while True:
-        async with storage.data_store.lock:
-            # Update stock prices
-            for symbol, company in storage.data_store.companies.items():
-                min_change, max_change = settings.PRICE_FLUCTUATION_RANGE
-                change = random.uniform(min_change, max_change)
-                new_price = max(1, company["price"] * (1 + change / 100))
-                storage.data_store.companies[symbol]["price"] = round(new_price, 2)
-
-            # Process orders
-            await match_orders()
-
-            # Broadcast market update
-            market_data = {
-                "type": "market_update",
-                "companies": storage.data_store.companies,
-                "timestamp": datetime.now().isoformat(),
-            }
-            await manager.broadcast(str(market_data))
+        started = time.perf_counter()
+        TICK_LAG.observe(max(started - scheduled, 0.0))
+
+        # Update stock prices (one vectorized step for every symbol),
+        # revalue the holders of the symbols whose price actually moved
+        # and publish those
+        data_store = storage.data_store
+        prices = step_prices(data_store.price_engine)
+        data_store.leaderboard.reprice(prices)
+        await manager.publish_prices(prices_view(prices))
+
+        duration = time.perf_counter() - started
+        TICK_DURATION.observe(duration)
+        if duration > settings.MARKET_UPDATE_INTERVAL:
+            TICK_OVERRUNS.inc()
 
+        scheduled = time.perf_counter() + settings.MARKET_UPDATE_INTERVAL
         await asyncio.sleep(settings.MARKET_UPDATE_INTERVAL)
@@ -0,0 +1,110 @@
+# ==============================================
+# Fixed-Point Prices and Cash
+# ==============================================
+# The engine and storage never hold float money:
+# - Prices are integer ticks of the symbol's tick size
+#   (TICK_SIZES, else DEFAULT_TICK_SIZE), so book levels
+#   are exact integer keys
+# - Cash, fees, reservations, volumes and P&L are integer
+#   minor units (CASH_MINOR_UNITS per currency unit)
+# - A tick is a whole number of minor units (tick_value),
+#   so price * quantity is exact integer cash
+#
+# Floats exist only at the API edge: requests go through
+# to_ticks()/to_minor(), responses through from_ticks()/
+# from_minor() and the *_view() helpers. A price that is
+# not on its symbol's tick grid is rejected, not rounded.
+# ==============================================
+
+from typing import Dict
+from ..config import settings
+
+# How far a float may sit from the grid and still count as on it
+GRID_TOLERANCE = 1e-6
+
+
+def tick_size(symbol: str) -> float:
+    return settings.TICK_SIZES.get(symbol, settings.DEFAULT_TICK_SIZE)
+
+
+def tick_value(symbol: str) -> int:
+    """Minor units of cash per tick of price"""
+    size = tick_size(symbol)
+    units = round(size * settings.CASH_MINOR_UNITS)
+    if units < 1 or abs(units - size * settings.CASH_MINOR_UNITS) > GRID_TOLERANCE:
+        raise ValueError(
+            f"Tick size {size} of {symbol} is not a whole number of minor units"
+        )
+    return units
+
+
+def to_ticks(symbol: str, price: float) -> int:
+    """An API price as ticks; ValueError if it is off the tick grid"""
+    units = price * settings.CASH_MINOR_UNITS
+    value = tick_value(symbol)
+    ticks = round(units / value)
+    if abs(ticks * value - units) > GRID_TOLERANCE * max(1.0, abs(units)):
+        raise ValueError(f"{symbol} prices must be multiples of {tick_size(symbol)}")
+    return ticks
+
+
+def ticks_at_least(symbol: str, price: float) -> int:
+    """Fewest ticks worth at least `price`"""
+    units = round(price * settings.CASH_MINOR_UNITS)
+    return -(-units // tick_value(symbol))
+
+
+def from_ticks(symbol: str, ticks: int) -> float:
+    return ticks * tick_value(symbol) / settings.CASH_MINOR_UNITS
+
+
+def to_minor(amount: float) -> int:
+    """An API cash amount as minor units (nearest)"""
+    return round(amount * settings.CASH_MINOR_UNITS)
+
+
+def from_minor(units: int) -> float:
+    return units / settings.CASH_MINOR_UNITS
+
+
+def prices_view(prices: Dict[str, int]) -> Dict[str, float]:
+    return {symbol: from_ticks(symbol, ticks) for symbol, ticks in prices.items()}
+
+
+def company_view(company: dict) -> dict:
+    """A stored company in API units"""
+    symbol = company["symbol"]
+    return dict(
+        company,
+        price=from_ticks(symbol, company["price"]),
+        ipo_price=from_ticks(symbol, company["ipo_price"]),
+    )
+
+
+def company_from_view(company: dict) -> dict:
+    symbol = company["symbol"]
+    return dict(
+        company,
+        price=to_ticks(symbol, company["price"]),
+        ipo_price=to_ticks(symbol, company["ipo_price"]),
+    )
+
+
+CASH_FIELDS = ("cash", "reserved_cash", "contributed")
+
+
+def trader_view(trader: dict) -> dict:
+    """A stored trader in API units"""
+    view = dict(trader)
+    for field in CASH_FIELDS:
+        if field in view:
+            view[field] = from_minor(view[field])
+    return view
+
+
+def trader_from_view(trader: dict) -> dict:
+    stored = dict(trader)
+    for field in CASH_FIELDS:
+        if field in stored:
+            stored[field] = to_minor(stored[field])
+    return stored
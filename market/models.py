@@ -4,7 +4,9 @@
 # This module defines the core data models for the trading system:
 # - Company: Represents listed companies and their stock details
 # - Trader: Represents market participants and their portfolios
-# - Order: Represents buy/sell orders in the market
+# - Order: Represents buy/sell limit and market orders
+# - OrderAmend: Price/quantity changes to a resting order
+# - OrderBatch: Many orders submitted in one request
 # - Trade: Represents executed trades between buyers and sellers
 # ==============================================
 
@@ -22,21 +24,40 @@ class Company(BaseModel):
 
 
 class Trader(BaseModel):
+    trader_id: Optional[str] = None
     name: str
     cash: float
     portfolio: Dict[str, int] = {}
+    # Held by resting orders; available = cash/portfolio minus these
+    reserved_cash: float = 0.0
+    reserved_shares: Dict[str, int] = {}
 
 
 class Order(BaseModel):
+    order_id: Optional[int] = None  # Assigned by the server
     trader_id: str
     symbol: str
-    price: float
+    price: Optional[float] = None  # Required for limit orders, absent for market
     quantity: int
     order_type: str  # 'buy' or 'sell'
+    kind: str = "limit"  # 'limit' or 'market'
+    # 'GTC' rests any remainder, 'IOC' cancels it, 'FOK' fills completely
+    # or not at all; defaults to GTC for limit and IOC for market orders
+    time_in_force: Optional[str] = None
+
+
+class OrderAmend(BaseModel):
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+
+
+class OrderBatch(BaseModel):
+    orders: List[Order]
+    all_or_nothing: bool = False  # Reject the whole batch if any order fails
 
 
 class Trade(BaseModel):
-    trade_id: str
+    trade_id: int  # Assigned by the server, monotonically increasing
     symbol: str
     price: float
     quantity: int
@@ -44,8 +65,3 @@ class Trade(BaseModel):
     seller: str
     fees: Dict[str, float]  # {'buyer_fee': 1.5, 'seller_fee': 1.5}
     timestamp: datetime
-    portfolio: Dict[str, int] = {}
-    performance_history: List[Dict[str, float]] = (
-        []
-    )  # [{timestamp, portfolio_value, return}]
-    active: bool = True
@@ -3,12 +3,13 @@ from setuptools import setup, find_packages
 setup(
     name="market",
     version="1.0.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     install_requires=[
         "fastapi",
         "uvicorn",
         "websockets",
         "httpx",
+        "numpy",
         "pytest",
     ],
 )
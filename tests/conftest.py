@@ -0,0 +1,67 @@
+# ==============================================
+# Shared Test Fixtures
+# ==============================================
+import pytest
+from fastapi.testclient import TestClient
+from market.main import app
+from market.data import storage
+from market.data.storage import DataStorage
+from market.market.units import company_from_view, trader_from_view
+
+
+@pytest.fixture(scope="session", autouse=True)
+def sample_data():
+    """Load sample companies/traders (startup events don't run without a lifespan)"""
+    storage.data_store.initialize_sample_data()
+
+
+@pytest.fixture
+def make_store(monkeypatch):
+    """
+    Build a fresh DataStorage and install it as storage.data_store.
+    companies maps symbol -> price; traders maps trader ID -> overrides
+    of {"name": <id>, "cash": cash, "portfolio": {}} (API units). A
+    journal is started before anything is added, so it records it all.
+    """
+
+    def make(
+        companies=None,
+        traders=None,
+        cash=100000.0,
+        outstanding_shares=1000,
+        journal=None,
+    ):
+        data_store = DataStorage()
+        monkeypatch.setattr(storage, "data_store", data_store)
+        if journal is not None:
+            data_store.journal = journal
+            journal.start(data_store)
+        for symbol, price in (companies or {}).items():
+            data_store.add_company(
+                company_from_view(
+                    {
+                        "name": symbol,
+                        "symbol": symbol,
+                        "price": price,
+                        "outstanding_shares": outstanding_shares,
+                        "ipo_price": price,
+                    }
+                )
+            )
+        for trader_id, overrides in (traders or {}).items():
+            view = {"trader_id": trader_id, "name": trader_id, "cash": cash}
+            view["portfolio"] = {}
+            view.update(overrides)
+            data_store.add_trader(trader_id, trader_from_view(view))
+        return data_store
+
+    return make
+
+
+@pytest.fixture
+def trader_id():
+    """Register a fresh trader and return its ID"""
+    response = TestClient(app).post(
+        "/trader/register", params={"name": "Fixture Trader", "cash": 50000.0}
+    )
+    return response.json()["trader_id"]
@@ -0,0 +1,151 @@
+# ==============================================
+# Backtest (Virtual Clock) Tests
+# ==============================================
+import asyncio
+import json
+from market.data.initialization import sample_trader_id
+from market.data.journal import Journal
+from market.data.storage import DataStorage
+from market.market import matching
+from market.market.backtest import Backtest, read_journal, read_order_log
+from market.market.records import OrderRecord
+from market.market.units import to_minor, to_ticks
+
+JOHN, JANE = sample_trader_id(0), sample_trader_id(1)
+
+
+def run(lines, seed=0, duration=None):
+    backtest = Backtest(seed=seed, interval=5)
+    messages = list(backtest.run(read_order_log(lines), duration=duration))
+    return backtest, messages
+
+
+def test_seeded_runs_are_reproducible():
+    backtest = Backtest(seed=11, interval=5)
+    first = list(backtest.run(duration=3600))
+    again = list(Backtest(seed=11, interval=5).run(duration=3600))
+    other = list(Backtest(seed=12, interval=5).run(duration=3600))
+    # Ticks whose rounded price didn't move publish nothing
+    assert backtest.stats["ticks"] == 720 and len(first) > 700
+    assert first == again
+    assert first != other
+    assert first[0]["timestamp"] == "2024-01-02T09:30:05"
+
+
+def test_order_log_interleaves_with_ticks():
+    log = [
+        json.dumps(line)
+        for line in (
+            {
+                "timestamp": "2024-01-02T10:00:00",
+                "trader_id": JANE,
+                "symbol": "AAPL",
+                "price": 150.0,
+                "quantity": 5,
+                "order_type": "sell",
+                "order_id": 1,
+            },
+            {
+                "timestamp": "2024-01-02T10:00:12",
+                "trader_id": JOHN,
+                "symbol": "AAPL",
+                "price": 150.0,
+                "quantity": 2,
+                "order_type": "buy",
+            },
+            {"type": "cancel", "timestamp": "2024-01-02T10:00:20", "order_id": 1},
+            {
+                "timestamp": "2024-01-02T10:00:21",
+                "trader_id": "nobody",
+                "symbol": "AAPL",
+                "price": 150.0,
+                "quantity": 1,
+                "order_type": "buy",
+            },
+        )
+    ]
+    backtest, messages = run(log, duration=60)
+
+    kinds = [message["type"] for message in messages]
+    trade = messages[kinds.index("trade_executed")]["trade"]
+    assert trade["quantity"] == 2 and trade["price"] == 150.0
+    assert trade["timestamp"].isoformat() == "2024-01-02T10:00:12"
+    # Ticks at :05 and :10 came before the trade, :15 after it
+    ticks = [m["timestamp"] for m in messages if m["type"] == "price_update"]
+    assert ticks[:3] == [
+        "2024-01-02T10:00:05",
+        "2024-01-02T10:00:10",
+        "2024-01-02T10:00:15",
+    ]
+    assert kinds.index("trade_executed") == 2
+    assert "order_rejected" in kinds
+    assert backtest.stats["orders"] == 2 and backtest.stats["rejected"] == 1
+    assert backtest.clock.now().isoformat() == "2024-01-02T10:01:00"
+    assert not backtest.data_store.order_index  # the rest was cancelled
+
+
+def test_journal_replay_regenerates_trades(tmp_path):
+    data_store = DataStorage()
+    data_store.journal = Journal(str(tmp_path))
+    data_store.add_company(
+        {
+            "name": "Test",
+            "symbol": "TST",
+            "price": 10.0,
+            "outstanding_shares": 1000,
+            "ipo_price": 10.0,
+        }
+    )
+    for trader_id in ("a", "b"):
+        data_store.add_trader(
+            trader_id,
+            {
+                "trader_id": trader_id,
+                "name": trader_id,
+                "cash": 1000.0,
+                "portfolio": {"TST": 10},
+            },
+        )
+
+    async def trade():
+        data_store.journal.start(data_store)
+        previous, matching.storage.data_store = matching.storage.data_store, data_store
+        try:
+            matching.submit_order(OrderRecord(None, "a", "TST", 10.0, 3, "sell"))
+            matching.submit_order(OrderRecord(None, "b", "TST", 10.0, 2, "buy"))
+        finally:
+            matching.storage.data_store = previous
+        await data_store.journal.close()
+
+    asyncio.run(trade())
+    recorded = [trade.to_dict() for trade in data_store.trade_history[:]]
+
+    backtest = Backtest(sample_data=False)
+    messages = list(backtest.run(read_journal(str(tmp_path))))
+    replayed = [m["trade"] for m in messages if m["type"] == "trade_executed"]
+    assert replayed == recorded
+
+
+def test_journal_replay_applies_cash_moves(tmp_path, make_store):
+    """A shard's journal: the buyer is funded from another shard first"""
+
+    async def trade():
+        journal = Journal(str(tmp_path))
+        data_store = make_store(
+            companies={"TST": 10.0},
+            traders={"a": {"portfolio": {"TST": 10}}, "b": {"cash": 0.0}},
+            journal=journal,
+        )
+        data_store.move_cash("b", to_minor(100.0))
+        price = to_ticks("TST", 10.0)
+        matching.submit_order(OrderRecord(None, "a", "TST", price, 3, "sell"))
+        matching.submit_order(OrderRecord(None, "b", "TST", price, 2, "buy"))
+        await journal.close()
+        return data_store
+
+    data_store = asyncio.run(trade())
+    backtest = Backtest(sample_data=False)
+    messages = list(backtest.run(read_journal(str(tmp_path))))
+    assert backtest.stats["rejected"] == 0
+    assert len([m for m in messages if m["type"] == "trade_executed"]) == 1
+    assert backtest.data_store.traders["b"] == data_store.traders["b"]
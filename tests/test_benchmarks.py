@@ -0,0 +1,48 @@
+# ==============================================
+# Benchmark Suite Smoke Test
+# ==============================================
+import asyncio
+import httpx
+from benchmarks.bench_matching import run_scenario
+from benchmarks.loadgen import LoadGenerator
+from market.data import storage
+from market.main import app
+
+
+def test_scenario_reports_throughput_and_latency():
+    before = storage.data_store
+    result = run_scenario(depth=5, crossing=0.5, symbol_count=2, operations=300, seed=1)
+
+    assert storage.data_store is before  # global store restored
+    assert result["name"] == "depth5-cross50-sym2"
+    assert result["orders"] > 0 and result["fills"] > 0
+    for op in ("submit_passive", "submit_aggressive", "cancel", "execute_trade"):
+        stats = result["latency_us"][op]
+        assert stats["count"] > 0
+        assert stats["p50"] <= stats["p99"] <= stats["p99_9"] <= stats["max"]
+
+
+def test_load_generator_drives_the_api_in_process():
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            generator = LoadGenerator(client, seed=3, connections=4, crossing=0.5)
+            setup = await generator.setup(traders=20, companies=3, concurrency=4)
+            step = await generator.run_rate(rate=200, duration=0.5)
+            owner = generator.ipo_owner[generator.symbols[0]]
+            holder = (await client.get(f"/trader/{owner}")).json()
+            return setup, step, generator, holder
+
+    setup, step, generator, holder = asyncio.run(run())
+
+    assert setup["register_trader"]["ok"] == 20
+    assert setup["register_company"]["ok"] == 3
+    # Each company was IPO'd to a registered trader
+    assert generator.symbols[0] in holder["portfolio"]
+    orders = step["ops"]["order"]
+    assert orders["requests"] > 0 and orders["failed"] == 0
+    assert step["sent"] == sum(op["requests"] for op in step["ops"].values())
+    latency = orders["latency_ms"]
+    assert latency["p50"] <= latency["p99"] <= latency["max"]
@@ -0,0 +1,64 @@
+# ==============================================
+# Candle Builder Tests
+# ==============================================
+from datetime import datetime
+from market.market import matching
+from market.market.candles import CandleBuilder
+from market.market.records import OrderRecord
+
+
+def at(second):
+    return datetime.fromtimestamp(1_700_000_000 + second)
+
+
+def test_bars_roll_over_per_interval():
+    builder = CandleBuilder({"1s": 1, "1m": 60}, max_bars=2)
+    # Prices in ticks of 0.01
+    for second, price, quantity in (
+        (0.1, 1000, 1),
+        (0.5, 1200, 3),
+        (0.9, 900, 1),
+        (1.2, 1100, 5),
+        (2.0, 1150, 1),
+    ):
+        builder.on_trade("TEST", price, quantity, at(second))
+
+    minute = builder.latest("TEST", "1m", 10)
+    assert len(minute) == 1
+    bar = minute[0].to_dict("TEST")
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (
+        10.0,
+        12.0,
+        9.0,
+        11.5,
+    )
+    assert bar["volume"] == 11 and bar["trades"] == 5
+    assert bar["vwap"] == round((10 + 36 + 9 + 55 + 11.5) / 11, 4)
+
+    # Three one-second bars were opened; only the newest two are kept
+    seconds = builder.latest("TEST", "1s", 10)
+    assert [b.close for b in seconds] == [1100, 1150]
+    assert builder.latest("TEST", "1s", 1)[0].close == 1150
+    assert builder.latest("OTHER", "1s", 10) == []
+
+
+def test_executed_trades_feed_candles(make_store):
+    data_store = make_store(
+        companies={"TEST": 100.0},
+        traders={t: {"portfolio": {"TEST": 10}} for t in ("alice", "bob")},
+        cash=10000.0,
+        outstanding_shares=100,
+    )
+
+    for trader_id, order_type, price, quantity in (
+        ("alice", "sell", 10000, 2),
+        ("alice", "sell", 10100, 2),
+        ("bob", "buy", 10100, 3),
+    ):
+        matching.submit_order(
+            OrderRecord(None, trader_id, "TEST", price, quantity, order_type)
+        )
+
+    for interval in data_store.candles.intervals:
+        bar = data_store.candles.latest("TEST", interval, 1)[0]
+        assert (bar.open, bar.high, bar.close, bar.volume) == (10000, 10100, 10100, 3)
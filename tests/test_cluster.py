@@ -0,0 +1,231 @@
+# ==============================================
+# Symbol Sharding Tests
+# ==============================================
+import asyncio
+import json
+from datetime import datetime
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from market.cluster import frontend
+from market.cluster.sharding import (
+    merge_standings,
+    merge_trades,
+    merge_traders,
+    next_trade_positions,
+    shard_for_id,
+    shard_for_symbol,
+    split_cash,
+)
+from market.config import settings
+from market.data import storage
+from market.data.storage import DataStorage
+from market.main import app
+from market.models import OrderBatch
+from market.market.units import to_minor, trader_view
+
+
+def test_symbols_spread_stably_across_shards():
+    symbols = [f"SYM{n:03d}" for n in range(200)]
+    shards = [shard_for_symbol(symbol, 4) for symbol in symbols]
+    # CRC-32, not hash(): the same in every process
+    assert shard_for_symbol("AAPL", 4) == 0
+    assert set(shards) == {0, 1, 2, 3}
+    assert min(shards.count(shard) for shard in range(4)) > 30
+
+
+def test_partitioned_ids_name_their_shard():
+    for index in range(3):
+        data_store = DataStorage()
+        data_store.partition_ids(index, 3)
+        order_ids = [data_store.next_order_id() for _ in range(5)]
+        trade_ids = [data_store.next_trade_id() for _ in range(5)]
+        assert order_ids[0] == index + 1
+        assert all(shard_for_id(i, 3) == index for i in order_ids + trade_ids)
+        assert len(set(order_ids)) == 5
+
+
+def test_sharded_sample_data_splits_traders():
+    previous = settings.SHARD_INDEX, settings.SHARD_COUNT
+    stores = []
+    try:
+        settings.SHARD_COUNT = 2
+        for index in range(2):
+            settings.SHARD_INDEX = index
+            data_store = DataStorage()
+            data_store.initialize_sample_data()
+            stores.append(data_store)
+    finally:
+        settings.SHARD_INDEX, settings.SHARD_COUNT = previous
+
+    owner = shard_for_symbol("AAPL", 2)
+    assert "AAPL" in stores[owner].companies
+    assert "AAPL" not in stores[1 - owner].companies
+    # Same trader IDs on both shards, cash split evenly
+    assert set(stores[0].traders) == set(stores[1].traders)
+    trader_id = next(iter(stores[0].traders))
+    merged = merge_traders(
+        trader_view(data_store.traders[trader_id]) for data_store in stores
+    )
+    assert merged["cash"] == settings.SAMPLE_TRADERS[0]["cash"]
+
+
+def test_split_cash_keeps_every_cent():
+    assert split_cash(10000.0, 2) == [5000.0, 5000.0]
+    assert split_cash(100.0, 3) == [33.34, 33.33, 33.33]
+    assert sum(split_cash(0.05, 4)) == pytest.approx(0.05)
+
+
+def test_cash_moves_between_shard_sub_accounts(monkeypatch):
+    data_store = DataStorage()
+    monkeypatch.setattr(storage, "data_store", data_store)
+    client = TestClient(app)
+    trader_id = client.post(
+        "/trader/register", params={"name": "Split", "cash": 5000.0}
+    ).json()["trader_id"]
+    # Standalone servers have no transfer endpoints
+    assert client.post(f"/trader/{trader_id}/cash/withdraw").status_code == 404
+
+    monkeypatch.setattr(settings, "SHARD_INDEX", 0)
+    data_store.traders[trader_id]["reserved_cash"] = to_minor(1000.0)
+    too_much = client.post(
+        f"/trader/{trader_id}/cash/withdraw", params={"amount": 4500.0}
+    )
+    assert too_much.status_code == 201
+    withdrawn = client.post(f"/trader/{trader_id}/cash/withdraw").json()
+    assert withdrawn["amount"] == 4000.0
+    assert data_store.traders[trader_id]["cash"] == to_minor(1000.0)
+    bad = client.post(f"/trader/{trader_id}/cash/deposit", params={"amount": 0})
+    assert bad.status_code == 400
+    client.post(f"/trader/{trader_id}/cash/deposit", params={"amount": 2500.0})
+    assert data_store.traders[trader_id]["cash"] == to_minor(3500.0)
+    # Transfers are capital moving, not profit or loss
+    assert data_store.leaderboard.pnl(trader_id) == 0
+
+
+def fake_shard(cash, index, fail_deposit=False):
+    """A shard that only moves cash; `cash` holds every shard's balance"""
+
+    def handle(request):
+        if request.url.path.endswith("/withdraw"):
+            amount, cash[index] = cash[index], 0.0
+        elif fail_deposit:
+            return httpx.Response(500, text="shard down")
+        else:
+            amount = float(request.url.params["amount"])
+            cash[index] += amount
+        return httpx.Response(200, json={"trader_id": "t", "amount": amount})
+
+    transport = httpx.MockTransport(handle)
+    return httpx.AsyncClient(transport=transport, base_url="http://shard")
+
+
+def test_pooling_cash_refunds_a_failed_deposit(monkeypatch):
+    cash = [100.0, 250.0, 50.0]
+    shards = [fake_shard(cash, 0, fail_deposit=True)]
+    shards += [fake_shard(cash, index) for index in (1, 2)]
+    monkeypatch.setattr(frontend, "shards", shards)
+    assert not asyncio.run(frontend._pool_cash("t", 0))
+    assert cash == [100.0, 250.0, 50.0]
+
+    shards[0] = fake_shard(cash, 0)
+    assert asyncio.run(frontend._pool_cash("t", 0))
+    assert cash == [400.0, 0.0, 0.0]
+
+
+def test_batch_rejects_only_a_failed_shards_orders(monkeypatch):
+    monkeypatch.setattr(settings, "SHARD_COUNT", 2)
+    symbols = {shard_for_symbol(s, 2): s for s in ("AAPL", "MSFT", "GOOGL")}
+    assert len(symbols) == 2
+
+    def handle(request):
+        orders = json.loads(request.content)["orders"]
+        results = [
+            {"index": i, "accepted": True, "order_id": i + 1}
+            for i in range(len(orders))
+        ]
+        return httpx.Response(200, json={"results": results})
+
+    def down(request):
+        return httpx.Response(503, json={"detail": "Shard busy"})
+
+    shards = [
+        httpx.AsyncClient(transport=httpx.MockTransport(h), base_url="http://shard")
+        for h in (handle, down)
+    ]
+    monkeypatch.setattr(frontend, "shards", shards)
+    order = {"trader_id": "t", "order_type": "buy", "price": 1.0, "quantity": 1}
+    batch = OrderBatch(
+        orders=[dict(order, symbol=symbols[shard]) for shard in (1, 0, 0)]
+    )
+    result = asyncio.run(frontend.place_orders_batch(batch))
+    assert (result["accepted"], result["rejected"]) == (2, 1)
+    assert [r["accepted"] for r in result["results"]] == [False, True, True]
+    assert result["results"][0]["status_code"] == 503
+    assert result["results"][0]["detail"] == "Shard busy"
+    assert [r["index"] for r in result["results"]] == [0, 1, 2]
+
+
+def test_merge_traders_and_trades():
+    merged = merge_traders(
+        [
+            {"trader_id": "t", "name": "T", "cash": 10.0, "portfolio": {"A": 1}},
+            {
+                "trader_id": "t",
+                "name": "T",
+                "cash": 5.0,
+                "portfolio": {"B": 2},
+                "reserved_cash": 1.5,
+                "reserved_shares": {"B": 1},
+            },
+        ]
+    )
+    assert merged["cash"] == 15.0 and merged["reserved_cash"] == 1.5
+    assert merged["portfolio"] == {"A": 1, "B": 2}
+    assert merged["reserved_shares"] == {"B": 1}
+
+    trades = merge_trades(
+        [
+            [{"trade_id": 1, "timestamp": "2024-01-01T00:00:01"}],
+            [
+                {"trade_id": 2, "timestamp": "2024-01-01T00:00:00"},
+                {"trade_id": 4, "timestamp": "2024-01-01T00:00:02"},
+            ],
+        ],
+        limit=2,
+    )
+    assert [trade["trade_id"] for trade in trades] == [1, 4]
+
+
+def test_merge_standings_sums_sub_accounts():
+    standings = merge_standings(
+        [
+            [
+                {"rank": 1, "trader_id": "a", "value": 10.0, "pnl": 5.0},
+                {"rank": 2, "trader_id": "b", "value": 10.0, "pnl": 4.0},
+            ],
+            [
+                {"rank": 1, "trader_id": "b", "value": 10.0, "pnl": 3.0},
+                {"rank": 2, "trader_id": "a", "value": 10.0, "pnl": -1.0},
+            ],
+        ],
+        n=1,
+    )
+    assert standings == [{"rank": 1, "trader_id": "b", "value": 20.0, "pnl": 7.0}]
+
+
+def test_sharded_cursor_positions():
+    def page(*trade_ids):
+        return [
+            {"trade_id": n, "timestamp": datetime(2025, 1, 1, 9, 30, n).isoformat()}
+            for n in trade_ids
+        ]
+
+    # Shard 0 owns odd trade IDs, shard 1 even ones
+    pages = [page(5, 7), page(2, 4, 6)]
+    merged = merge_trades(pages, 3)
+    assert [trade["trade_id"] for trade in merged] == [5, 6, 7]
+    # Shard 0 is used up; shard 1 resumes below the oldest it served
+    assert next_trade_positions([None, None], pages, merged, 3) == [-1, 6]
+    # A shard that wasn't asked keeps its position
+    assert next_trade_positions([-1, 6], [None, page(2, 4)], page(2, 4), 3) == [-1, -1]
@@ -0,0 +1,80 @@
+# ==============================================
+# Fee Schedule Tests
+# ==============================================
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from market.config import settings
+from market.main import app
+from market.market import matching
+from market.market.fees import FeeSchedule, buy_order_cost
+from market.market.records import OrderRecord
+
+TIERS = [(0, 0.1, 0.2), (1000, 0.05, 0.1)]
+DAY = datetime(2024, 1, 2, 12, 0)
+
+
+def test_rolling_volume_picks_the_tier_and_ages_out():
+    schedule = FeeSchedule(TIERS, window_days=3, bucket_seconds=86400)
+    assert schedule.tier("a", DAY) == 0
+    # Volumes in minor units (cents)
+    schedule.record("a", 60000, DAY)
+    schedule.record("a", 50000, DAY + timedelta(days=1))
+    assert schedule.volume("a", DAY + timedelta(days=2)) == 110000
+    assert schedule.tier("a", DAY + timedelta(days=2)) == 1
+    # The first day's volume leaves the 3-day window
+    assert schedule.volume("a", DAY + timedelta(days=3)) == 50000
+    assert schedule.tier("a", DAY + timedelta(days=3)) == 0
+    assert schedule.volume("a", DAY + timedelta(days=30)) == 0
+    assert schedule.describe(1) == {
+        "tier": 1,
+        "min_volume": 1000,
+        "maker_percent": 0.05,
+        "taker_percent": 0.1,
+    }
+
+
+@pytest.fixture
+def store(make_store):
+    data_store = make_store(
+        companies={"TST": 10.0},
+        traders={t: {"portfolio": {"TST": 500}} for t in ("maker", "taker")},
+    )
+    data_store.clock = lambda: DAY
+    data_store.fee_schedule = FeeSchedule(TIERS)
+    return data_store
+
+
+def test_fills_charge_maker_and_taker_at_their_tiers(store):
+    matching.submit_order(OrderRecord(None, "maker", "TST", 1000, 200, "sell"))
+    _, [first] = matching.submit_order(
+        OrderRecord(None, "taker", "TST", 1000, 100, "buy")
+    )
+    assert first.seller_fee == 100  # maker 0.1% of 1000.00, in cents
+    assert first.buyer_fee == 200  # taker 0.2%
+
+    # Both now have 1000 of volume: tier 1
+    _, [second] = matching.submit_order(
+        OrderRecord(None, "taker", "TST", 1000, 100, "buy")
+    )
+    assert second.seller_fee == 50
+    assert second.buyer_fee == 100
+
+    quote = TestClient(app).get(
+        "/market/fee-estimate",
+        params={"price": 10.0, "quantity": 100, "trader_id": "taker"},
+    )
+    assert quote.status_code == 200
+    body = quote.json()
+    assert body["tier"]["tier"] == 1 and body["rolling_volume"] == 2000.0
+    assert body["taker_fee"] == pytest.approx(1.0)
+    assert body["maker_fee"] == pytest.approx(0.5)
+
+
+def test_reservations_cover_the_highest_rate(store, monkeypatch):
+    monkeypatch.setattr(settings, "FEE_TIERS", TIERS)
+    matching.submit_order(OrderRecord(None, "taker", "TST", 1000, 100, "buy"))
+    assert store.traders["taker"]["reserved_cash"] == 100200
+    assert buy_order_cost(1000, 100) == 100200
+    # The fee is rounded up per share, so partial releases add up exactly
+    assert buy_order_cost(1001, 3) == 3 * (1001 + 3)
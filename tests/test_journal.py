@@ -0,0 +1,67 @@
+# ==============================================
+# Journal / Snapshot Recovery Tests
+# ==============================================
+import asyncio
+import os
+from market.config import settings
+from market.data.journal import Journal
+from market.data.storage import DataStorage
+from market.market import matching
+from market.market.records import OrderRecord
+from market.market.units import to_ticks
+
+
+def order(trader_id, order_type, price, quantity):
+    ticks = to_ticks("TEST", price)
+    return OrderRecord(None, trader_id, "TEST", ticks, quantity, order_type)
+
+
+def state(data_store):
+    book = data_store.order_book["TEST"].snapshot()
+    return (
+        {side: [o.to_dict() for o in orders] for side, orders in book.items()},
+        data_store.traders,
+        [t.to_dict() for t in data_store.trade_history[:]],
+        data_store.last_order_id,
+    )
+
+
+def test_recovery_from_snapshot_and_tail(tmp_path, monkeypatch, make_store):
+    monkeypatch.setattr(settings, "JOURNAL_GROUP_COMMIT_WINDOW", 0)
+    directory = str(tmp_path)
+
+    async def run_market():
+        journal = Journal(directory)
+        data_store = make_store(
+            companies={"TEST": 50.0},
+            traders={
+                "alice": {"portfolio": {"TEST": 0}},
+                "bob": {"portfolio": {"TEST": 100}},
+            },
+            cash=10000.0,
+            journal=journal,
+        )
+        matching.submit_order(order("bob", "sell", 51.0, 30))
+        matching.submit_order(order("bob", "sell", 52.0, 30))
+        await data_store.sync_journal()
+
+        # Snapshot, then keep trading into the new segment
+        await journal.snapshot(data_store)
+        matching.submit_order(order("alice", "buy", 51.5, 20))
+        matching.submit_order(order("alice", "buy", 49.0, 5))
+        data_store.remove_order(2)
+        data_store.reduce_order(4, 3)
+        await journal.close()
+        return state(data_store)
+
+    before = asyncio.run(run_market())
+    segments = [name for name in os.listdir(directory) if name.startswith("journal-")]
+    assert len(segments) == 1  # the pre-snapshot segment was dropped
+
+    recovered_store = make_store()
+    assert Journal(directory).recover(recovered_store)
+    assert state(recovered_store) == before
+
+
+def test_empty_directory_recovers_nothing(tmp_path):
+    assert not Journal(str(tmp_path)).recover(DataStorage())
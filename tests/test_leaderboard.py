@@ -0,0 +1,94 @@
+# ==============================================
+# Mark-to-Market Leaderboard Tests
+# ==============================================
+import pytest
+from fastapi.testclient import TestClient
+from market.main import app
+from market.market import matching
+from market.market.records import OrderRecord
+from market.market.units import tick_value
+
+
+@pytest.fixture
+def store(make_store):
+    """Two symbols; alice holds both, bob only cash, carol only MSFT"""
+    return make_store(
+        companies={"AAPL": 100.0, "MSFT": 50.0},
+        traders={
+            trader_id: {"name": trader_id.title(), "portfolio": portfolio}
+            for trader_id, portfolio in (
+                ("alice", {"AAPL": 10, "MSFT": 10}),
+                ("bob", {}),
+                ("carol", {"MSFT": 20}),
+            )
+        },
+        cash=1000.0,
+    )
+
+
+def full_value(data_store, trader_id):
+    """In minor units, like the leaderboard's values"""
+    trader = data_store.traders[trader_id]
+    return trader["cash"] + sum(
+        quantity * data_store.get_price(symbol) * tick_value(symbol)
+        for symbol, quantity in trader["portfolio"].items()
+    )
+
+
+def test_incremental_values_match_a_full_revaluation(store):
+    board = store.leaderboard
+    assert board.pnl("alice") == 0 and board.holders["AAPL"] == {"alice": 10}
+
+    matching.submit_order(OrderRecord(None, "alice", "AAPL", 10000, 4, "sell"))
+    matching.submit_order(OrderRecord(None, "bob", "AAPL", 10000, 4, "buy"))
+    assert board.holders["AAPL"] == {"alice": 6, "bob": 4}
+
+    carol = board.values["carol"]
+    engine = store.price_engine
+    engine._prices[engine.slots["AAPL"]] = 11000
+    board.reprice({"AAPL": 11000})
+    # Not an AAPL holder: untouched
+    assert board.values["carol"] == carol
+    # Integer minor units: incremental values match exactly
+    for trader_id in store.traders:
+        assert board.values[trader_id] == full_value(store, trader_id)
+    # bob paid 400 plus a fee for shares now worth 440 (in cents)
+    assert board.pnl("bob") == 4000 - 40
+    assert [entry["trader_id"] for entry in board.top(3)] == ["alice", "bob", "carol"]
+
+    # IPO allocations count as capital at the IPO price: only the
+    # mark-up since the IPO (5 x 10) is profit
+    store.allocate_shares("carol", "AAPL", 5)
+    assert board.pnl("carol") == 5000
+    assert board.holders["AAPL"]["carol"] == 5
+
+
+def test_leaderboard_endpoint(store):
+    client = TestClient(app)
+    store.allocate_shares("bob", "MSFT", 10)
+    board = store.leaderboard
+    board.reprice({"MSFT": 6000})
+
+    response = client.get("/market/leaderboard", params={"n": 2})
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "rank": 1,
+            "trader_id": "carol",
+            "value": 2200.0,
+            "pnl": 200.0,
+            "name": "Carol",
+        },
+        {
+            "rank": 2,
+            "trader_id": "alice",
+            "value": 2600.0,
+            "pnl": 100.0,
+            "name": "Alice",
+        },
+    ]
+    standing = client.get("/market/leaderboard", params={"trader_id": ["bob", "x"]})
+    assert standing.json() == [
+        {"rank": 3, "trader_id": "bob", "value": 1600.0, "pnl": 100.0, "name": "Bob"}
+    ]
+    assert client.get("/market/leaderboard", params={"n": 0}).status_code == 400
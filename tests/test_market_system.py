@@ -46,6 +46,142 @@ def test_place_order(trader_id):
     print("Order placement test passed:", response.json())
 
 
+def test_cancel_and_amend_order(trader_id):
+    """Test amending and cancelling a resting order by ID"""
+    buy_order = {
+        "trader_id": trader_id,
+        "symbol": "AAPL",
+        "price": 1.0,
+        "quantity": 10,
+        "order_type": "buy",
+    }
+    response = client.post("/market/order", json=buy_order)
+    assert response.status_code == 200
+    order_id = response.json()["order_id"]
+    assert response.json()["resting"]
+
+    # Same price, smaller size: amended in place
+    response = client.patch(f"/market/order/{order_id}", json={"quantity": 4})
+    assert response.status_code == 200
+    assert response.json()["remaining_quantity"] == 4
+    bids = client.get("/market/orderbook/AAPL").json()["buy"]
+    assert any(o["order_id"] == order_id and o["quantity"] == 4 for o in bids)
+
+    response = client.delete(f"/market/order/{order_id}")
+    assert response.status_code == 200
+    assert response.json()["order"]["order_id"] == order_id
+    assert client.delete(f"/market/order/{order_id}").status_code == 404
+    print("Cancel/amend test passed for order", order_id)
+
+
+def test_place_orders_batch(trader_id):
+    """Test batch order submission with per-order results"""
+    orders = [
+        {
+            "trader_id": trader_id,
+            "symbol": "AAPL",
+            "price": 1.0,
+            "quantity": 1,
+            "order_type": "buy",
+        },
+        {
+            "trader_id": trader_id,
+            "symbol": "NOPE",
+            "price": 1.0,
+            "quantity": 1,
+            "order_type": "buy",
+        },
+        {
+            "trader_id": trader_id,
+            "symbol": "AAPL",
+            "price": 1.5,
+            "quantity": 2,
+            "order_type": "buy",
+        },
+    ]
+    response = client.post("/market/orders/batch", json={"orders": orders})
+    assert response.status_code == 200
+    batch = response.json()
+    assert (batch["accepted"], batch["rejected"]) == (2, 1)
+    assert [r["accepted"] for r in batch["results"]] == [True, False, True]
+    assert batch["results"][1]["detail"] == "Invalid stock symbol"
+
+    # All-or-nothing: one bad order rejects everything
+    response = client.post(
+        "/market/orders/batch", json={"orders": orders, "all_or_nothing": True}
+    )
+    batch = response.json()
+    assert batch["accepted"] == 0
+    assert [r["status_code"] for r in batch["results"]] == [409, 404, 409]
+    print("Batch order test passed:", json.dumps(batch, indent=2))
+
+
+def test_all_or_nothing_batch_checks_running_totals():
+    """Orders that each fit alone but not together reject the batch"""
+    trader = client.post("/trader/register", params={"name": "Small", "cash": 1000.0})
+    trader_id = trader.json()["trader_id"]
+    order = {
+        "trader_id": trader_id,
+        "symbol": "AAPL",
+        "price": 1.0,
+        "quantity": 450,
+        "order_type": "buy",
+    }
+    for all_or_nothing in (True, False):
+        response = client.post(
+            "/market/orders/batch",
+            json={"orders": [order, order, order], "all_or_nothing": all_or_nothing},
+        )
+        results = response.json()["results"]
+        if all_or_nothing:
+            assert [r["status_code"] for r in results] == [409, 409, 201]
+            assert client.get(f"/trader/{trader_id}").json()["reserved_cash"] == 0
+        else:
+            # Two fit; the third finds the first two's reservations
+            assert [r["accepted"] for r in results] == [True, True, False]
+    trader = client.get(f"/trader/{trader_id}").json()
+    assert trader["reserved_cash"] <= trader["cash"]
+
+
+def test_non_positive_price_or_quantity_is_rejected(trader_id):
+    """Negative prices and empty orders never reach the book"""
+    order = {"trader_id": trader_id, "symbol": "AAPL", "order_type": "buy"}
+    for bad in ({"price": -100.0, "quantity": 1000}, {"price": 1.0, "quantity": 0}):
+        response = client.post("/market/order", json=dict(order, **bad))
+        assert response.status_code == 400
+    batch = client.post(
+        "/market/orders/batch", json={"orders": [dict(order, price=0.0, quantity=1)]}
+    ).json()
+    assert batch["results"][0]["status_code"] == 400
+    trader = client.get(f"/trader/{trader_id}").json()
+    assert trader["reserved_cash"] == 0
+
+
+def test_resting_orders_reserve_cash(trader_id):
+    """Test that resting orders can't spend the same cash twice"""
+    buy_order = {
+        "trader_id": trader_id,
+        "symbol": "AAPL",
+        "price": 30.0,
+        "quantity": 1000,
+        "order_type": "buy",
+    }
+    first = client.post("/market/order", json=buy_order)
+    assert first.status_code == 200 and first.json()["resting"]
+    trader = client.get(f"/trader/{trader_id}").json()
+    assert trader["reserved_cash"] == pytest.approx(30030.0)
+
+    # 50000 cash, 30030 reserved: a second 30030 order no longer fits
+    second = client.post("/market/order", json=buy_order)
+    assert second.json()["detail"] == "Insufficient funds"
+
+    client.delete(f"/market/order/{first.json()['order_id']}")
+    trader = client.get(f"/trader/{trader_id}").json()
+    assert trader["reserved_cash"] == pytest.approx(0.0)
+    assert client.post("/market/order", json=buy_order).status_code == 200
+    print("Reservation test passed:", json.dumps(trader, indent=2))
+
+
 def test_get_orderbook():
     """Test retrieving the order book"""
     response = client.get("/market/orderbook/AAPL")
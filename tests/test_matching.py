@@ -0,0 +1,307 @@
+# ==============================================
+# Order Book / Matching Engine Tests
+# ==============================================
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from market.config import settings
+from market.data.storage import DataStorage, OrderBook
+from market.market import matching
+from market.market.fees import buy_order_cost
+from market.market.records import OrderRecord
+from market.main import app
+from market.market.units import to_ticks
+
+
+@pytest.fixture
+def store(make_store):
+    """Fresh data store with one symbol and three funded traders"""
+    return make_store(
+        companies={"TEST": 100.0},
+        traders={
+            trader_id: {"portfolio": {"TEST": 100}}
+            for trader_id in ("alice", "bob", "carol")
+        },
+    )
+
+
+def make_order(trader_id, order_type, price, quantity, symbol="TEST"):
+    """Price in API units; the record holds ticks"""
+    ticks = to_ticks(symbol, price)
+    return OrderRecord(None, trader_id, symbol, ticks, quantity, order_type)
+
+
+def test_best_prices_track_levels():
+    book = OrderBook("TEST")
+    book.add(1, make_order("alice", "buy", 99.0, 1))
+    book.add(2, make_order("alice", "buy", 101.0, 1))
+    book.add(3, make_order("bob", "sell", 105.0, 1))
+    book.add(4, make_order("bob", "sell", 103.0, 1))
+    # Levels are keyed by integer ticks
+    assert book.best_bid == 10100
+    assert book.best_ask == 10300
+
+    book.bids.remove_level(book.bids.best())
+    book.asks.remove_level(book.asks.best())
+    assert book.best_bid == 9900
+    assert book.best_ask == 10500
+    assert [level.price for level in book.asks] == [10500]
+
+
+def test_snapshot_is_price_time_ordered():
+    book = OrderBook("TEST")
+    book.add(1, make_order("alice", "sell", 102.0, 1))
+    book.add(2, make_order("bob", "sell", 101.0, 2))
+    book.add(3, make_order("carol", "sell", 101.0, 3))
+    sells = book.snapshot()["sell"]
+    assert [(o.trader_id, o.price) for o in sells] == [
+        ("bob", 10100),
+        ("carol", 10100),
+        ("alice", 10200),
+    ]
+
+
+def test_time_priority_within_level(store):
+    matching.submit_order(make_order("alice", "sell", 100.0, 5))
+    matching.submit_order(make_order("bob", "sell", 100.0, 5))
+    resting, trades = matching.submit_order(make_order("carol", "buy", 100.0, 7))
+
+    assert not resting
+    assert [(t.seller, t.quantity) for t in trades] == [("alice", 5), ("bob", 2)]
+    book = store.order_book["TEST"]
+    assert book.best_bid is None
+    remaining = book.snapshot()["sell"]
+    assert [(o.trader_id, o.quantity) for o in remaining] == [("bob", 3)]
+
+
+def test_only_crossing_levels_trade(store):
+    matching.submit_order(make_order("alice", "sell", 101.0, 5))
+    matching.submit_order(make_order("alice", "sell", 104.0, 5))
+    resting, trades = matching.submit_order(make_order("bob", "buy", 102.0, 10))
+
+    assert [(t.price, t.quantity) for t in trades] == [(10100, 5)]
+    assert resting
+    book = store.order_book["TEST"]
+    assert book.best_bid == 10200
+    assert book.best_ask == 10400
+    assert store.traders["bob"]["portfolio"]["TEST"] == 105
+
+
+def test_incoming_sell_trades_at_resting_bid(store):
+    matching.submit_order(make_order("alice", "buy", 105.0, 4))
+    _, trades = matching.submit_order(make_order("bob", "sell", 100.0, 4))
+
+    assert [(t.buyer, t.seller, t.price) for t in trades] == [("alice", "bob", 10500)]
+    assert not store.order_book["TEST"].is_crossed()
+
+
+def test_symbol_locks_are_independent():
+    data_store = DataStorage()
+
+    async def scenario():
+        async with data_store.symbol_lock("MSFT"):
+            # AAPL must not wait behind MSFT
+            await asyncio.wait_for(data_store.symbol_lock("AAPL").acquire(), 0.1)
+            data_store.symbol_lock("AAPL").release()
+
+        async with data_store.lock_symbols(["MSFT", "AAPL", "MSFT"]):
+            assert data_store.symbol_lock("AAPL").locked()
+            assert data_store.symbol_lock("MSFT").locked()
+        assert not data_store.symbol_lock("AAPL").locked()
+
+    asyncio.run(scenario())
+
+
+def test_depth_totals_track_fills_reductions_and_cancels(store):
+    for trader_id, price, quantity in (
+        ("alice", 101.0, 5),
+        ("bob", 101.0, 4),
+        ("carol", 102.0, 7),
+        ("alice", 103.0, 1),
+    ):
+        matching.submit_order(make_order(trader_id, "sell", price, quantity))
+    matching.submit_order(make_order("carol", "buy", 99.0, 3))
+
+    matching.submit_order(make_order("carol", "buy", 101.0, 6))  # partial fill
+    store.reduce_order(3, 2)  # carol's 102.0 sell: 7 -> 2
+    store.remove_order(4)  # alice's 103.0 sell
+
+    book = store.order_book["TEST"]
+    assert book.depth(10) == {
+        "symbol": "TEST",
+        "bids": [{"price": 99.0, "quantity": 3, "orders": 1}],
+        "asks": [
+            {"price": 101.0, "quantity": 3, "orders": 1},
+            {"price": 102.0, "quantity": 2, "orders": 1},
+        ],
+    }
+    assert book.depth(1)["asks"] == [{"price": 101.0, "quantity": 3, "orders": 1}]
+    # Incremental totals agree with a full scan
+    for side in (book.bids, book.asks):
+        for level in side:
+            assert level.total_quantity == sum(
+                o.quantity for o in level.orders.values()
+            )
+
+
+def test_fills_are_compact_records_with_sequential_ids(store):
+    matching.submit_order(make_order("alice", "sell", 100.0, 2))
+    matching.submit_order(make_order("bob", "sell", 100.0, 2))
+    _, trades = matching.submit_order(make_order("carol", "buy", 100.0, 4))
+
+    assert [t.trade_id for t in trades] == [1, 2]
+    assert not hasattr(trades[0], "__dict__")
+    model = trades[0].to_model()
+    assert model.trade_id == 1 and model.seller == "alice"
+    assert model.fees == {"buyer_fee": 0.2, "seller_fee": 0.2}
+
+
+def test_reservations_follow_fills_reductions_and_cancels(store):
+    alice, carol = store.traders["alice"], store.traders["carol"]
+    matching.submit_order(make_order("alice", "sell", 101.0, 5))
+    assert alice["reserved_shares"] == {"TEST": 5}
+
+    store.reduce_order(1, 3)
+    assert alice["reserved_shares"] == {"TEST": 3}
+    matching.submit_order(make_order("bob", "buy", 101.0, 2))  # fills 2
+    assert alice["reserved_shares"] == {"TEST": 1}
+    store.remove_order(1)
+    assert alice["reserved_shares"] == {}
+
+    # The aggressive part of an order reserves nothing; the rest does
+    matching.submit_order(make_order("bob", "sell", 99.0, 2))
+    _, trades = matching.submit_order(make_order("carol", "buy", 99.0, 5))
+    assert len(trades) == 1
+    assert carol["reserved_cash"] == buy_order_cost(9900, 3)
+    store.remove_order(4)
+    assert carol["reserved_cash"] == 0
+    assert store.traders["bob"]["reserved_shares"] == {}
+
+
+@pytest.fixture
+def nickel_ticks(monkeypatch):
+    """TEST trades in 0.05 increments (request before `store`)"""
+    monkeypatch.setitem(settings.TICK_SIZES, "TEST", 0.05)
+
+
+def test_prices_are_ticks_and_off_grid_prices_are_rejected(nickel_ticks, store):
+    assert store.companies["TEST"]["price"] == 2000
+    assert to_ticks("TEST", 100.05) == 2001
+    with pytest.raises(ValueError):
+        to_ticks("TEST", 100.01)
+
+    client = TestClient(app)
+    order = {"trader_id": "alice", "symbol": "TEST", "quantity": 1}
+    response = client.post(
+        "/market/order", json=dict(order, price=100.01, order_type="sell")
+    )
+    assert response.status_code == 400
+    client.post("/market/order", json=dict(order, price=100.05, order_type="sell"))
+    assert store.order_book["TEST"].best_ask == 2001
+    book = client.get("/market/depth/TEST").json()
+    assert book["asks"] == [{"price": 100.05, "quantity": 1, "orders": 1}]
+
+    # Ten fills at 100.05 settle to the exact cent
+    bob_cash = store.traders["bob"]["cash"]
+    for _ in range(10):
+        matching.submit_order(make_order("carol", "sell", 100.05, 1))
+        matching.submit_order(make_order("bob", "buy", 100.05, 1))
+    # The 0.1% fee on 100.05 is 10.005 cents, rounded to 10 per fill
+    assert bob_cash - store.traders["bob"]["cash"] == 10 * (10005 + 10)
+
+
+def test_ioc_and_market_orders_never_rest(store):
+    matching.submit_order(make_order("alice", "sell", 101.0, 3))
+    matching.submit_order(make_order("bob", "sell", 102.0, 3))
+
+    # IOC takes what crosses its limit and drops the rest
+    ioc = make_order("carol", "buy", 101.0, 5)
+    ioc.time_in_force = "IOC"
+    resting, trades = matching.submit_order(ioc)
+    assert not resting and [t.quantity for t in trades] == [3]
+    assert ioc.quantity == 2
+    assert not store.order_book["TEST"].bids
+    assert store.traders["carol"]["reserved_cash"] == 0
+
+    # A market order walks any price and never rests either
+    market = OrderRecord(None, "carol", "TEST", None, 5, "buy", "IOC")
+    resting, trades = matching.submit_order(market)
+    assert not resting and [(t.price, t.quantity) for t in trades] == [(10200, 3)]
+    assert not store.order_book["TEST"].bids
+    assert ioc.order_id not in store.order_index
+    assert market.order_id not in store.order_index
+
+
+def test_fok_fills_in_full_or_not_at_all(store):
+    matching.submit_order(make_order("alice", "sell", 101.0, 3))
+    matching.submit_order(make_order("bob", "sell", 102.0, 3))
+    matching.submit_order(make_order("bob", "sell", 104.0, 3))
+    asks = store.order_book["TEST"].asks
+    assert asks.sweep(5, limit=10200) == [(10100, 3), (10200, 2)]
+
+    # 6 shares cross 102.00, so 7 are killed without trading
+    fok = make_order("carol", "buy", 102.0, 7)
+    fok.time_in_force = "FOK"
+    resting, trades = matching.submit_order(fok)
+    assert not resting and trades == []
+    assert [level.total_quantity for level in asks] == [3, 3, 3]
+
+    fok = make_order("carol", "buy", 102.0, 6)
+    fok.time_in_force = "FOK"
+    resting, trades = matching.submit_order(fok)
+    assert not resting and sum(t.quantity for t in trades) == 6
+    assert [level.price for level in asks] == [10400]
+
+
+def test_market_and_time_in_force_over_rest(store):
+    client = TestClient(app)
+    order = {"trader_id": "carol", "symbol": "TEST", "order_type": "buy"}
+    for bad in (
+        {"kind": "market", "price": 100.0, "quantity": 1},
+        {"kind": "market", "time_in_force": "GTC", "quantity": 1},
+        {"kind": "stop", "price": 100.0, "quantity": 1},
+        {"price": 100.0, "time_in_force": "DAY", "quantity": 1},
+        {"quantity": 1},
+    ):
+        response = client.post("/market/order", json=dict(order, **bad))
+        assert response.status_code == 400, bad
+
+    matching.submit_order(make_order("alice", "sell", 100.0, 10))
+    # Market buys are checked against the asks they would sweep
+    store.traders["carol"]["cash"] = buy_order_cost(10000, 10) - 1
+    response = client.post(
+        "/market/order", json=dict(order, kind="market", quantity=10)
+    )
+    assert response.json()["detail"] == "Insufficient funds"
+    store.traders["carol"]["cash"] = buy_order_cost(10000, 10)
+    result = client.post(
+        "/market/order", json=dict(order, kind="market", quantity=15)
+    ).json()
+    assert (result["resting"], result["filled_quantity"]) == (False, 10)
+    assert result["remaining_quantity"] == 5
+    assert store.traders["carol"]["reserved_cash"] == 0
+    assert store.traders["carol"]["cash"] >= 0
+
+
+def test_all_or_nothing_market_buys_are_costed_at_the_worst_ask(store):
+    client = TestClient(app)
+    matching.submit_order(make_order("alice", "sell", 100.0, 5))
+    matching.submit_order(make_order("alice", "sell", 110.0, 5))
+    buy = {"trader_id": "carol", "symbol": "TEST", "order_type": "buy"}
+    batch = {"orders": [dict(buy, kind="market", quantity=5)] * 2}
+    batch["all_or_nothing"] = True
+
+    # Enough for 5@100 then 5@110, but the second buy only meets 110
+    # after the first has run, so both are costed at it up front
+    store.traders["carol"]["cash"] = (
+        buy_order_cost(10000, 5) + buy_order_cost(11000, 5) - 1
+    )
+    result = client.post("/market/orders/batch", json=batch).json()
+    assert (result["accepted"], result["rejected"]) == (0, 2)
+    assert store.order_book["TEST"].asks.sweep(10) == [(10000, 5), (11000, 5)]
+
+    store.traders["carol"]["cash"] = buy_order_cost(11000, 10)
+    result = client.post("/market/orders/batch", json=batch).json()
+    assert result["accepted"] == 2
+    assert [r["filled_quantity"] for r in result["results"]] == [5, 5]
+    assert store.traders["carol"]["cash"] >= 0
@@ -0,0 +1,61 @@
+# ==============================================
+# Metrics Endpoint Tests
+# ==============================================
+from fastapi.testclient import TestClient
+from market.main import app
+from market.metrics import Histogram, REGISTRY
+
+client = TestClient(app)
+
+
+def sample(text, prefix):
+    """Value of the first exposition line starting with prefix"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "test", ["op"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.labels("a").observe(value)
+
+    text = REGISTRY.render()
+    assert sample(text, 'test_latency_seconds_bucket{op="a",le="0.1"}') == 1
+    assert sample(text, 'test_latency_seconds_bucket{op="a",le="1.0"}') == 3
+    assert sample(text, 'test_latency_seconds_bucket{op="a",le="+Inf"}') == 4
+    assert sample(text, 'test_latency_seconds_sum{op="a"}') == 4.05
+    assert sample(text, 'test_latency_seconds_count{op="a"}') == 4
+
+
+def test_metrics_endpoint_reports_routes_engine_and_locks(trader_id):
+    client.get("/market/price/AAPL")
+    client.post(
+        "/market/order",
+        json={
+            "trader_id": trader_id,
+            "symbol": "AAPL",
+            "price": 1.0,
+            "quantity": 1,
+            "order_type": "buy",
+        },
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    # Routes are labelled by template, not by the concrete path
+    assert (
+        sample(
+            text,
+            'http_request_duration_seconds_count{method="GET",route="/market/price/{symbol}"}',
+        )
+        >= 1
+    )
+    assert sample(text, 'market_orders_total{symbol="AAPL",side="buy"}') >= 1
+    assert sample(text, 'market_book_orders{symbol="AAPL",side="buy"}') >= 1
+    assert sample(text, 'market_lock_hold_seconds_count{lock="symbol"}') >= 1
+    assert sample(text, 'market_lock_wait_seconds_count{lock="trader"}') >= 1
+    print("Metrics test passed:", len(text.splitlines()), "lines")
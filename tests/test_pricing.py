@@ -0,0 +1,47 @@
+# ==============================================
+# Vectorized Price Engine Tests
+# ==============================================
+import numpy as np
+from market.market.pricing import PriceEngine
+from market.data.storage import DataStorage
+
+
+def test_uniform_step_stays_in_range():
+    engine = PriceEngine(model="uniform", seed=7)
+    for n in range(1000):
+        engine.add_symbol(f"S{n}", 100.0)
+    prices = engine.step()
+    assert prices.shape == (1000,)
+    assert prices.min() >= 98.5 and prices.max() <= 101.5
+    assert np.all(prices == np.round(prices, 2))
+
+
+def test_gbm_is_seeded_and_correlated():
+    a = PriceEngine(model="gbm", seed=1)
+    b = PriceEngine(model="gbm", seed=1)
+    for engine in (a, b):
+        engine.add_symbol("X", 100.0)
+        engine.add_symbol("Y", 100.0)
+        # Perfectly correlated shocks move both symbols together
+        engine.set_correlation(np.array([[1.0, 1.0], [1.0, 1.0 + 1e-12]]))
+        engine.step()
+    assert a.price("X") == b.price("X")
+    assert a.price("X") == a.price("Y")
+
+
+def test_companies_view_follows_array():
+    data_store = DataStorage()
+    for symbol, price in (("AAA", 10.0), ("BBB", 20.0)):
+        data_store.add_company(
+            {
+                "name": symbol,
+                "symbol": symbol,
+                "price": price,
+                "outstanding_shares": 100,
+                "ipo_price": price,
+            }
+        )
+    data_store.price_engine.step()
+    companies = data_store.sync_company_prices()
+    assert companies["AAA"]["price"] == data_store.get_price("AAA")
+    assert companies["BBB"]["price"] == data_store.get_price("BBB")
@@ -0,0 +1,168 @@
+# ==============================================
+# Trade History Store Tests
+# ==============================================
+import csv
+import io
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from market.api.endpoints import NEXT_CURSOR_HEADER
+from market.data.trade_store import TradeStore
+from market.main import app
+from market.market.records import TradeRecord
+
+START = datetime(2025, 1, 1, 9, 30)
+
+
+def make_trade(n, symbol="AAPL", buyer="alice", seller="bob"):
+    return TradeRecord(
+        n, symbol, 100.0 + n, 1, buyer, seller, 0.0, 0.0, START + timedelta(seconds=n)
+    )
+
+
+def ids(trades):
+    return [t.trade_id for t in trades]
+
+
+def test_ring_buffer_evicts_oldest():
+    store = TradeStore(capacity=3)
+    for n in range(5):
+        store.append(make_trade(n))
+    assert len(store) == 3
+    assert ids(store.query(limit=10)) == [2, 3, 4]
+    assert ids(store[-2:]) == [3, 4]
+
+
+def test_symbol_and_trader_indexes():
+    store = TradeStore(capacity=100)
+    store.append(make_trade(0, symbol="AAPL", buyer="alice", seller="bob"))
+    store.append(make_trade(1, symbol="MSFT", buyer="carol", seller="alice"))
+    store.append(make_trade(2, symbol="AAPL", buyer="carol", seller="bob"))
+
+    assert ids(store.query(symbol="AAPL")) == [0, 2]
+    assert ids(store.query(trader_id="alice")) == [0, 1]
+    assert ids(store.query(trader_id="carol", symbol="AAPL")) == [2]
+    assert store.query(symbol="GOOG") == []
+
+
+def test_time_range_and_limit():
+    store = TradeStore(capacity=100)
+    for n in range(10):
+        store.append(make_trade(n, symbol="AAPL" if n % 2 else "MSFT"))
+
+    since = START + timedelta(seconds=3)
+    until = START + timedelta(seconds=7)
+    assert ids(store.query(since=since, until=until)) == [3, 4, 5, 6, 7]
+    assert ids(store.query(symbol="AAPL", since=since, until=until)) == [3, 5, 7]
+    assert ids(store.query(symbol="AAPL", since=since, limit=2)) == [7, 9]
+
+
+def test_trader_and_symbol_filter_uses_its_own_index():
+    store = TradeStore(capacity=8)
+    for n in range(12):
+        symbol = "AAPL" if n % 3 == 0 else "MSFT"
+        store.append(make_trade(n, symbol=symbol, buyer="alice", seller="bob"))
+
+    # Retained: 4..11; alice's AAPL trades among them are 6 and 9
+    assert ids(store.query(trader_id="alice", symbol="AAPL")) == [6, 9]
+    assert ids(store.query(trader_id="bob", symbol="AAPL", limit=1)) == [9]
+    assert ids(store.query(trader_id="alice", symbol="AAPL", before=9)) == [6]
+    since = START + timedelta(seconds=7)
+    assert ids(store.query(trader_id="bob", symbol="AAPL", since=since)) == [9]
+    scanned = store.scan(trader_id="alice", symbol="MSFT", batch=2)
+    assert [ids(batch) for batch in scanned] == [[4, 5], [7, 8], [10, 11]]
+    assert store.query(trader_id="carol", symbol="AAPL") == []
+
+    # The pair index only holds live (alice, AAPL) sequences
+    index = store._by_trader_symbol[("alice", "AAPL")]
+    assert len(index) == 2
+    for n in range(12, 20):
+        store.append(make_trade(n, symbol="MSFT"))
+    assert ("alice", "AAPL") not in store._by_trader_symbol
+
+
+def test_indexes_follow_eviction():
+    store = TradeStore(capacity=2)
+    store.append(make_trade(0, symbol="AAPL", buyer="dave", seller="erin"))
+    store.append(make_trade(1, symbol="MSFT"))
+    store.append(make_trade(2, symbol="MSFT"))
+
+    assert store.query(symbol="AAPL") == []
+    assert store.query(trader_id="dave") == []
+    assert ids(store.query(symbol="MSFT")) == [1, 2]
+
+
+def test_before_bound_and_scan_batches():
+    store = TradeStore(capacity=100)
+    for n in range(10):
+        store.append(make_trade(n, symbol="AAPL" if n % 2 else "MSFT"))
+
+    assert ids(store.query(limit=3, before=7)) == [4, 5, 6]
+    assert ids(store.query(symbol="AAPL", limit=2, before=7)) == [3, 5]
+    assert [ids(b) for b in store.scan(batch=4)] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert [ids(b) for b in store.scan(symbol="AAPL", batch=2)] == [[1, 3], [5, 7], [9]]
+
+
+def test_scan_survives_eviction_between_batches():
+    store = TradeStore(capacity=4)
+    for n in range(4):
+        store.append(make_trade(n))
+    batches = store.scan(batch=2)
+    assert ids(next(batches)) == [0, 1]
+    for n in range(4, 7):
+        store.append(make_trade(n))
+    # 2 was evicted; the range still ends where it did at the start
+    assert [ids(b) for b in batches] == [[3]]
+
+
+@pytest.fixture
+def client(make_store):
+    data_store = make_store()
+    for n in range(1, 8):
+        data_store.trade_history.append(make_trade(n))
+    return TestClient(app)
+
+
+def test_cursor_pages_walk_back_through_history(client):
+    pages, params = [], {"limit": 3}
+    while True:
+        response = client.get("/market/trades", params=params)
+        assert response.status_code == 200
+        pages.append([trade["trade_id"] for trade in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+    assert pages == [[5, 6, 7], [2, 3, 4], [1]]
+
+    response = client.get("/market/trades", params={"cursor": "not a cursor"})
+    assert response.status_code == 400
+
+
+def test_time_bounds_accept_utc_suffix(client):
+    # The same instant as START + 3s on the engine's (local) clock
+    since = (START + timedelta(seconds=3)).astimezone(timezone.utc)
+    since = since.replace(tzinfo=None).isoformat() + "Z"
+    response = client.get("/market/trades", params={"since": since})
+    assert response.status_code == 200
+    assert [trade["trade_id"] for trade in response.json()] == [3, 4, 5, 6, 7]
+
+    response = client.get("/market/trades/export", params={"since": since})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["trade_id"] for row in rows] == [3, 4, 5, 6, 7]
+
+
+def test_export_streams_ndjson_and_csv(client):
+    response = client.get("/market/trades/export", params={"format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["trade_id"] for row in rows] == list(range(1, 8))
+    assert rows[0]["buyer"] == "alice" and rows[0]["timestamp"].startswith("2025")
+
+    response = client.get("/market/trades/export", params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["trade_id"] for row in rows] == [str(n) for n in range(1, 8)]
+
+    response = client.get("/market/trades/export", params={"format": "xml"})
+    assert response.status_code == 400
@@ -0,0 +1,312 @@
+# ==============================================
+# WebSocket Fan-out Tests
+# ==============================================
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from market.api import framing
+from market.api.websocket import ConnectionManager, manager
+from market.main import app
+from market.market.units import trader_from_view
+
+
+@pytest.fixture(autouse=True)
+def store(make_store):
+    """Empty data store plus two listed symbols"""
+    return make_store(companies={"AAPL": 180.0, "MSFT": 400.0}, outstanding_shares=100)
+
+
+def messages(ws, kind=None):
+    decoded = [json.loads(m) for m in ws.sent]
+    return [m for m in decoded if kind is None or m["type"] == kind]
+
+
+class FakeWebSocket:
+    """Records sent messages; can be slow or broken"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+
+def test_broken_client_is_evicted():
+    async def scenario():
+        manager = ConnectionManager()
+        good, bad = FakeWebSocket(), FakeWebSocket(fail=True)
+        await manager.connect(good)
+        await manager.connect(bad)
+
+        await manager.broadcast({"type": "trade_executed", "price": 1.5})
+        await asyncio.sleep(0.01)
+
+        assert bad not in manager.active_connections
+        assert messages(good, "trade_executed") == [
+            {"type": "trade_executed", "price": 1.5}
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_slow_client_gets_conflated_updates():
+    async def scenario():
+        manager = ConnectionManager()
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=0.05)
+        await manager.connect(fast)
+        await manager.connect(slow)
+
+        for tick in range(5):
+            await manager.broadcast(
+                {"type": "snapshot", "tick": tick}, conflate_key="snapshot"
+            )
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.3)
+
+        ticks = lambda ws: [m["tick"] for m in messages(ws, "snapshot")]
+        assert ticks(fast) == [0, 1, 2, 3, 4]
+        # The slow client skips stale snapshots but always ends on the latest
+        assert ticks(slow)[-1] == 4
+        assert len(ticks(slow)) < 5
+
+    asyncio.run(scenario())
+
+
+def test_subscriptions_route_by_symbol_and_channel():
+    async def scenario():
+        manager = ConnectionManager()
+        watcher, everyone = FakeWebSocket(), FakeWebSocket()
+        client = await manager.connect(watcher)
+        await manager.connect(everyone)
+        await manager.handle_message(
+            client,
+            json.dumps(
+                {"action": "subscribe", "channel": "prices", "symbols": ["MSFT"]}
+            ),
+        )
+        await manager.handle_message(
+            client,
+            json.dumps(
+                {"action": "subscribe", "channel": "trades", "symbols": ["AAPL"]}
+            ),
+        )
+        await asyncio.sleep(0.01)
+        watcher.sent.clear()
+        everyone.sent.clear()
+
+        await manager.publish_prices({"AAPL": 181.0})
+        await manager.publish_prices({"AAPL": 182.0, "MSFT": 401.0})
+        await manager.publish("trades", "AAPL", {"type": "trade_executed"})
+        await manager.publish("trades", "MSFT", {"type": "trade_executed"})
+        await asyncio.sleep(0.01)
+
+        assert [m["prices"] for m in messages(watcher, "price_update")] == [
+            {"MSFT": 401.0}
+        ]
+        assert len(messages(watcher, "trade_executed")) == 1
+        # Default subscription: every price delta, no trades
+        prices = {}
+        for m in messages(everyone, "price_update"):
+            prices.update(m["prices"])
+        assert prices == {"AAPL": 182.0, "MSFT": 401.0}
+        assert messages(everyone, "trade_executed") == []
+
+        manager.disconnect(watcher)
+        assert ("prices", "MSFT") not in manager.subscribers
+
+    asyncio.run(scenario())
+
+
+def add_traders(data_store):
+    for trader_id, cash, shares in (("seller", 0.0, 10), ("buyer", 10000.0, 0)):
+        data_store.add_trader(
+            trader_id,
+            trader_from_view(
+                {
+                    "trader_id": trader_id,
+                    "name": trader_id,
+                    "cash": cash,
+                    "portfolio": {"AAPL": shares},
+                }
+            ),
+        )
+
+
+def replies(ws, count):
+    """The next `count` messages that aren't market data, decoded"""
+    received = []
+    while len(received) < count:
+        message = ws.receive()
+        if message.get("bytes") is not None:
+            received.append(framing.decode_reply(message["bytes"]))
+        else:
+            decoded = json.loads(message["text"])
+            if decoded["type"] != "price_update":
+                received.append(decoded)
+    return received
+
+
+def test_bad_symbols_get_an_error_and_failures_close_the_socket(monkeypatch):
+    client = TestClient(app)
+    with client.websocket_connect("/ws") as ws:
+        for symbols in ([["AAPL"]], [1], {"AAPL": 1}):
+            request = {"action": "subscribe", "channel": "prices", "symbols": symbols}
+            ws.send_text(json.dumps(request))
+            [reply] = replies(ws, 1)
+            assert reply == {"type": "error", "detail": "Malformed request"}
+        ws.send_text(json.dumps(dict(request, symbols=["AAPL"])))
+        [reply] = replies(ws, 1)
+        assert reply["type"] == "subscribed" and reply["symbols"] == ["AAPL"]
+
+    async def fail(client, text):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(manager, "handle_message", fail)
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text("{}")
+        message = ws.receive()
+        while message["type"] != "websocket.close":
+            message = ws.receive()  # market data queued before the failure
+        assert message["code"] == 1011
+
+
+def test_orders_over_json_and_binary_websockets(store):
+    add_traders(store)
+    client = TestClient(app)
+    with client.websocket_connect("/ws") as maker, client.websocket_connect(
+        "/ws", subprotocols=[framing.SUBPROTOCOL]
+    ) as taker:
+        assert taker.accepted_subprotocol == framing.SUBPROTOCOL
+        maker.send_text(
+            json.dumps(
+                {
+                    "action": "place",
+                    "request_id": 1,
+                    "order": {
+                        "trader_id": "seller",
+                        "symbol": "AAPL",
+                        "price": 180.0,
+                        "quantity": 5,
+                        "order_type": "sell",
+                    },
+                }
+            )
+        )
+        [ack] = replies(maker, 1)
+        assert ack["type"] == "order_ack" and ack["request_id"] == 1
+        assert ack["resting"] and ack["remaining_quantity"] == 5
+        order_id = ack["order_id"]
+
+        taker.send_bytes(
+            framing.encode_request(
+                {
+                    "action": "place",
+                    "request_id": 7,
+                    "order": {
+                        "trader_id": "buyer",
+                        "symbol": "AAPL",
+                        "price": 180.0,
+                        "quantity": 2,
+                        "order_type": "buy",
+                    },
+                }
+            )
+        )
+        execution, ack = replies(taker, 2)
+        assert execution["type"] == "execution" and execution["side"] == "buy"
+        assert ack["type"] == "order_ack" and ack["request_id"] == 7
+        assert ack["filled_quantity"] == 2 and not ack["resting"]
+        assert ack["fills"][0]["price"] == 180.0
+        assert ack["fills"][0]["trade_id"] == execution["trade"]["trade_id"]
+
+        # The resting side hears about its fill on its own connection
+        [execution] = replies(maker, 1)
+        assert execution["trader_id"] == "seller" and execution["side"] == "sell"
+        assert execution["trade"]["quantity"] == 2
+
+        taker.send_bytes(
+            framing.encode_request(
+                {
+                    "action": "amend",
+                    "request_id": 8,
+                    "order_id": order_id,
+                    "quantity": 2,
+                }
+            )
+        )
+        [amended] = replies(taker, 1)
+        assert amended["type"] == "amend_ack" and amended["remaining_quantity"] == 2
+
+        maker.send_text(
+            json.dumps({"action": "cancel", "request_id": 2, "order_id": order_id})
+        )
+        maker.send_text(
+            json.dumps({"action": "cancel", "request_id": 3, "order_id": order_id})
+        )
+        cancelled, rejected = replies(maker, 2)
+        assert cancelled == {
+            "type": "cancel_ack",
+            "request_id": 2,
+            "order_id": order_id,
+            "quantity": 2,
+        }
+        assert rejected["type"] == "order_reject" and rejected["status_code"] == 404
+
+        taker.send_bytes(b"\x09\x05\x00\x00\x00")
+        [rejected] = replies(taker, 1)
+        assert rejected["request_id"] == 5 and rejected["status_code"] == 400
+    assert not store.order_index
+
+
+def test_binary_frames_round_trip():
+    request = {
+        "action": "amend",
+        "request_id": 3,
+        "order_id": 11,
+        "price": None,
+        "quantity": 4,
+    }
+    frame = framing.encode_request(request)
+    assert len(frame) == framing.AMEND_FRAME.size == 25
+    assert framing.decode_request(frame) == request
+    # A NaN price places a market order; every order carries its TIF
+    order = {"trader_id": "t", "symbol": "A", "quantity": 2, "order_type": "sell"}
+    for extra in (
+        {"price": None, "kind": "market", "time_in_force": "FOK"},
+        {"price": 1.5, "time_in_force": "IOC"},
+        {"price": 1.5, "time_in_force": "GTC"},
+    ):
+        place = {"action": "place", "request_id": 4, "order": dict(order, **extra)}
+        frame = framing.encode_request(place)
+        assert len(frame) == framing.PLACE_FRAME.size == 63
+        assert framing.decode_request(frame) == place
+    bad_tif = frame[:-1] + bytes([3])
+    with pytest.raises(framing.FramingError):
+        framing.decode_request(bad_tif)
+    frame = framing.encode_request(request)
+    with pytest.raises(framing.FramingError):
+        framing.decode_request(frame[:-1])
+    place = framing.PLACE_FRAME.pack(
+        framing.PLACE, 5, b"\xff" * 36, b"AAPL", 1.0, 1, 0, 0
+    )
+    with pytest.raises(framing.FramingError) as error:
+        framing.decode_request(place)
+    assert error.value.request_id == 5
+    with pytest.raises(framing.FramingError):
+        framing.encode_reply(
+            {
+                "type": "execution",
+                "trader_id": "x" * 40,
+                "side": "buy",
+                "trade": {"trade_id": 1, "symbol": "A", "price": 1.0, "quantity": 1},
+            }
+        )